@@ -1,117 +1,45 @@
-from typing import List, Dict, Any, TypedDict, Sequence, Union, cast, Optional
+from typing import Annotated, AsyncIterator, List, Dict, Any, TypedDict, Sequence, Union, cast, Optional, Callable, Tuple
+import asyncio
+import functools
+import hashlib
 import json
+import logging
+import operator
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.constants import END, Send
 from langgraph.graph import StateGraph
-from langgraph.prebuilt import ToolExecutor
 from langchain_community.chat_models import ChatOpenAI
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+from app.checkpoints import create_checkpoint_store
+from app.cache import DirectionsCache, GeocodeCache, normalize_place_name
+from app.config import AgentSettings
+from app.elevation import DemTiles, elevation_profile
+from app.geodesy import path_length_m
+from app.json_stream import IncrementalJSONParser, parse_llm_json_checked
+from app.local_router import LocalRouter
+from app.maps_http import PooledMapsClient, RetryPolicy
+from app.metrics import (
+    CHECKPOINT_RESUMES, DEGRADATION_TIERS, DROPPED_WAYPOINTS, FALLBACKS, REQUEST_SECONDS, observe_call, record_llm_usage, timed_node
+)
+from app.places import PlaceIndex, filter_waypoints
+from app.plan_cache import PlanCache, normalize_prompt
+from app.rate_limit import TokenBucket
+from app.route_store import create_route_store, route_key
+from app.polyline import decode_polyline, encode_polyline, route_track, simplify_track
+from app.singleflight import SingleFlight
 from app.models import RouteRequest, RouteResponse, RoutePoint
 # from app.models import RouteRequest, RouteResponse, RoutePoint
-import googlemaps
 from googlemaps.client import Client as GoogleMapsClient
 from googlemaps import geocoding, directions
 
-class RouteAgent:
-    def __init__(self, openai_api_key: str, google_maps_api_key: str):
-        self.openai_api_key = openai_api_key
-        self.google_maps_api_key = google_maps_api_key
-        self.llm = ChatOpenAI(api_key=openai_api_key)
-        self.gmaps: GoogleMapsClient = googlemaps.Client(key=google_maps_api_key)
-        
-    async def process_route_request(self, request: RouteRequest) -> RouteResponse:
-        """Process a route request and return cycling route suggestions using LangGraph workflow."""
-        print(f"Starting route request processing with prompt: {request.prompt}")
-        print(f"OpenAI API Key configured: {'*' * 5}{self.openai_api_key[-4:]}")
-        print(f"Google Maps API Key configured: {'*' * 5}{self.google_maps_api_key[-4:]}")
-        
-        # Initialize state
-        initial_state = {
-            "prompt": request.prompt,
-            "start_location": {},
-            "constraints": {},
-            "suggested_routes": [],
-            "extracted_locations": [],
-            "route_details": [],
-            "errors": []
-        }
-        
-        # Run the workflow
-        try:
-            # Get the compiled workflow
-            app = self._create_workflow()
-            print("Created workflow, executing with initial state:", initial_state)
-            # Execute the workflow
-            final_state = app.invoke(initial_state)
-            print("Workflow execution completed. Final state:", final_state)
-        except Exception as e:
-            print(f"Workflow execution error: {e}")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error details: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
-            final_state = {
-                "errors": [str(e)],
-                "route_details": [],
-                "extracted_locations": [],
-                "suggested_routes": []
-            }
-        
-        if final_state.get("errors"):
-            print("Workflow errors:", final_state["errors"])
-            # Return empty response in case of errors
-            return RouteResponse(
-                routes=[],
-                distances=[],
-                descriptions=[]
-            )
-        
-        # Convert route details to response format
-        routes = []
-        distances = []
-        descriptions = []
-        
-        for route_detail in final_state["route_details"]:
-            route_points = [
-                RoutePoint(
-                    lat=point["lat"],
-                    lng=point["lng"],
-                    name=point["name"]
-                )
-                for point in route_detail["points"]
-            ]
-            routes.append(route_points)
-            distances.append(route_detail["distance"])
-            descriptions.append(route_detail["description"])
-        
-        return RouteResponse(
-            routes=routes,
-            distances=distances,
-            descriptions=descriptions
-        )
-
-    def _create_workflow(self):
-        """Create a LangGraph workflow for route planning.
-        
-        Returns:
-            A compiled LangGraph workflow for processing route requests.
-        """
-        # Define state types
-        class RouteState(TypedDict):
-            prompt: str
-            start_location: dict
-            constraints: dict
-            suggested_routes: list
-            extracted_locations: list
-            route_details: list
-            errors: list
-            
-        # Create the workflow graph
-        workflow = StateGraph(RouteState)
+logger = logging.getLogger(__name__)
 
-        # Create nodes for the workflow
-        def parse_route_request(state: RouteState) -> RouteState:
-            """Parse the initial route request using LLM."""
-            try:
-                prompt_template = ChatPromptTemplate.from_template("""
+# Prompt templates are parsed once at import time and shared by every agent.
+ROUTE_PLAN_PROMPT = ChatPromptTemplate.from_template("""
 あなたは自転車ルートプランナーです。以下の入力に基づいて、自転車での走行に適したルートを提案してください。
 
 ユーザーの入力: {user_input}
@@ -149,209 +77,1162 @@ class RouteAgent:
 3. 各ルートは100km圏内に収まるようにしてください
 4. 説明は具体的に記載してください
 """)
-                chain = prompt_template | self.llm
-                llm_response = chain.invoke({"user_input": state["prompt"]})
-                import json
+
+ADDRESS_PROMPT = ChatPromptTemplate.from_template("""
+場所の名前から正確な住所を抽出してください。
+
+場所: {location}
+
+以下の形式でJSONを返してください:
+{{
+    "address": "完全な住所（都道府県から）"
+}}
+""")
+
+
+def merge_by_route_index(left: list, right: list) -> list:
+    """Reducer that merges parallel branch results and keeps them in route order.
+
+    Entries without a ``route_index`` (the start point) sort first.
+    """
+    return sorted(left + right, key=lambda item: item.get("route_index", -1))
+
+
+# Degradation tiers under a deadline, least degraded first:
+# - full: every waypoint geocoded and routed by Directions as usual
+# - skip_geocodes: waypoints that still needed a geocode call were left out
+# - local_routing: routed from cached directions or the local graph (or straight lines)
+# - partial: the deadline passed; only the routes resolved by then are returned
+TIERS = ("full", "skip_geocodes", "local_routing", "partial")
+
+
+def worst_tier(tiers: Sequence[str]) -> str:
+    """The most degraded of ``tiers`` ("full" when empty)."""
+    return max(tiers, key=TIERS.index, default="full")
+
+
+def _remaining(deadline: Optional[float]) -> float:
+    """Seconds left until a wall-clock deadline; infinite when there is none."""
+    return float("inf") if deadline is None else deadline - time.time()
+
+
+def _is_named_place(point: Any) -> bool:
+    """Whether a plan's start or waypoint is an object with a non-empty name."""
+    return isinstance(point, dict) and isinstance(point.get("name"), str) and bool(point["name"].strip())
+
+
+class RouteState(TypedDict):
+    prompt: str
+    # Plan obtained ahead of the run (e.g. by a batched LLM call); None asks the LLM
+    plan: Optional[dict]
+    start_location: dict
+    constraints: dict
+    suggested_routes: list
+    extracted_locations: Annotated[list, merge_by_route_index]
+    route_details: Annotated[list, merge_by_route_index]
+    # Degradation tier each plan_route branch ended up in
+    tiers: Annotated[list, operator.add]
+    errors: list
+
+
+class RouteBranch(TypedDict):
+    """Input of one parallel plan_route branch."""
+    route_index: int
+    route: dict
+    start_point: dict
+    # Waypoints farther than this from the start are dropped; None for no limit
+    radius_km: Optional[float]
+
+
+class RouteAgent:
+    def __init__(
+        self,
+        openai_api_key: str,
+        google_maps_api_key: str,
+        settings: Optional[AgentSettings] = None,
+        llm: Optional[BaseChatModel] = None,
+        gmaps: Optional[GoogleMapsClient] = None
+    ):
+        self.openai_api_key = openai_api_key
+        self.google_maps_api_key = google_maps_api_key
+        self.settings = settings or AgentSettings()
+        self.llm = llm or ChatOpenAI(api_key=openai_api_key)
+        # One keep-alive connection per Maps worker thread
+        self.gmaps: GoogleMapsClient = gmaps or PooledMapsClient(
+            google_maps_api_key,
+            pool_size=self.settings.maps_max_workers,
+            timeout=self.settings.maps_attempt_timeout,
+            base_url=self.settings.maps_base_url
+        )
+        self._maps_retry = RetryPolicy(
+            attempts=self.settings.maps_max_attempts,
+            base_delay=self.settings.maps_backoff_base,
+            max_delay=self.settings.maps_backoff_max,
+            hedge_delay=self.settings.maps_hedge_delay
+        )
+        # googlemaps.Client is synchronous (requests), so its calls run on a
+        # bounded pool instead of blocking the event loop.
+        self._maps_executor = ThreadPoolExecutor(
+            max_workers=self.settings.maps_max_workers,
+            thread_name_prefix="gmaps"
+        )
+        self.geocode_cache = GeocodeCache(
+            maxsize=self.settings.geocode_cache_size,
+            ttl=self.settings.geocode_cache_ttl,
+            negative_ttl=self.settings.geocode_negative_ttl,
+            path=self.settings.geocode_cache_path
+        )
+        self.directions_cache = DirectionsCache(
+            precision=self.settings.directions_cache_precision,
+            maxsize=self.settings.directions_cache_size,
+            ttl=self.settings.directions_cache_ttl,
+            negative_ttl=self.settings.directions_negative_ttl,
+            path=self.settings.directions_cache_path
+        )
+        self.plan_cache = PlanCache(
+            version=self._plan_version(),
+            similarity_threshold=self.settings.plan_similarity_threshold,
+            maxsize=self.settings.plan_cache_size,
+            ttl=self.settings.plan_cache_ttl,
+            path=self.settings.plan_cache_path
+        )
+        # Known places: curated POIs plus everything geocoded so far
+        place_options = {
+            "snap_distance_m": self.settings.place_snap_distance_m,
+            "maxsize": self.settings.geocode_cache_size
+        }
+        if self.settings.places_path:
+            self.place_index = PlaceIndex.from_file(self.settings.places_path, **place_options)
+        else:
+            self.place_index = PlaceIndex(**place_options)
+        for name, location in self.geocode_cache.items(limit=self.settings.geocode_cache_size):
+            if location:
+                self.place_index.add(name, location["lat"], location["lng"])
+        # Offline road graph, used when Google cannot route (or first, in primary mode)
+        self.local_router: Optional[LocalRouter] = None
+        if self.settings.local_graph_path:
+            self.local_router = LocalRouter.load(
+                self.settings.local_graph_path,
+                snap_distance_m=self.settings.local_snap_distance_m
+            )
+        # Routes resolved earlier, reused for requests starting nearby
+        self.route_store = create_route_store(self.settings.route_store_url, self.settings.route_store_pool_size)
+        # Checkpoints of workflow runs, so retried requests resume
+        self.checkpoints = create_checkpoint_store(self.settings.checkpoint_path, self.settings.checkpoint_ttl)
+        # Local elevation model for climbing totals and profiles
+        self.dem: Optional[DemTiles] = None
+        if self.settings.dem_path:
+            self.dem = DemTiles(self.settings.dem_path, max_tiles=self.settings.dem_cache_tiles)
+        # Caps in-flight geocode calls across all concurrent requests
+        self._geocode_semaphore = asyncio.Semaphore(self.settings.geocode_concurrency)
+        # Per-provider call rates shared by every request
+        self._rate_limits: Dict[str, TokenBucket] = {
+            provider: TokenBucket(rate)
+            for provider, rate in (
+                ("llm", self.settings.llm_rate_limit),
+                ("geocode", self.settings.geocode_rate_limit),
+                ("directions", self.settings.directions_rate_limit)
+            )
+            if rate
+        }
+        # Directions calls in flight, keyed by directions cache key
+        self._inflight_directions: SingleFlight[List[Dict[str, Any]]] = SingleFlight()
+        # Identical route requests in flight, keyed by normalized prompt
+        self._route_requests: SingleFlight[RouteResponse] = SingleFlight()
+        # Geocode tasks in flight, keyed by normalized place name
+        self._inflight_geocodes: Dict[str, "asyncio.Future[Optional[Dict[str, float]]]"] = {}
+        # Chains and the compiled graph are built once per agent. The compiled
+        # graph holds no per-run state (each ainvoke gets its own state dict and
+        # nodes never mutate their input), so concurrent requests can share it.
+        self._route_plan_chain = ROUTE_PLAN_PROMPT | self.llm
+        self._address_chain = ADDRESS_PROMPT | self.llm
+        self._workflow = self._create_workflow()
+        # Compiled with the checkpointer on first use (opening it needs the event loop)
+        self._checkpointed: Optional[Any] = None
+
+    def _plan_version(self) -> str:
+        """Identify the model and route-plan template, so changing either invalidates cached plans."""
+        model = getattr(self.llm, "model_name", None) or getattr(self.llm, "model", None) or ""
+        template = ROUTE_PLAN_PROMPT.messages[0].prompt.template
+        identity = f"{type(self.llm).__name__}\0{model}\0{template}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+
+    async def _throttle(self, provider: str) -> None:
+        """Wait until ``provider``'s rate limit allows another call."""
+        bucket = self._rate_limits.get(provider)
+        if bucket is not None:
+            await bucket.acquire()
+
+    def rate_limit_stats(self) -> Dict[str, Dict[str, float]]:
+        return {provider: bucket.stats() for provider, bucket in self._rate_limits.items()}
+
+    async def _run_maps_call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking googlemaps module function on the Maps executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._maps_executor,
+            functools.partial(func, self.gmaps, *args, **kwargs)
+        )
+
+    async def _call_maps(self, provider: str, timeout: float, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call a googlemaps module function, retrying transient errors until ``timeout``.
+
+        The caller has already taken the first rate-limit token; retries and
+        hedged requests take their own.
+        """
+        return await self._maps_retry.run(
+            lambda: self._run_maps_call(func, *args, **kwargs),
+            lambda: self._throttle(provider),
+            timeout,
+            provider
+        )
+
+    async def _geocode(self, address: str) -> List[Dict[str, Any]]:
+        """Geocode an address without blocking the event loop."""
+        return await self._call_maps("geocode", self.settings.geocode_timeout, geocoding.geocode, address)
+
+    async def _geocode_location(self, address: str) -> Optional[Dict[str, float]]:
+        """Resolve an address to ``{"lat", "lng"}`` through the place index and geocode cache.
+
+        Cache misses are geocoded under the shared concurrency cap and
+        per-call timeout, and concurrent lookups of the same normalized name
+        share one call. Addresses Google cannot find are cached as negative
+        entries and return None; errors propagate and are not cached.
+        """
+        found, location = self._known_location(address)
+        if found:
+            return location
+        # Shielded so that one cancelled caller does not cancel a lookup
+        # other callers (or a prefetch) are waiting on.
+        return await asyncio.shield(self._start_geocode(address))
+
+    def _known_location(self, address: str) -> Tuple[bool, Optional[Dict[str, float]]]:
+        """Look an address up in the place index and in-memory geocode cache only; ``(found, location)``."""
+        location = self.place_index.lookup(address)
+        if location is not None:
+            return True, location
+        return self.geocode_cache.peek(address)
+
+    def _start_geocode(self, address: str) -> "asyncio.Future[Optional[Dict[str, float]]]":
+        """Return the in-flight geocode task for ``address``, starting one if needed."""
+        key = normalize_place_name(address)
+        task = self._inflight_geocodes.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_geocode(address))
+            self._inflight_geocodes[key] = task
+            task.add_done_callback(functools.partial(self._finish_geocode, key))
+        return task
+
+    def _finish_geocode(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight_geocodes.get(key) is task:
+            del self._inflight_geocodes[key]
+        # Mark a failed prefetch as retrieved; callers still see the error
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_geocode(self, address: str) -> Optional[Dict[str, float]]:
+        # Not in memory; the cache file may still have it
+        found, location = await self.geocode_cache.aget(address)
+        if found:
+            return location
+        async with self._geocode_semaphore:
+            await self._throttle("geocode")
+            with observe_call("geocode"):
+                result = await self._geocode(address)
+        location = None
+        if result:
+            location_data = result[0]['geometry']['location']
+            # Snap onto a known place nearby so that near-duplicates share
+            # coordinates (and directions cache entries)
+            location = self.place_index.snap({"lat": location_data['lat'], "lng": location_data['lng']})
+            self.place_index.add(address, location["lat"], location["lng"])
+        self.geocode_cache.set(address, location)
+        return location
+
+    def _prefetch_geocode(self, address: str) -> None:
+        """Start geocoding ``address`` in the background unless it is already known or cached."""
+        if address in self.place_index:
+            return
+        found, _ = self.geocode_cache.peek(address)
+        if not found:
+            self._start_geocode(address)
+
+    async def _stream_route_plan(self, prompt: str) -> str:
+        """Stream the LLM plan, prefetching geocodes for places as soon as they appear.
+
+        The start location and every waypoint object are handed to the
+        geocoder the moment their JSON closes, so geocoding overlaps the rest
+        of the generation. Returns the full completion text.
+        """
+        parser = IncrementalJSONParser()
+        chunks = []
+        with observe_call("llm"):
+            async for chunk in self._route_plan_chain.astream({"user_input": prompt}):
+                record_llm_usage(chunk)
+                text = str(chunk.content)
+                chunks.append(text)
+                for path, value in parser.feed(text):
+                    is_place = path == ("start_location",) or (
+                        len(path) == 4 and path[0] == "suggested_routes" and path[2] == "waypoints"
+                    )
+                    if is_place and isinstance(value, dict) and value.get("name"):
+                        self._prefetch_geocode(value["name"])
+        return "".join(chunks)
+
+    async def _geocode_point(self, name: str, location_type: str) -> Optional[Dict[str, Any]]:
+        """Geocode a named point, returning None when it cannot be found."""
+        location = await self._geocode_location(name)
+        if location is None:
+            return None
+        return {
+            "name": name,
+            "lat": location['lat'],
+            "lng": location['lng'],
+            "type": location_type
+        }
+
+    async def _directions(self, **kwargs: Any) -> List[Dict[str, Any]]:
+        """Request directions without blocking the event loop."""
+        return await self._call_maps("directions", self.settings.directions_timeout, directions.directions, **kwargs)
+
+    async def _cycling_directions(self, path: Sequence[Tuple[float, float]], mode: str = "bicycling") -> List[Dict[str, Any]]:
+        """Get directions along ``path`` (origin, waypoints..., destination) through the directions cache.
+
+        Returns an empty list when Google finds no route; errors propagate and
+        are not cached.
+        """
+        origin, destination, waypoints = path[0], path[-1], list(path[1:-1])
+        key = self.directions_cache.key(origin, destination, waypoints, mode)
+        found, cached = await self.directions_cache.aget(key)
+        if found:
+            return cached or []
+        # Identical requests in flight (e.g. across a batch) share one call
+        return await self._inflight_directions.do(
+            key,
+            lambda: self._fetch_directions(key, origin, destination, waypoints, mode)
+        )
+
+    async def _fetch_directions(
+        self,
+        key: str,
+        origin: Tuple[float, float],
+        destination: Tuple[float, float],
+        waypoints: List[Tuple[float, float]],
+        mode: str
+    ) -> List[Dict[str, Any]]:
+        await self._throttle("directions")
+        with observe_call("directions"):
+            route_directions = await self._directions(
+                origin=f"{origin[0]},{origin[1]}",
+                destination=f"{destination[0]},{destination[1]}",
+                waypoints=[f"{lat},{lng}" for lat, lng in waypoints] if waypoints else None,
+                mode=mode,
+                alternatives=False
+            )
+        self.directions_cache.set(key, route_directions or None)
+        return route_directions
+
+    def _route_polyline(self, route: Dict[str, Any]) -> Optional[str]:
+        """Encode a Directions route's road geometry, simplified to the configured tolerance."""
+        track = route_track(route)
+        if len(track) == 0:
+            return None
+        return encode_polyline(simplify_track(track, self.settings.polyline_tolerance_m))
+
+    def _route_locally(self, path: Sequence[Tuple[float, float]]) -> Optional[Dict[str, Any]]:
+        if self.local_router is None:
+            return None
+        result = self.local_router.route(path)
+        if result is None:
+            return None
+        return {
+            "distance": result["distance"] / 1000,
+            "duration": int(result["duration"]),
+            "polyline": encode_polyline(simplify_track(result["track"], self.settings.polyline_tolerance_m))
+        }
+
+    def _route_elevation(self, polyline: Optional[str], points: Sequence[Any]) -> Optional[Dict[str, Any]]:
+        """Elevation profile along a route's road geometry, or its straight lines when it has none."""
+        if self.dem is None:
+            return None
+        track = decode_polyline(polyline) if polyline else points
+        return elevation_profile(
+            self.dem,
+            track,
+            spacing_m=self.settings.elevation_spacing_m,
+            threshold_m=self.settings.elevation_threshold_m
+        )
+
+    async def _directions_details(self, route: Dict[str, Any]) -> Dict[str, Any]:
+        """Distance (km), duration (s) and polyline of a Directions route."""
+        return {
+            "distance": sum(leg.get("distance", {}).get("value", 0) for leg in route.get("legs", [])) / 1000,
+            "duration": sum(leg.get("duration", {}).get("value", 0) for leg in route.get("legs", [])),
+            # Decoding and simplifying a long track is CPU work; keep it off the event loop
+            "polyline": await asyncio.to_thread(self._route_polyline, route)
+        }
+
+    async def _route_without_directions(self, path: Sequence[Tuple[float, float]]) -> Optional[Dict[str, Any]]:
+        """Route ``path`` from a cached Directions result or, failing that, the local graph in any mode."""
+        key = self.directions_cache.key(path[0], path[-1], list(path[1:-1]), "bicycling")
+        found, cached = await self.directions_cache.aget(key)
+        if found and cached:
+            return await self._directions_details(cached[0])
+        try:
+            return await asyncio.to_thread(self._route_locally, path)
+        except Exception as e:
+            logger.warning("Error routing offline: %r", e)
+            return None
+
+    async def _local_route(self, path: Sequence[Tuple[float, float]], primary: bool) -> Optional[Dict[str, Any]]:
+        """Route ``path`` on the offline graph if it serves this role ("primary" or fallback).
+
+        Returns distance (km), duration (s) and polyline, or None when offline
+        routing is not configured for this role or finds no route.
+        """
+        if primary != (self.settings.local_routing_mode == "primary"):
+            return None
+        try:
+            return await asyncio.to_thread(self._route_locally, path)
+        except Exception as e:
+            logger.warning("Error routing offline: %r", e)
+            return None
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return hit/miss statistics for the place index, the geocode, directions and plan caches and the DEM tiles."""
+        stats = {
+            "places": self.place_index.stats(),
+            "geocode": self.geocode_cache.stats(),
+            "directions": self.directions_cache.stats(),
+            "plan": self.plan_cache.stats()
+        }
+        if self.dem is not None:
+            stats["dem"] = self.dem.stats()
+        if self.route_store is not None:
+            stats["routes"] = self.route_store.stats()
+        if self.checkpoints is not None:
+            stats["checkpoints"] = self.checkpoints.stats()
+        return stats
+
+    async def process_route_request(self, request: RouteRequest, plan: Optional[Dict[str, Any]] = None) -> RouteResponse:
+        """Process a route request and return cycling route suggestions using LangGraph workflow.
+
+        Concurrent requests with the same normalized prompt share one workflow
+        execution and all receive its response (or its error). A ``plan``
+        obtained ahead of time (see ``plan_batch``) replaces the LLM call.
+        Requests with their own deadline only share with the same deadline,
+        and requests with an idempotency key only with the same key.
+
+        With a checkpoint store, the run's thread id comes from the same key,
+        so a retry after a failure or timeout resumes the earlier run.
+        """
+        key = self.request_key(request)
+        thread_id = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return await self._route_requests.do(key, lambda: self._run_route_request(request, plan, thread_id))
+
+    @staticmethod
+    def request_key(request: RouteRequest) -> str:
+        """Key of the requests that share one run: the normalized prompt and deadline, or the idempotency key."""
+        if request.idempotency_key:
+            return f"idempotency\0{request.idempotency_key}"
+        key = normalize_prompt(request.prompt)
+        if request.deadline:
+            key = f"{key}\0{request.deadline}"
+        return key
+
+    @property
+    def supports_batch_planning(self) -> bool:
+        """Whether the LLM client implements its own batching rather than Runnable's concurrent default."""
+        return type(self.llm).abatch is not Runnable.abatch
+
+    async def plan_batch(self, prompts: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get route plans for many prompts in one batched LLM call.
+
+        Prompts with a cached plan are skipped. Returns plans keyed by
+        normalized prompt; prompts whose completion fails or cannot be parsed
+        are left out, so their requests ask the LLM again on their own.
+        """
+        missing = {}
+        for prompt in prompts:
+            if await self.plan_cache.aget(prompt) is None:
+                missing.setdefault(normalize_prompt(prompt), prompt)
+        if not missing:
+            return {}
+        for _ in missing:
+            await self._throttle("llm")
+        with observe_call("llm_batch"):
+            responses = await self._route_plan_chain.abatch(
+                [{"user_input": prompt} for prompt in missing.values()],
+                config={"max_concurrency": self.settings.batch_concurrency},
+                return_exceptions=True
+            )
+        plans = {}
+        for (key, prompt), response in zip(missing.items(), responses):
+            if isinstance(response, Exception):
+                logger.warning("Batched plan failed for %r: %r", prompt, response)
+                continue
+            record_llm_usage(response)
+            try:
+                plan, complete = self._plan_from_completion(str(response.content))
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                logger.warning("Failed to parse batched plan for %r: %r", prompt, e)
+                continue
+            # A repaired or short plan serves this request but is not reused
+            if complete:
+                self.plan_cache.set(prompt, plan)
+            plans[key] = plan
+        return plans
+
+    @staticmethod
+    def _plan_from_completion(content: str) -> Tuple[Dict[str, Any], bool]:
+        """Build a plan from the LLM's JSON completion; raises json.JSONDecodeError if unusable.
+
+        Returns ``(plan, complete)``: ``complete`` is False when the
+        completion was truncated, parts of it were dropped, or it has fewer
+        routes than its ``route_count``. Only complete plans are worth caching.
+        """
+        # Tolerates code fences and truncated output
+        route_data, repaired = parse_llm_json_checked(content)
+        if not isinstance(route_data, dict) or not _is_named_place(route_data.get("start_location")):
+            raise json.JSONDecodeError("Plan has no named start_location", content, 0)
+        # A truncated completion can end in a partial route or waypoint
+        # (repaired to e.g. {} or {"name": "嵐"}); keep only named waypoints
+        suggested_routes = []
+        complete = not repaired
+        for route in route_data.get("suggested_routes", []):
+            if not isinstance(route, dict) or not isinstance(route.get("waypoints"), list):
+                complete = False
+                continue
+            waypoints = [point for point in route["waypoints"] if _is_named_place(point)]
+            complete = complete and len(waypoints) == len(route["waypoints"])
+            if waypoints:
+                suggested_routes.append({**route, "waypoints": waypoints})
+        constraints = route_data.get("constraints", {})
+        route_count = constraints.get("route_count") if isinstance(constraints, dict) else None
+        if isinstance(route_count, int) and len(suggested_routes) < route_count:
+            complete = False
+        plan = {
+            "start_location": route_data["start_location"],
+            "constraints": constraints,
+            "suggested_routes": suggested_routes
+        }
+        return plan, complete and bool(suggested_routes)
+
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Return how many route requests ran the workflow and how many were coalesced."""
+        return self._route_requests.stats()
+
+    async def warm_up(self) -> None:
+        """Pay the one-time costs a first request would otherwise pay, without calling the LLM or Maps.
+
+        Opens the route store and checkpoint connections, compiles the
+        checkpointed graph and starts the Maps worker threads.
+        """
+        if self.route_store is not None:
+            await self.route_store.open()
+        if self.checkpoints is not None:
+            await self._checkpointed_workflow()
+        # The executor starts a thread per call until it has max_workers; start them all now
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._maps_executor, time.sleep, 0.01)
+            for _ in range(self.settings.maps_max_workers)
+        ))
+
+    async def close(self) -> None:
+        """Close the route store, checkpoint and cache connections and stop the Maps workers."""
+        if self.route_store is not None:
+            await self.route_store.close()
+        if self.checkpoints is not None:
+            await self.checkpoints.close()
+        # Writes the cache rows still queued for their SQLite files
+        for cache in (self.geocode_cache, self.directions_cache, self.plan_cache):
+            await asyncio.to_thread(cache.close)
+        self._maps_executor.shutdown(wait=False)
+
+    @staticmethod
+    def _store_record(prompt: str, route_detail: Dict[str, Any]) -> Dict[str, Any]:
+        start, *waypoints = route_detail["points"]
+        return {
+            "start": {"name": start.get("name") or "", "lat": start["lat"], "lng": start["lng"]},
+            "waypoints": waypoints,
+            "polyline": route_detail.get("polyline"),
+            "distance": route_detail["distance"],
+            "duration": route_detail.get("duration", 0),
+            "description": route_detail.get("description", ""),
+            "elevation": route_detail.get("elevation"),
+            "prompt": prompt
+        }
+
+    @staticmethod
+    def _stored_detail(route: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "points": [route["start"], *route["waypoints"]],
+            "distance": route["distance"],
+            "duration": route["duration"],
+            "description": route["description"],
+            "polyline": route.get("polyline"),
+            "elevation": route.get("elevation")
+        }
+
+    def _prompt_start(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """The start the prompt names, if it can be told without the LLM.
+
+        Only places a route has started from count, since curated places and
+        geocoded names include waypoints (in "嵐山方面へ樟葉駅から" the start
+        is 樟葉駅). A prompt naming several such places is left to the LLM.
+        """
+        starts = self.place_index.find_in_text(prompt, starts_only=True)
+        return starts[0] if len(starts) == 1 else None
+
+    async def _stored_routes(
+        self,
+        start: Optional[Dict[str, Any]],
+        limit: int,
+        prompt: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Up to ``limit`` stored routes, not older than route_store_max_age, starting near ``start``.
+
+        With ``prompt``, only routes planned for that prompt (normalized) count.
+        """
+        if self.route_store is None or start is None or limit <= 0:
+            return []
+        try:
+            return await self.route_store.near(
+                start["lat"],
+                start["lng"],
+                self.settings.route_store_radius_m,
+                limit,
+                max_age=self.settings.route_store_max_age or None,
+                prompt=normalize_prompt(prompt) if prompt is not None else None
+            )
+        except Exception as e:
+            logger.warning("Error reading the route store: %r", e)
+            return []
+
+    async def _save_routes(self, prompt: str, route_details: Sequence[Dict[str, Any]]) -> None:
+        """Store the routes that were routed on real roads (not straight-line fallbacks)."""
+        if self.route_store is None:
+            return
+        # Saved under the normalized prompt so that rephrasings of it find them (see _stored_routes)
+        records = [
+            self._store_record(normalize_prompt(prompt), d)
+            for d in route_details if d.get("polyline") and d.get("points")
+        ]
+        try:
+            await self.route_store.save(records)
+        except Exception as e:
+            logger.warning("Error saving routes: %r", e)
+
+    def _response(self, route_details: Sequence[Dict[str, Any]], tier: str = "full") -> RouteResponse:
+        """Convert route details (workflow results or stored routes) to the response format."""
+        routes = []
+        distances = []
+        descriptions = []
+        polylines = []
+        elevations = []
+        
+        for route_detail in route_details:
+            routes.append(self._route_points(route_detail))
+            distances.append(route_detail["distance"])
+            descriptions.append(route_detail["description"])
+            polylines.append(route_detail.get("polyline"))
+            elevations.append(route_detail.get("elevation"))
+        
+        return RouteResponse(
+            routes=routes,
+            distances=distances,
+            descriptions=descriptions,
+            polylines=polylines,
+            elevations=elevations if self.dem is not None else None,
+            tier=tier
+        )
+
+    def _deadline(self, request: RouteRequest) -> Optional[float]:
+        """Wall-clock time a request's response is due, from its own deadline or the server default."""
+        seconds = request.deadline or self.settings.request_deadline
+        return time.time() + seconds if seconds else None
+
+    async def _checkpointed_workflow(self) -> Any:
+        """The workflow compiled with the checkpoint store's saver."""
+        if self._checkpointed is None:
+            saver = await self.checkpoints.open()
+            if self._checkpointed is None:
+                self._checkpointed = self._create_workflow(checkpointer=saver)
+        return self._checkpointed
+
+    async def _resume_point(
+        self,
+        workflow: Any,
+        config: Dict[str, Any],
+        initial_state: Dict[str, Any],
+        replay: bool
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Decide how a run on ``config``'s thread starts: ``(input, config, finished_state)``.
+
+        - a new thread starts from ``initial_state``
+        - when the thread's last run finished cleanly, ``replay`` (a retried
+          idempotency key) returns its final state; otherwise the thread
+          starts over
+        - when the last run failed or was cut short, it resumes from its
+          newest checkpoint that has steps pending and no errors, so finished
+          steps (the LLM plan, geocodes, completed route branches) are not
+          run again
+        """
+        latest = await workflow.aget_state(config)
+        if not latest.values:
+            return initial_state, config, None
+        if not latest.next and not latest.values.get("errors"):
+            if replay:
+                logger.info("Replaying the finished run of thread %s", config["configurable"]["thread_id"])
+                return None, config, latest.values
+        else:
+            async for snapshot in workflow.aget_state_history(config):
+                # Step 0 has only the input; resuming there is starting over
+                if snapshot.next and not snapshot.values.get("errors") and snapshot.metadata.get("step", -1) > 0:
+                    logger.info("Resuming thread %s at %s", config["configurable"]["thread_id"], snapshot.next[0])
+                    CHECKPOINT_RESUMES.labels(node=snapshot.next[0]).inc()
+                    resume_config = {"configurable": {**config["configurable"], **snapshot.config["configurable"]}}
+                    return None, resume_config, None
+        await self.checkpoints.delete(config["configurable"]["thread_id"])
+        return initial_state, config, None
+
+    async def _run_workflow(
+        self,
+        initial_state: Dict[str, Any],
+        deadline: Optional[float] = None,
+        thread_id: Optional[str] = None,
+        replay: bool = False
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Run the workflow, stopping at ``deadline`` if there is one.
+
+        With a checkpoint store and a ``thread_id``, every finished step is
+        checkpointed and an earlier unfinished run on the thread is resumed
+        (see ``_resume_point``). Returns the final state and whether the
+        deadline cut the run short; a cut-short state holds the errors,
+        extracted locations and route details produced so far.
+        """
+        workflow = self._workflow
+        run_input: Optional[Dict[str, Any]] = initial_state
+        config: Dict[str, Any] = {"configurable": {"deadline": deadline}}
+        if self.checkpoints is not None and thread_id is not None:
+            workflow = await self._checkpointed_workflow()
+            await self.checkpoints.touch(thread_id)
+            config["configurable"]["thread_id"] = thread_id
+            run_input, config, finished = await self._resume_point(workflow, config, initial_state, replay)
+            if finished is not None:
+                return finished, False
+
+        cut_short = False
+        if deadline is None:
+            state = await workflow.ainvoke(run_input, config)
+        else:
+            state = {"errors": [], "extracted_locations": [], "route_details": [], "tiers": []}
+            try:
+                async with asyncio.timeout(max(0.0, deadline - time.time())):
+                    async for update in workflow.astream(run_input, config, stream_mode="updates"):
+                        for values in update.values():
+                            values = values or {}
+                            state["errors"] = values.get("errors") or state["errors"]
+                            state["extracted_locations"] = merge_by_route_index(
+                                state["extracted_locations"], values.get("extracted_locations", [])
+                            )
+                            state["route_details"] = merge_by_route_index(state["route_details"], values.get("route_details", []))
+                            state["tiers"] += values.get("tiers", [])
+            except TimeoutError:
+                cut_short = True
+        if self.checkpoints is not None and thread_id is not None and not cut_short:
+            # Resumed runs only stream the steps they ran; the checkpoint has them all
+            state = (await workflow.aget_state({"configurable": {"thread_id": thread_id}})).values
+            if not replay and not state.get("errors"):
+                # Nothing left to resume
+                await self.checkpoints.delete(thread_id)
+        return state, cut_short
+
+    async def _run_route_request(
+        self,
+        request: RouteRequest,
+        plan: Optional[Dict[str, Any]] = None,
+        thread_id: Optional[str] = None
+    ) -> RouteResponse:
+        logger.info("Starting route request processing with prompt: %s", request.prompt)
+        started = time.perf_counter()
+        deadline = self._deadline(request)
+
+        # Enough good routes already stored for this very prompt: serve them
+        # without calling the LLM or Google at all. Routes planned for other
+        # prompts from the same start may break this one's distance, direction
+        # or climbing constraints, which are unknown before the LLM parses it,
+        # so those are only blended in below.
+        min_routes = self.settings.route_store_min_routes
+        stored = await self._stored_routes(self._prompt_start(request.prompt), min_routes, request.prompt)
+        if min_routes > 0 and len(stored) >= min_routes:
+            logger.info("Serving %d stored routes", min_routes)
+            REQUEST_SECONDS.labels(outcome="stored").observe(time.perf_counter() - started)
+            DEGRADATION_TIERS.labels(tier="full").inc()
+            return self._response([self._stored_detail(route) for route in stored[:min_routes]])
+        
+        # Initialize state
+        initial_state = self._initial_state(request, plan)
+        
+        # Run the workflow
+        cut_short = False
+        try:
+            # The state dumps are only formatted when debug logging is on
+            logger.debug("Executing workflow with initial state: %s", initial_state)
+            # Execute the workflow
+            final_state, cut_short = await self._run_workflow(
+                initial_state,
+                deadline,
+                thread_id,
+                replay=bool(request.idempotency_key)
+            )
+            logger.debug("Workflow execution completed. Final state: %s", final_state)
+        except Exception as e:
+            logger.exception("Workflow execution error: %r", e)
+            final_state = {
+                "errors": [str(e)],
+                "route_details": [],
+                "extracted_locations": [],
+                "suggested_routes": []
+            }
+        REQUEST_SECONDS.labels(outcome="error" if final_state.get("errors") else "ok").observe(
+            time.perf_counter() - started
+        )
+        
+        if final_state.get("errors"):
+            logger.warning("Workflow errors: %s", final_state["errors"])
+            # Return empty response in case of errors
+            return RouteResponse(
+                routes=[],
+                distances=[],
+                descriptions=[]
+            )
+
+        route_details = list(final_state["route_details"])
+        tier = "partial" if cut_short else worst_tier(final_state.get("tiers", []))
+        if tier != "full":
+            logger.info("Deadline degraded the response to tier %s", tier)
+        DEGRADATION_TIERS.labels(tier=tier).inc()
+        await self._save_routes(request.prompt, route_details)
+        # Blend in up to route_store_blend stored routes the workflow did not
+        # just produce, starting near the start it geocoded
+        blended = []
+        start_points = [
+            location for location in final_state.get("extracted_locations", []) if "route_index" not in location
+        ]
+        if self.settings.route_store_blend > 0 and start_points:
+            fresh = {route_key(self._store_record(request.prompt, d)) for d in route_details if d.get("points")}
+            nearby = await self._stored_routes(start_points[0], len(fresh) + self.settings.route_store_blend)
+            blended = [route for route in nearby if route_key(route) not in fresh][:self.settings.route_store_blend]
+        return self._response(route_details + [self._stored_detail(route) for route in blended], tier)
+
+    async def stream_route_request(self, request: RouteRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Run the workflow and yield events as soon as each step finishes.
+
+        Events, in order:
+        - ``start_location``: the start point name and description once the LLM plan is parsed
+        - ``start_point``: the geocoded start coordinates
+        - ``route``: one per resolved route, in completion order, with its points,
+          distance, description, encoded road geometry and elevation profile
+        - ``error``: workflow errors, after which no more routes follow
+        - ``done``: always last, with the number of routes emitted and the
+          most degraded tier the deadline forced (``partial`` if it cut the
+          stream short)
+        """
+        route_count = 0
+        tiers: List[str] = []
+        deadline = self._deadline(request)
+        updates = self._workflow.astream(
+            self._initial_state(request),
+            {"configurable": {"deadline": deadline}},
+            stream_mode="updates"
+        )
+        try:
+            while True:
+                # Only the wait for the next update runs under the timeout, never a yield
                 try:
-                    route_data = json.loads(str(llm_response.content))
+                    async with asyncio.timeout(deadline - time.time() if deadline is not None else None):
+                        update = await anext(updates)
+                except StopAsyncIteration:
+                    break
+                for node, values in update.items():
+                    values = values or {}
+                    if values.get("errors"):
+                        yield {"type": "error", "errors": values["errors"]}
+                    elif node == "parse_request" and values.get("start_location"):
+                        # Spread first, so a "type" key in the LLM's output cannot replace the event type
+                        yield {**values["start_location"], "type": "start_location"}
+                    elif node == "locate_start" and values.get("extracted_locations"):
+                        # Skipped (an empty update) after an earlier step failed
+                        start_point = values["extracted_locations"][0]
+                        yield {**RoutePoint(**start_point).model_dump(), "type": "start_point"}
+                    elif node == "plan_route":
+                        tiers += values.get("tiers", [])
+                        for route_detail in values.get("route_details", []):
+                            route_count += 1
+                            yield {
+                                "type": "route",
+                                "index": route_detail["route_index"],
+                                "points": [point.model_dump() for point in self._route_points(route_detail)],
+                                "distance": route_detail["distance"],
+                                "description": route_detail["description"],
+                                "polyline": route_detail.get("polyline"),
+                                "elevation": route_detail.get("elevation")
+                            }
+        except TimeoutError:
+            logger.info("Deadline cut the route stream short")
+            tiers.append("partial")
+        except Exception as e:
+            logger.warning("Workflow streaming error: %r", e)
+            yield {"type": "error", "errors": [str(e)]}
+        finally:
+            await updates.aclose()
+        tier = worst_tier(tiers)
+        DEGRADATION_TIERS.labels(tier=tier).inc()
+        yield {"type": "done", "route_count": route_count, "tier": tier}
+
+    @staticmethod
+    def _initial_state(request: RouteRequest, plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {
+            "prompt": request.prompt,
+            "plan": plan,
+            "start_location": {},
+            "constraints": {},
+            "suggested_routes": [],
+            "extracted_locations": [],
+            "route_details": [],
+            "tiers": [],
+            "errors": []
+        }
+
+    @staticmethod
+    def _route_points(route_detail: Dict[str, Any]) -> List[RoutePoint]:
+        return [
+            RoutePoint(
+                lat=point["lat"],
+                lng=point["lng"],
+                name=point["name"]
+            )
+            for point in route_detail["points"]
+        ]
+
+    def _create_workflow(self, checkpointer: Optional[BaseCheckpointSaver] = None):
+        """Create a LangGraph workflow for route planning.
+
+        ``parse_request`` asks the LLM for a plan and ``locate_start`` geocodes
+        the start point. Each suggested route then runs in its own parallel
+        ``plan_route`` branch (geocode waypoints, then directions), and the
+        branches fan back in through the ``route_details`` reducer, so total
+        latency follows the slowest route rather than the sum of all routes.
+        A run's wall-clock deadline, if any, is ``config["configurable"]["deadline"]``.
+
+        Returns:
+            A compiled LangGraph workflow for processing route requests.
+        """
+        # Create nodes for the workflow
+        async def parse_route_request(state: RouteState) -> Dict[str, Any]:
+            """Parse the initial route request using LLM."""
+            if state.get("plan"):
+                return state["plan"]
+            cached_plan = await self.plan_cache.aget(state["prompt"])
+            if cached_plan is not None:
+                return cached_plan
+
+            try:
+                await self._throttle("llm")
+                if self.settings.stream_llm_plan:
+                    content = await self._stream_route_plan(state["prompt"])
+                else:
+                    with observe_call("llm"):
+                        llm_response = await self._route_plan_chain.ainvoke({"user_input": state["prompt"]})
+                    record_llm_usage(llm_response)
+                    content = str(llm_response.content)
+                try:
+                    plan, complete = self._plan_from_completion(content)
                 except json.JSONDecodeError as e:
-                    return {**state, "errors": state.get("errors", []) + [f"Failed to parse LLM response: {e}"]}
-                
-                return {
-                    **state,
-                    "start_location": route_data["start_location"],
-                    "constraints": route_data["constraints"],
-                    "suggested_routes": route_data["suggested_routes"]
-                }
+                    return {"errors": state.get("errors", []) + [f"Failed to parse LLM response: {e}"]}
+
+                # A repaired or short plan serves this request but is not reused
+                if complete:
+                    self.plan_cache.set(state["prompt"], plan)
+                return plan
             except Exception as e:
-                return {**state, "errors": state.get("errors", []) + [str(e)]}
+                return {"errors": state.get("errors", []) + [str(e)]}
 
-        def extract_locations(state: RouteState) -> RouteState:
-            """Extract coordinates for all locations."""
+        async def locate_start(state: RouteState) -> Dict[str, Any]:
+            """Geocode the start location shared by every route."""
             if state.get("errors"):
-                return state
+                return {}
 
+            start_name = state["start_location"]["name"]
             try:
-                # Extract start location
-                # Use Google Maps client for geocoding
+                start_point = await self._geocode_point(start_name, "start")
+                if start_point is None:
+                    raise ValueError(f"Could not find coordinates for {start_name}")
+                # Later prompts naming it can be served from the route store
+                self.place_index.mark_start(start_name)
+            except Exception as e:
+                logger.warning("Error geocoding start location: %r", e)
+                return {"errors": state.get("errors", []) + [str(e) or repr(e)]}
+            return {"extracted_locations": [start_point]}
+
+        def fan_out_routes(state: RouteState) -> Union[str, List[Send]]:
+            """Start one plan_route branch per suggested route."""
+            if state.get("errors") or not state["suggested_routes"]:
+                return END
+            start_point = state["extracted_locations"][0]
+            radius_km = (state.get("constraints") or {}).get("radius_km")
+            if not isinstance(radius_km, (int, float)) or radius_km <= 0:
+                radius_km = self.settings.default_radius_km
+            return [
+                Send("plan_route", {
+                    "route_index": index,
+                    "route": route,
+                    "start_point": start_point,
+                    "radius_km": radius_km
+                })
+                for index, route in enumerate(state["suggested_routes"])
+            ]
+
+        async def plan_route(branch: RouteBranch, config: RunnableConfig) -> Dict[str, Any]:
+            """Geocode one route's waypoints and get its directions."""
+            route_index = branch["route_index"]
+            start_point = branch["start_point"]
+            deadline = config["configurable"].get("deadline")
+            tiers = ["full"]
+
+            async def geocode_waypoint(point: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+                name = point.get("name")
+                # Geocode calls must finish with enough budget left to route
+                budget = _remaining(deadline) - self.settings.deadline_geocode_reserve
                 try:
-                    # Use geocoding module function
-                    start_result = geocoding.geocode(self.gmaps, state["start_location"]["name"])
-                    if not start_result:
-                        raise ValueError(f"Could not find coordinates for {state['start_location']['name']}")
-                    
-                    location = start_result[0]['geometry']['location']
-                    start_location = {
-                        "name": state["start_location"]["name"],
-                        "lat": location['lat'],
-                        "lng": location['lng'],
-                        "type": "start"
-                    }
+                    if budget <= 0 and not self._known_location(name)[0]:
+                        raise TimeoutError
+                    return await asyncio.wait_for(
+                        self._geocode_point(name, "waypoint"),
+                        timeout=budget if 0 < budget < float("inf") else None
+                    )
+                except TimeoutError:
+                    tiers.append("skip_geocodes")
+                    logger.info("Skipping waypoint %s of route %d: deadline near", name, route_index)
+                    return None
                 except Exception as e:
-                    print(f"Error geocoding start location: {e}")
-                    raise
-                
-                # Extract waypoint locations
-                extracted_locations = [start_location]
-                for route in state["suggested_routes"]:
-                    route_locations = []
-                    for point in route["waypoints"]:
-                        try:
-                            # Use geocoding module function
-                            result = geocoding.geocode(self.gmaps, point["name"])
-                            if result:
-                                location_data = result[0]['geometry']['location']
-                                location = {
-                                    "name": point["name"],
-                                    "lat": location_data['lat'],
-                                    "lng": location_data['lng'],
-                                    "type": "waypoint"
-                                }
-                                route_locations.append(location)
-                        except Exception as e:
-                            print(f"Error geocoding waypoint {point['name']}: {e}")
-                            continue
-                            route_locations.append(location)
-                    extracted_locations.append({
-                        "route_index": len(extracted_locations) - 1,
-                        "locations": route_locations
-                    })
-                
-                return {**state, "extracted_locations": extracted_locations}
-            except Exception as e:
-                return {**state, "errors": state.get("errors", []) + [str(e)]}
+                    logger.warning("Error geocoding waypoint %s: %r", name, e)
+                    return None
 
-        def get_route_details(state: RouteState) -> RouteState:
-            """Get route details from Google Maps."""
-            if state.get("errors"):
-                return state
+            # gather keeps submission order, so waypoint order is preserved;
+            # waypoints that fail or cannot be found are skipped.
+            geocoded = await asyncio.gather(*(geocode_waypoint(point) for point in branch["route"]["waypoints"]))
+            # Out-of-range and duplicate waypoints are dropped before any
+            # directions are requested for them
+            locations, dropped = filter_waypoints(
+                start_point,
+                [location for location in geocoded if location],
+                branch["radius_km"]
+            )
+            DROPPED_WAYPOINTS.inc(len(dropped))
+            for location in dropped:
+                logger.info(
+                    "Dropping waypoint %s of route %d: outside %s km or duplicate",
+                    location['name'], route_index, branch['radius_km']
+                )
+            update: Dict[str, Any] = {
+                "extracted_locations": [{"route_index": route_index, "locations": locations}]
+            }
+            if not locations:
+                update["tiers"] = [worst_tier(tiers)]
+                return update
 
-            try:
-                route_details = []
-                start_point = state["extracted_locations"][0]  # Start location is directly in the list
-                
-                for route_data in state["extracted_locations"][1:]:
-                    if not route_data["locations"]:
-                        continue
-                        
-                    try:
-                        # Use Google Maps client for directions
-                        try:
-                            origin = f"{start_point['lat']},{start_point['lng']}"
-                            destination = f"{route_data['locations'][-1]['lat']},{route_data['locations'][-1]['lng']}"
-                            waypoints = [f"{p['lat']},{p['lng']}" for p in route_data['locations'][:-1]]
-                            
-                            # Use directions module function
-                            route_directions = directions.directions(
-                                self.gmaps,
-                                origin=origin,
-                                destination=destination,
-                                waypoints=waypoints if waypoints else None,
-                                mode="bicycling",
-                                alternatives=False
-                            )
+            points = [start_point] + locations
+            path = [(p['lat'], p['lng']) for p in points]
+            details = await self._local_route(path, primary=True)
+            # The Directions call must finish with enough budget left for the
+            # fallback, or the run deadline would cut the fallback off too
+            budget = _remaining(deadline) - self.settings.deadline_directions_reserve
+            if details is None and budget <= 0:
+                # No time for a Directions call
+                tiers.append("local_routing")
+                details = await self._route_without_directions(path)
+            elif details is None:
+                try:
+                    route_directions = await asyncio.wait_for(
+                        self._cycling_directions(path),
+                        timeout=min(self.settings.directions_timeout, budget)
+                    )
+                    if not route_directions:
+                        raise ValueError("No route found")
+                    details = await self._directions_details(route_directions[0])
+                except Exception as e:
+                    logger.warning("Error getting directions for route %d: %r", route_index, e)
+                    if isinstance(e, TimeoutError) and budget < self.settings.directions_timeout:
+                        # The request deadline cut the call short
+                        tiers.append("local_routing")
+                        details = await self._route_without_directions(path)
+                    else:
+                        details = await self._local_route(path, primary=False)
+                    if details is not None:
+                        FALLBACKS.labels(kind="local_graph").inc()
+            if details is None:
+                FALLBACKS.labels(kind="straight_line").inc()
+                # Straight-line distance through all points as last resort
+                distance = path_length_m(points) / 1000
+                details = {
+                    "distance": distance,
+                    "duration": int(distance * 300),  # Rough estimate: 20 km/h average speed
+                    "polyline": None
+                }
 
-                            if not route_directions:
-                                raise ValueError("No route found")
-                                
-                        except Exception as e:
-                            print(f"Error getting directions: {e}")
-                            raise
-                        
-                        if route_directions:
-                            route = route_directions[0] if isinstance(route_directions, list) else route_directions
-                            distance = sum(leg.get("distance", {}).get("value", 0) for leg in route.get("legs", [])) / 1000
-                            duration = sum(leg.get("duration", {}).get("value", 0) for leg in route.get("legs", []))
-                            
-                            route_details.append({
-                                "distance": distance,
-                                "duration": duration,
-                                "points": [start_point] + route_data["locations"],
-                                "description": state["suggested_routes"][route_data["route_index"]]["description"]
-                            })
-                    except Exception as e:
-                        print(f"Error getting directions for route {route_data['route_index']}: {e}")
-                        # Calculate straight-line distance as fallback
-                        from math import radians, sin, cos, sqrt, atan2
-                        def haversine_distance(lat1, lon1, lat2, lon2):
-                            R = 6371  # Earth's radius in kilometers
-                            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-                            dlat = lat2 - lat1
-                            dlon = lon2 - lon1
-                            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                            c = 2 * atan2(sqrt(a), sqrt(1-a))
-                            return R * c
-
-                        # Calculate total distance through all points
-                        points = [start_point] + route_data["locations"]
-                        total_distance = sum(
-                            haversine_distance(
-                                points[i]["lat"], points[i]["lng"],
-                                points[i+1]["lat"], points[i+1]["lng"]
-                            )
-                            for i in range(len(points)-1)
-                        )
-                        
-                        route_details.append({
-                            "distance": total_distance,
-                            "duration": int(total_distance * 300),  # Rough estimate: 20 km/h average speed
-                            "points": points,
-                            "description": state["suggested_routes"][route_data["route_index"]]["description"]
-                        })
-                
-                return {**state, "route_details": route_details}
-            except Exception as e:
-                return {**state, "errors": state.get("errors", []) + [str(e)]}
+            if self.dem is not None:
+                details["elevation"] = await asyncio.to_thread(self._route_elevation, details.get("polyline"), points)
+
+            update["route_details"] = [{
+                "route_index": route_index,
+                **details,
+                "points": points,
+                "description": branch["route"].get("description", "")
+            }]
+            update["tiers"] = [worst_tier(tiers)]
+            return update
 
         # Create the workflow graph
         workflow = StateGraph(RouteState)
         
-        # Add nodes
-        workflow.add_node("parse_request", parse_route_request)
-        workflow.add_node("extract_locations", extract_locations)
-        workflow.add_node("get_route_details", get_route_details)
+        # Add nodes, each timed into the route_node_seconds histogram
+        workflow.add_node("parse_request", timed_node("parse_request", parse_route_request))
+        workflow.add_node("locate_start", timed_node("locate_start", locate_start))
+        workflow.add_node("plan_route", timed_node("plan_route", plan_route))
         
-        # Define edges
-        workflow.add_edge("parse_request", "extract_locations")
-        workflow.add_edge("extract_locations", "get_route_details")
+        # Define edges; plan_route branches end the run once all have finished
+        workflow.add_edge("parse_request", "locate_start")
+        workflow.add_conditional_edges("locate_start", fan_out_routes, ["plan_route", END])
+        workflow.add_edge("plan_route", END)
         
-        # Set entry and exit points
-        # Set the entry point and exit point
+        # Set the entry point
         workflow = workflow.set_entry_point("parse_request")
-        workflow = workflow.set_finish_point("get_route_details")
         
         # Return the compiled workflow
-        return workflow.compile()
+        return workflow.compile(checkpointer=checkpointer)
 
     async def _extract_locations(self, text: str) -> List[Dict[str, Any]]:
         """Extract location coordinates using LLM and Google Maps API."""
         if not text:
             return []
-        prompt_template = ChatPromptTemplate.from_template("""
-場所の名前から正確な住所を抽出してください。
 
-場所: {location}
-
-以下の形式でJSONを返してください:
-{
-    "address": "完全な住所（都道府県から）"
-}
-""")
-        
         # Get full address using LLM
-        chain = prompt_template | self.llm
-        llm_response = await chain.ainvoke({"location": text})
+        await self._throttle("llm")
+        with observe_call("llm"):
+            llm_response = await self._address_chain.ainvoke({"location": text})
+        record_llm_usage(llm_response)
         try:
             address_data = json.loads(str(llm_response.content))
         except json.JSONDecodeError as e:
-            print(f"Failed to parse LLM response: {e}")
+            logger.warning("Failed to parse LLM response: %s", e)
             return []
         
         try:
-            # Use geocoding module function
-            geocode_result = geocoding.geocode(self.gmaps, address_data["address"])
-            if geocode_result:
-                location = geocode_result[0]["geometry"]["location"]
+            location = await self._geocode_location(address_data["address"])
+            if location:
                 return [{
                     "name": text,
                     "lat": location["lat"],
@@ -359,26 +1240,19 @@ class RouteAgent:
                     "type": "waypoint"
                 }]
         except Exception as e:
-            print(f"Error geocoding {text}: {e}")
+            logger.warning("Error geocoding %s: %s", text, e)
             return []
         
         return []
 
     async def _get_route_from_google_maps(self, points: List[RoutePoint]) -> Dict[str, Any]:
-        """Get cycling route information from Google Maps Directions API."""
+        """Get cycling route information from Google Maps Directions API or the offline road graph."""
+        path = [(p.lat, p.lng) for p in points]
+        details = await self._local_route(path, primary=True)
+        if details is not None:
+            return {**details, "points": [point.dict() for point in points]}
         try:
-            # Convert points to waypoints format
-            waypoints = points[1:-1]  # Exclude start and end points
-            
-            # Request directions using directions module function
-            route_directions = directions.directions(
-                self.gmaps,
-                origin=f"{points[0].lat},{points[0].lng}",
-                destination=f"{points[-1].lat},{points[-1].lng}",
-                waypoints=[f"{p.lat},{p.lng}" for p in waypoints] if waypoints else None,
-                mode="bicycling",
-                alternatives=False
-            )
+            route_directions = await self._cycling_directions(path)
             
             if route_directions:
                 route = route_directions[0]
@@ -400,30 +1274,20 @@ class RouteAgent:
                 return {
                     "distance": distance,
                     "duration": duration,
-                    "points": route_points
+                    "points": route_points,
+                    "polyline": await asyncio.to_thread(self._route_polyline, route)
                 }
         except Exception as e:
-            print(f"Error getting directions: {e}")
-        
-        # Fallback: Calculate straight-line distances between points
-        from math import radians, sin, cos, sqrt, atan2
-        def haversine_distance(lat1, lon1, lat2, lon2):
-            R = 6371  # Earth's radius in kilometers
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            return R * c
-
-        # Calculate total distance through all points
-        total_distance = sum(
-            haversine_distance(
-                points[i].lat, points[i].lng,
-                points[i+1].lat, points[i+1].lng
-            )
-            for i in range(len(points)-1)
-        )
+            logger.warning("Error getting directions: %s", e)
+
+        details = await self._local_route(path, primary=False)
+        if details is not None:
+            FALLBACKS.labels(kind="local_graph").inc()
+            return {**details, "points": [point.dict() for point in points]}
+        FALLBACKS.labels(kind="straight_line").inc()
+
+        # Last resort: straight-line distance through all points
+        total_distance = path_length_m(points) / 1000
 
         return {
             "distance": total_distance,
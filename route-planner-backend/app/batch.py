@@ -0,0 +1,125 @@
+"""Plan routes for many requests at once.
+
+Used by ``POST /api/route/batch`` and as a CLI for nightly pre-generation:
+
+    python -m app.batch prompts.jsonl -o results.jsonl --concurrency 8
+
+The input has one ``RouteRequest`` JSON object (or one plain-text prompt) per
+line; each output line is one result event as produced by ``run_batch``.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from app.models import RouteRequest
+from app.plan_cache import normalize_prompt
+
+if TYPE_CHECKING:
+    from app.agent import RouteAgent
+
+
+async def run_batch(
+    agent: "RouteAgent",
+    requests: Sequence[RouteRequest],
+    concurrency: Optional[int] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``requests`` through ``agent`` and yield one event per request as it finishes.
+
+    Requests that ``process_route_request`` would coalesce (same normalized
+    prompt and deadline, or same idempotency key) run once and share the
+    result.
+    At most ``concurrency`` (default: the agent's ``batch_concurrency``)
+    workflows run at a time; geocode and directions lookups are shared with
+    every other request through the agent's caches and in-flight
+    deduplication, and provider rate limits apply across the whole batch.
+    When the LLM client batches natively, all plans are requested in one
+    call up front.
+
+    Events are ``{"type": "result", "index", "response"}`` or
+    ``{"type": "error", "index", "error"}``, followed by a final
+    ``{"type": "done", "count", "failed"}``.
+    """
+    limit = max(1, concurrency or agent.settings.batch_concurrency)
+    groups: "OrderedDict[str, List[int]]" = OrderedDict()
+    for index, request in enumerate(requests):
+        groups.setdefault(agent.request_key(request), []).append(index)
+
+    plans: Dict[str, Dict[str, Any]] = {}
+    if agent.supports_batch_planning:
+        # Plans depend on the prompt alone, so requests differing only in deadline share one
+        plans = await agent.plan_batch([requests[indexes[0]].prompt for indexes in groups.values()])
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(indexes: List[int]) -> Any:
+        request = requests[indexes[0]]
+        async with semaphore:
+            try:
+                return indexes, await agent.process_route_request(request, plan=plans.get(normalize_prompt(request.prompt)))
+            except Exception as e:
+                return indexes, e
+
+    tasks = [asyncio.ensure_future(run(indexes)) for indexes in groups.values()]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indexes, outcome = await next_done
+            for index in indexes:
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    yield {"type": "error", "index": index, "error": str(outcome) or repr(outcome)}
+                else:
+                    yield {"type": "result", "index": index, "response": outcome.model_dump()}
+    finally:
+        # The consumer went away (e.g. the client disconnected); stop the rest
+        for task in tasks:
+            task.cancel()
+    yield {"type": "done", "count": len(requests), "failed": failed}
+
+
+def _read_requests(lines: Sequence[str]) -> List[RouteRequest]:
+    requests = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            requests.append(RouteRequest.model_validate_json(line))
+        else:
+            requests.append(RouteRequest(prompt=line))
+    return requests
+
+
+async def _main(args: argparse.Namespace) -> None:
+    # Builds the agent exactly as the server does (.env, AgentSettings.from_env)
+    from app.main import get_route_agent
+
+    with open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin as f:
+        requests = _read_requests(f.readlines())
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    agent = get_route_agent()
+    try:
+        async for event in run_batch(agent, requests, args.concurrency):
+            out.write(json.dumps(event, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        # Closes the checkpoint connection (whose thread would keep the
+        # process alive) and the route store pool
+        await agent.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Plan cycling routes for many prompts")
+    parser.add_argument("input", help="JSONL of RouteRequest objects or one prompt per line; - for stdin")
+    parser.add_argument("-o", "--output", help="Write result events here instead of stdout")
+    parser.add_argument("--concurrency", type=int, help="Requests in flight at once (default: BATCH_CONCURRENCY)")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentLRUCache:
+    """Bounded in-memory LRU cache with an optional SQLite backing file.
+
+    Values must be JSON-serializable. ``None`` is stored as a negative entry
+    ("looked up, nothing found") and expires after ``negative_ttl`` instead of
+    ``ttl``. The in-memory tier is bounded by ``maxsize``; the SQLite tier
+    survives restarts and is purged of expired rows when opened.
+
+    Only the in-memory tier is touched inline. ``set`` queues the row for a
+    background writer thread, which commits queued rows in batches, one
+    transaction each; ``aget`` reads the SQLite tier in a worker thread on a
+    memory miss. ``peek`` never reads the file, and ``get`` reads it
+    synchronously (for code that does not run on the event loop).
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 1024,
+        ttl: float = 7 * 24 * 3600,
+        negative_ttl: float = 3600,
+        path: Optional[str] = None
+    ):
+        if not re.fullmatch(r"[a-z_]+", namespace):
+            raise ValueError(f"Invalid cache namespace: {namespace}")
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expired": 0,
+            "disk_writes": 0
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        # Serializes use of the connection, which is shared by the writer
+        # thread and the threads reading through it
+        self._db_lock = threading.Lock()
+        # Rows waiting for the writer thread: key -> (value JSON, expires_at)
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {namespace} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(f"DELETE FROM {namespace} WHERE expires_at <= ?", (time.time(),))
+
+    def _normalize(self, key: str) -> str:
+        return key
+
+    def peek(self, key: str) -> Tuple[bool, Any]:
+        """Look a key up in the in-memory tier only.
+
+        Returns a ``(found, value)`` pair so that a cached negative entry
+        (``found=True, value=None``) can be told apart from a miss. Misses are
+        not counted: a caller that peeks follows up with ``aget``.
+        """
+        return self._memory_get(self._normalize(key))
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Look a key up in memory, then synchronously in the SQLite tier; ``(found, value)``."""
+        key = self._normalize(key)
+        found, value = self._memory_get(key)
+        if found:
+            return found, value
+        return self._disk_get(key)
+
+    async def aget(self, key: str) -> Tuple[bool, Any]:
+        """Like ``get``, but the SQLite tier is read in a worker thread."""
+        key = self._normalize(key)
+        found, value = self._memory_get(key)
+        if found or self._db is None:
+            if not found:
+                with self._lock:
+                    self._counters["misses"] += 1
+            return found, value
+        return await asyncio.to_thread(self._disk_get, key)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, or a negative entry when ``value`` is None.
+
+        The SQLite row is written later by the writer thread.
+        """
+        key = self._normalize(key)
+        expires_at = time.time() + (self.negative_ttl if value is None else self.ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is None:
+                return
+            self._pending[key] = (json.dumps(value, ensure_ascii=False), expires_at)
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name=f"cache-{self.namespace}", daemon=True
+                )
+                self._writer.start()
+        self._wake.set()
+
+    def flush(self) -> None:
+        """Write every queued row to the SQLite tier now, in one transaction."""
+        # Held from taking the rows to committing them, so batches land in
+        # order and a reader never misses a row between queue and file
+        with self._db_lock:
+            with self._lock:
+                rows = [(key, value, expires_at) for key, (value, expires_at) in self._pending.items()]
+                self._pending.clear()
+            if not rows or self._db is None:
+                return
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {self.namespace} (key, value, expires_at) VALUES (?, ?, ?)",
+                    rows
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        with self._lock:
+            self._counters["disk_writes"] += len(rows)
+
+    def _write_loop(self) -> None:
+        while self._db is not None:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # The rows stay in memory; only their persistence is lost
+                logger.warning("Error writing the %s cache: %r", self.namespace, e)
+
+    def items(self, limit: Optional[int] = None) -> List[Tuple[str, Any]]:
+        """Return unexpired ``(key, value)`` pairs, most recently stored first.
+
+        Reads the SQLite tier when there is one, otherwise the in-memory tier.
+        """
+        now = time.time()
+        if self._db is not None:
+            self.flush()
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT key, value FROM {self.namespace} WHERE expires_at > ? "
+                    "ORDER BY expires_at DESC LIMIT ?",
+                    (now, -1 if limit is None else limit)
+                ).fetchall()
+            return [(key, json.loads(value)) for key, value in rows]
+        with self._lock:
+            entries = [(key, value) for key, (value, expires_at) in reversed(self._memory.items()) if expires_at > now]
+        return entries if limit is None else entries[:limit]
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(f"DELETE FROM {self.namespace}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current in-memory size."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._memory),
+                "maxsize": self.maxsize,
+                "pending_writes": len(self._pending),
+                "hit_ratio": self._counters["hits"] / lookups if lookups else 0.0
+            }
+
+    def close(self) -> None:
+        """Write the queued rows, then close the SQLite tier."""
+        if self._db is None:
+            return
+        self.flush()
+        with self._db_lock:
+            self._db.close()
+            self._db = None
+        # Lets the writer thread see the closed connection and exit
+        self._wake.set()
+
+    def _memory_get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return False, None
+            if entry[1] > now:
+                self._memory.move_to_end(key)
+                return self._hit(entry[0])
+            del self._memory[key]
+            self._counters["expired"] += 1
+            return False, None
+
+    def _disk_get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        row = None
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            row = pending
+        elif self._db is not None:
+            with self._db_lock:
+                if self._db is not None:
+                    row = self._db.execute(
+                        f"SELECT value, expires_at FROM {self.namespace} WHERE key = ?", (key,)
+                    ).fetchone()
+        with self._lock:
+            if row is not None and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self._counters["disk_hits"] += 1
+                return self._hit(value)
+            self._counters["misses"] += 1
+            return False, None
+
+    def _hit(self, value: Any) -> Tuple[bool, Any]:
+        self._counters["hits"] += 1
+        if value is None:
+            self._counters["negative_hits"] += 1
+        return True, value
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+
+# Trailing qualifiers that do not change which place is meant
+_PLACE_SUFFIXES = ("日本国", "日本", "japan")
+_STRIP_CHARS = " ,.、。・"
+# Whitespace between two non-ASCII characters ("樟葉 駅") carries no meaning
+_CJK_SPACE = re.compile(r"(?<=[^\x00-\x7f])\s+(?=[^\x00-\x7f])")
+
+
+def normalize_place_name(name: str) -> str:
+    """Normalize a place name into a cache key.
+
+    Applies Unicode NFKC (full-width to half-width, compatibility forms),
+    case folding, whitespace collapsing and removal of trailing country
+    suffixes and punctuation, so "樟葉駅", " 樟葉　駅 " and "樟葉駅, Japan"
+    share one key.
+    """
+    key = unicodedata.normalize("NFKC", name).casefold()
+    key = _CJK_SPACE.sub("", " ".join(key.split()))
+    key = key.strip(_STRIP_CHARS)
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in _PLACE_SUFFIXES:
+            if key.endswith(suffix) and len(key) > len(suffix):
+                key = key[:-len(suffix)].rstrip(_STRIP_CHARS)
+                stripped = True
+    return key
+
+
+class GeocodeCache(PersistentLRUCache):
+    """Geocode results keyed by normalized place name.
+
+    Values are ``{"lat": ..., "lng": ...}`` dicts, or None when Google had no
+    result for the name.
+    """
+
+    def __init__(self, **kwargs: Any):
+        super().__init__("geocode", **kwargs)
+
+    def _normalize(self, key: str) -> str:
+        return normalize_place_name(key)
+
+
+LatLng = Tuple[float, float]
+
+
+def _quantize(point: LatLng, precision: int) -> str:
+    # "+ 0.0" turns a rounded -0.0 into 0.0 so both format the same way
+    return f"{round(point[0], precision) + 0.0:.{precision}f},{round(point[1], precision) + 0.0:.{precision}f}"
+
+
+def directions_key(
+    origin: LatLng,
+    destination: LatLng,
+    waypoints: Sequence[LatLng],
+    mode: str,
+    precision: int = 5
+) -> str:
+    """Build a directions cache key from coordinates quantized to ``precision`` decimals.
+
+    The waypoint count and every waypoint, in order, are part of the key, so a
+    request through a subset or a reordering of waypoints never matches a
+    cached route.
+    """
+    parts = [mode, _quantize(origin, precision), _quantize(destination, precision), str(len(waypoints))]
+    parts.extend(_quantize(point, precision) for point in waypoints)
+    return "|".join(parts)
+
+
+class DirectionsCache(PersistentLRUCache):
+    """Directions API results keyed by quantized origin, destination, waypoints and mode.
+
+    Values are the raw ``directions.directions`` result lists, or None when
+    Google found no route.
+    """
+
+    def __init__(self, precision: int = 5, **kwargs: Any):
+        super().__init__("directions", **kwargs)
+        self.precision = precision
+
+    def key(self, origin: LatLng, destination: LatLng, waypoints: Sequence[LatLng], mode: str) -> str:
+        return directions_key(origin, destination, waypoints, mode, self.precision)
@@ -0,0 +1,148 @@
+"""LangGraph checkpoints of route workflow runs, so a retried request resumes.
+
+With a checkpointer every finished workflow step (the LLM plan, the start
+geocode, each route branch) is saved under the run's thread id. A retry of a
+run that failed or was cut short continues from its last completed step
+instead of paying for the LLM call and geocodes again.
+
+``SqliteCheckpointStore`` keeps checkpoints in a local SQLite file
+(``CHECKPOINT_PATH=/var/lib/route-planner/checkpoints.db``), so they survive
+restarts; ``MemoryCheckpointStore`` keeps them in process
+(``CHECKPOINT_PATH=memory``). Threads unused for ``ttl`` seconds are deleted.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional, Union
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+_THREADS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint_threads (
+    thread_id TEXT PRIMARY KEY,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkpoint_threads_used_at ON checkpoint_threads (used_at);
+"""
+
+
+class MemoryCheckpointStore:
+    """In-process checkpoints; lost on restart."""
+
+    def __init__(self, ttl: float = 3600.0):
+        self.ttl = ttl
+        self.saver = MemorySaver()
+        # Thread id -> when a run last used it
+        self._used: Dict[str, float] = {}
+        self._counters = {"deleted": 0, "expired": 0}
+
+    async def open(self) -> BaseCheckpointSaver:
+        return self.saver
+
+    async def close(self) -> None:
+        pass
+
+    async def touch(self, thread_id: str) -> None:
+        """Mark a thread as used now, and delete threads unused for ``ttl`` seconds."""
+        now = time.time()
+        self._used[thread_id] = now
+        for expired in [t for t, used_at in self._used.items() if used_at < now - self.ttl]:
+            self._forget(expired)
+            self._counters["expired"] += 1
+
+    async def delete(self, thread_id: str) -> None:
+        self._forget(thread_id)
+        self._counters["deleted"] += 1
+
+    def _forget(self, thread_id: str) -> None:
+        self._used.pop(thread_id, None)
+        self.saver.storage.pop(thread_id, None)
+        for key in [key for key in self.saver.writes if key[0] == thread_id]:
+            del self.saver.writes[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "threads": len(self._used)}
+
+
+class SqliteCheckpointStore:
+    """Checkpoints in a local SQLite file, opened (and its tables created) on first use."""
+
+    def __init__(self, path: str, ttl: float = 3600.0):
+        try:
+            import aiosqlite  # noqa: F401
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "SQLite checkpoints require langgraph-checkpoint-sqlite (pip install langgraph-checkpoint-sqlite)"
+            ) from e
+        self.path = path
+        self.ttl = ttl
+        self.saver: Optional[Any] = None
+        self._open_lock = asyncio.Lock()
+        # Expiry scans run at most this often
+        self._expire_interval = max(1.0, ttl / 10)
+        self._expired_at = 0.0
+        self._counters = {"deleted": 0, "expired": 0}
+
+    async def open(self) -> BaseCheckpointSaver:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        async with self._open_lock:
+            if self.saver is None:
+                saver = AsyncSqliteSaver(await aiosqlite.connect(self.path))
+                await saver.setup()
+                await saver.conn.executescript(_THREADS_SCHEMA)
+                await saver.conn.commit()
+                self.saver = saver
+        return self.saver
+
+    async def close(self) -> None:
+        if self.saver is not None:
+            await self.saver.conn.close()
+            self.saver = None
+
+    async def touch(self, thread_id: str) -> None:
+        """Mark a thread as used now, and delete threads unused for ``ttl`` seconds."""
+        saver = await self.open()
+        now = time.time()
+        async with saver.lock:
+            await saver.conn.execute(
+                "INSERT INTO checkpoint_threads (thread_id, used_at) VALUES (?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET used_at = excluded.used_at",
+                (thread_id, now)
+            )
+            if now - self._expired_at >= self._expire_interval:
+                self._expired_at = now
+                self._counters["expired"] += await self._delete_where("used_at < ?", (now - self.ttl,))
+            await saver.conn.commit()
+
+    async def delete(self, thread_id: str) -> None:
+        saver = await self.open()
+        async with saver.lock:
+            self._counters["deleted"] += await self._delete_where("thread_id = ?", (thread_id,))
+            await saver.conn.commit()
+
+    async def _delete_where(self, condition: str, params: tuple) -> int:
+        """Delete the checkpoints, writes and bookkeeping of threads matching ``condition``; returns the thread count."""
+        conn = self.saver.conn
+        threads = f"SELECT thread_id FROM checkpoint_threads WHERE {condition}"
+        await conn.execute(f"DELETE FROM writes WHERE thread_id IN ({threads})", params)
+        await conn.execute(f"DELETE FROM checkpoints WHERE thread_id IN ({threads})", params)
+        cursor = await conn.execute(f"DELETE FROM checkpoint_threads WHERE {condition}", params)
+        return max(cursor.rowcount, 0)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+
+CheckpointStore = Union[MemoryCheckpointStore, SqliteCheckpointStore]
+
+
+def create_checkpoint_store(path: Optional[str], ttl: float = 3600.0) -> Optional[CheckpointStore]:
+    """Build the store ``path`` names: ``memory``, a SQLite file path, or None for no checkpoints."""
+    if not path:
+        return None
+    if path == "memory":
+        return MemoryCheckpointStore(ttl)
+    return SqliteCheckpointStore(path, ttl)
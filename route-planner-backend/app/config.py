@@ -0,0 +1,221 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+# Curated cycling POIs bundled with the app
+DEFAULT_PLACES_PATH = os.path.join(os.path.dirname(__file__), "data", "cycling_pois.json")
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_optional_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_str(name: str, default: Optional[str]) -> Optional[str]:
+    # An explicitly empty variable disables the setting
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value or None
+
+
+@dataclass(frozen=True)
+class AgentSettings:
+    """Runtime tuning knobs for RouteAgent."""
+    # Stream the LLM plan and start geocoding places while it is still generating
+    stream_llm_plan: bool = True
+    # In-memory LLM plan cache entries and how long a plan is reused, in seconds
+    plan_cache_size: int = 256
+    plan_cache_ttl: float = 24 * 3600
+    # SQLite file backing the plan cache; None keeps it in memory only
+    plan_cache_path: Optional[str] = None
+    # Opt-in: reuse a cached plan for a paraphrased prompt whose character
+    # n-gram cosine similarity is at least this value (e.g. 0.9)
+    plan_similarity_threshold: Optional[float] = None
+    # Size of the thread pool used for blocking Google Maps HTTP calls
+    maps_max_workers: int = 8
+    # Google Maps API base URL (e.g. a local stub server); None is the real API
+    maps_base_url: Optional[str] = None
+    # Seconds one Maps HTTP request may take before it is retried
+    maps_attempt_timeout: float = 5.0
+    # Tries per Maps call on transient errors (5xx, 429, OVER_QUERY_LIMIT,
+    # connection errors, timeouts), with full-jitter backoff between them
+    maps_max_attempts: int = 3
+    maps_backoff_base: float = 0.2
+    maps_backoff_max: float = 2.0
+    # Send a duplicate Maps request when the first has not answered after this
+    # many seconds (e.g. the p95 latency); None disables hedging
+    maps_hedge_delay: Optional[float] = None
+    # Maximum geocode calls in flight at once, shared by all requests
+    geocode_concurrency: int = 8
+    # Calls per second allowed to each provider across all requests; None is unlimited
+    llm_rate_limit: Optional[float] = None
+    geocode_rate_limit: Optional[float] = None
+    directions_rate_limit: Optional[float] = None
+    # Route requests a batch works on at once
+    batch_concurrency: int = 8
+    # Seconds a route request may take unless it sets its own deadline; None for no limit
+    request_deadline: Optional[float] = None
+    # With less than this many seconds left, waypoints that still need a
+    # geocode call are skipped
+    deadline_geocode_reserve: float = 4.0
+    # Directions calls stop with this many seconds left; routes then come
+    # from cached directions or the local graph instead
+    deadline_directions_reserve: float = 2.0
+    # Where workflow checkpoints are kept so retried requests resume: a SQLite
+    # file path, "memory" for in-process, or None for no checkpoints
+    checkpoint_path: Optional[str] = None
+    # Seconds a checkpointed run is kept after its last use
+    checkpoint_ttl: float = 3600.0
+    # /api/route bodies smaller than this are sent uncompressed
+    response_compress_min_bytes: int = 1024
+    # Compression effort for /api/route bodies: gzip level (1-9) and brotli
+    # quality (0-11); higher levels cost far more CPU for a few % smaller bodies
+    response_gzip_level: int = 5
+    response_brotli_quality: int = 4
+    # Workers running queued route jobs, waiting jobs allowed before new ones
+    # get 429, and seconds a finished job's result stays readable
+    job_workers: int = 8
+    job_queue_depth: int = 64
+    job_result_ttl: float = 600.0
+    # Seconds before a geocode call, retries included, is abandoned
+    geocode_timeout: float = 10.0
+    # In-memory geocode cache entries; older entries fall back to the SQLite file
+    geocode_cache_size: int = 2048
+    # Seconds a found / not-found geocode result stays valid
+    geocode_cache_ttl: float = 30 * 24 * 3600
+    geocode_negative_ttl: float = 24 * 3600
+    # SQLite file backing the geocode cache; None keeps it in memory only
+    geocode_cache_path: Optional[str] = None
+    # Seconds a route's directions call may take before that route falls back
+    # to straight-line distances; other routes are not held up by it
+    directions_timeout: float = 15.0
+    # Max deviation in meters when simplifying route geometry for the response
+    polyline_tolerance_m: float = 5.0
+    # Decimal places directions cache keys are rounded to (5 is about 1 m)
+    directions_cache_precision: int = 5
+    # In-memory directions cache entries and their lifetimes in seconds
+    directions_cache_size: int = 512
+    directions_cache_ttl: float = 7 * 24 * 3600
+    directions_negative_ttl: float = 3600
+    # SQLite file backing the directions cache; None keeps it in memory only
+    directions_cache_path: Optional[str] = None
+    # Curated POI file (JSON) whose places resolve without geocoding; None disables it
+    places_path: Optional[str] = DEFAULT_PLACES_PATH
+    # Geocoded points within this many meters of a known place are moved onto it
+    place_snap_distance_m: float = 150.0
+    # Waypoint radius around the start when the plan gives no
+    # constraints.radius_km; None accepts waypoints at any distance
+    default_radius_km: Optional[float] = 100.0
+    # Road graph file built with `python -m app.local_router build`; None
+    # disables offline routing
+    local_graph_path: Optional[str] = None
+    # "fallback" routes on the local graph only when Google fails; "primary"
+    # tries the local graph first and calls Google only if it finds no route
+    local_routing_mode: str = "fallback"
+    # Max meters between a requested point and the road node it snaps to
+    local_snap_distance_m: float = 500.0
+    # Directory of SRTM .hgt (or GeoTIFF) tiles; None leaves routes without elevation
+    dem_path: Optional[str] = None
+    # DEM tiles kept memory-mapped at once (a 1" tile maps 25 MB)
+    dem_cache_tiles: int = 16
+    # Meters between elevation profile samples, and the smallest climb or
+    # descent counted towards the totals
+    elevation_spacing_m: float = 100.0
+    elevation_threshold_m: float = 3.0
+    # Where resolved routes are saved: a PostgreSQL conninfo/URL, "memory" for
+    # an in-process store, or None to keep nothing
+    route_store_url: Optional[str] = None
+    # Maximum connections in the route store's pool
+    route_store_pool_size: int = 4
+    # Stored routes starting within this many meters of the prompt's start count as nearby
+    route_store_radius_m: float = 2000.0
+    # Serve a request from the store, skipping the LLM and Maps entirely, when
+    # at least this many nearby routes are stored for the same (normalized)
+    # prompt; 0 never serves from it. Routes stored for other prompts are
+    # never served, since they may not meet this prompt's distance, direction
+    # or climbing constraints; route_store_blend mixes them in instead.
+    route_store_min_routes: int = 3
+    # Stored nearby routes, from any prompt, appended to freshly planned ones
+    route_store_blend: int = 0
+    # Stored routes older than this many seconds are not reused; 0 for no limit
+    route_store_max_age: float = 7 * 24 * 3600.0
+
+    @classmethod
+    def from_env(cls) -> "AgentSettings":
+        """Build settings from environment variables, falling back to defaults."""
+        return cls(
+            stream_llm_plan=_env_bool("STREAM_LLM_PLAN", cls.stream_llm_plan),
+            plan_cache_size=_env_int("PLAN_CACHE_SIZE", cls.plan_cache_size),
+            plan_cache_ttl=_env_float("PLAN_CACHE_TTL", cls.plan_cache_ttl),
+            plan_cache_path=_env_str("PLAN_CACHE_PATH", ".cache/plans.sqlite3"),
+            plan_similarity_threshold=_env_optional_float("PLAN_SIMILARITY_THRESHOLD", cls.plan_similarity_threshold),
+            maps_max_workers=_env_int("MAPS_MAX_WORKERS", cls.maps_max_workers),
+            maps_base_url=_env_str("MAPS_BASE_URL", cls.maps_base_url),
+            maps_attempt_timeout=_env_float("MAPS_ATTEMPT_TIMEOUT", cls.maps_attempt_timeout),
+            maps_max_attempts=_env_int("MAPS_MAX_ATTEMPTS", cls.maps_max_attempts),
+            maps_backoff_base=_env_float("MAPS_BACKOFF_BASE", cls.maps_backoff_base),
+            maps_backoff_max=_env_float("MAPS_BACKOFF_MAX", cls.maps_backoff_max),
+            maps_hedge_delay=_env_optional_float("MAPS_HEDGE_DELAY", cls.maps_hedge_delay),
+            geocode_concurrency=_env_int("GEOCODE_CONCURRENCY", cls.geocode_concurrency),
+            llm_rate_limit=_env_optional_float("LLM_RATE_LIMIT", cls.llm_rate_limit),
+            geocode_rate_limit=_env_optional_float("GEOCODE_RATE_LIMIT", cls.geocode_rate_limit),
+            directions_rate_limit=_env_optional_float("DIRECTIONS_RATE_LIMIT", cls.directions_rate_limit),
+            batch_concurrency=_env_int("BATCH_CONCURRENCY", cls.batch_concurrency),
+            request_deadline=_env_optional_float("REQUEST_DEADLINE", cls.request_deadline),
+            deadline_geocode_reserve=_env_float("DEADLINE_GEOCODE_RESERVE", cls.deadline_geocode_reserve),
+            deadline_directions_reserve=_env_float("DEADLINE_DIRECTIONS_RESERVE", cls.deadline_directions_reserve),
+            checkpoint_path=_env_str("CHECKPOINT_PATH", cls.checkpoint_path),
+            checkpoint_ttl=_env_float("CHECKPOINT_TTL", cls.checkpoint_ttl),
+            response_compress_min_bytes=_env_int("RESPONSE_COMPRESS_MIN_BYTES", cls.response_compress_min_bytes),
+            response_gzip_level=_env_int("RESPONSE_GZIP_LEVEL", cls.response_gzip_level),
+            response_brotli_quality=_env_int("RESPONSE_BROTLI_QUALITY", cls.response_brotli_quality),
+            job_workers=_env_int("JOB_WORKERS", cls.job_workers),
+            job_queue_depth=_env_int("JOB_QUEUE_DEPTH", cls.job_queue_depth),
+            job_result_ttl=_env_float("JOB_RESULT_TTL", cls.job_result_ttl),
+            geocode_timeout=_env_float("GEOCODE_TIMEOUT", cls.geocode_timeout),
+            geocode_cache_size=_env_int("GEOCODE_CACHE_SIZE", cls.geocode_cache_size),
+            geocode_cache_ttl=_env_float("GEOCODE_CACHE_TTL", cls.geocode_cache_ttl),
+            geocode_negative_ttl=_env_float("GEOCODE_NEGATIVE_TTL", cls.geocode_negative_ttl),
+            geocode_cache_path=_env_str("GEOCODE_CACHE_PATH", ".cache/geocode.sqlite3"),
+            directions_timeout=_env_float("DIRECTIONS_TIMEOUT", cls.directions_timeout),
+            polyline_tolerance_m=_env_float("POLYLINE_TOLERANCE_M", cls.polyline_tolerance_m),
+            directions_cache_precision=_env_int("DIRECTIONS_CACHE_PRECISION", cls.directions_cache_precision),
+            directions_cache_size=_env_int("DIRECTIONS_CACHE_SIZE", cls.directions_cache_size),
+            directions_cache_ttl=_env_float("DIRECTIONS_CACHE_TTL", cls.directions_cache_ttl),
+            directions_negative_ttl=_env_float("DIRECTIONS_NEGATIVE_TTL", cls.directions_negative_ttl),
+            directions_cache_path=_env_str("DIRECTIONS_CACHE_PATH", ".cache/directions.sqlite3"),
+            places_path=_env_str("PLACES_PATH", cls.places_path),
+            place_snap_distance_m=_env_float("PLACE_SNAP_DISTANCE_M", cls.place_snap_distance_m),
+            default_radius_km=_env_optional_float("DEFAULT_RADIUS_KM", cls.default_radius_km),
+            local_graph_path=_env_str("LOCAL_GRAPH_PATH", cls.local_graph_path),
+            local_routing_mode=_env_str("LOCAL_ROUTING_MODE", cls.local_routing_mode) or cls.local_routing_mode,
+            local_snap_distance_m=_env_float("LOCAL_SNAP_DISTANCE_M", cls.local_snap_distance_m),
+            dem_path=_env_str("DEM_PATH", cls.dem_path),
+            dem_cache_tiles=_env_int("DEM_CACHE_TILES", cls.dem_cache_tiles),
+            elevation_spacing_m=_env_float("ELEVATION_SPACING_M", cls.elevation_spacing_m),
+            elevation_threshold_m=_env_float("ELEVATION_THRESHOLD_M", cls.elevation_threshold_m),
+            route_store_url=_env_str("ROUTE_STORE_URL", cls.route_store_url),
+            route_store_pool_size=_env_int("ROUTE_STORE_POOL_SIZE", cls.route_store_pool_size),
+            route_store_radius_m=_env_float("ROUTE_STORE_RADIUS_M", cls.route_store_radius_m),
+            route_store_min_routes=_env_int("ROUTE_STORE_MIN_ROUTES", cls.route_store_min_routes),
+            route_store_blend=_env_int("ROUTE_STORE_BLEND", cls.route_store_blend),
+            route_store_max_age=_env_float("ROUTE_STORE_MAX_AGE", cls.route_store_max_age),
+        )
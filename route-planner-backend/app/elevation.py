@@ -0,0 +1,168 @@
+"""Elevation profiles from a local SRTM digital elevation model.
+
+Tiles are the standard 1°×1° SRTM files named after their south-west corner
+(``N34E135.hgt``): big-endian int16 heights in meters on a square grid of
+1201 (3") or 3601 (1") samples, north row first, with -32768 marking voids.
+GeoTIFF tiles with the same name, layout and coverage (``N34E135.tif``) are
+read when tifffile is installed. Tiles are memory-mapped, so sampling a
+route only pages in the rows it touches, and at most ``max_tiles`` stay open.
+
+Point ``DEM_PATH`` at the tile directory to add elevation to every route.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.geodesy import as_latlng, cumulative_distance_m
+
+_VOID = -32768
+
+
+def tile_name(lat: float, lng: float) -> str:
+    """SRTM tile name (without extension) covering ``(lat, lng)``."""
+    south, west = math.floor(lat), math.floor(lng)
+    return f"{'N' if south >= 0 else 'S'}{abs(south):02d}{'E' if west >= 0 else 'W'}{abs(west):03d}"
+
+
+def _open_geotiff(path: str) -> np.ndarray:
+    try:
+        import tifffile
+    except ImportError as e:
+        raise ImportError("Reading GeoTIFF tiles requires tifffile (pip install tifffile)") from e
+    try:
+        return tifffile.memmap(path, mode="r")
+    except ValueError:
+        # Compressed or tiled files cannot be mapped; read them whole
+        return tifffile.imread(path)
+
+
+class DemTiles:
+    """Memory-mapped SRTM tiles under ``directory`` with LRU eviction."""
+
+    def __init__(self, directory: str, max_tiles: int = 16):
+        self.directory = directory
+        self.max_tiles = max_tiles
+        self._tiles: "OrderedDict[Tuple[int, int], Optional[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _open(self, south: int, west: int) -> Optional[np.ndarray]:
+        name = tile_name(south, west)
+        path = os.path.join(self.directory, name + ".hgt")
+        if os.path.exists(path):
+            size = int(math.isqrt(os.path.getsize(path) // 2))
+            return np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+        path = os.path.join(self.directory, name + ".tif")
+        if os.path.exists(path):
+            return _open_geotiff(path)
+        # No tile (e.g. open sea); remembered so the directory is not probed again
+        return None
+
+    def tile(self, south: int, west: int) -> Optional[np.ndarray]:
+        """Height grid of the tile whose south-west corner is ``(south, west)``, or None."""
+        key = (south, west)
+        with self._lock:
+            if key in self._tiles:
+                self._counters["hits"] += 1
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+            self._counters["misses"] += 1
+            grid = self._open(south, west)
+            self._tiles[key] = grid
+            if len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+                self._counters["evictions"] += 1
+            return grid
+
+    def sample(self, points: Any) -> np.ndarray:
+        """Bilinearly interpolated elevation in meters at each point; NaN where there is no data."""
+        track = as_latlng(points)
+        heights = np.full(len(track), np.nan)
+        if len(track) == 0:
+            return heights
+        corners = np.floor(track).astype(np.int64)
+        keys, groups = np.unique(corners, axis=0, return_inverse=True)
+        for group, (south, west) in enumerate(keys.tolist()):
+            grid = self.tile(south, west)
+            if grid is None:
+                continue
+            mask = groups.ravel() == group
+            last = grid.shape[0] - 1
+            # Row 0 is the tile's north edge
+            row = (south + 1 - track[mask, 0]) * last
+            col = (track[mask, 1] - west) * last
+            r0 = np.clip(np.floor(row).astype(np.int64), 0, last - 1)
+            c0 = np.clip(np.floor(col).astype(np.int64), 0, last - 1)
+            dr, dc = row - r0, col - c0
+            # Fancy indexing reads just these samples from the mapped file
+            cells = np.stack([grid[r0, c0], grid[r0, c0 + 1], grid[r0 + 1, c0], grid[r0 + 1, c0 + 1]]).astype(np.float64)
+            cells[cells == _VOID] = np.nan
+            heights[mask] = (
+                cells[0] * (1 - dr) * (1 - dc) + cells[1] * (1 - dr) * dc
+                + cells[2] * dr * (1 - dc) + cells[3] * dr * dc
+            )
+        return heights
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "size": len(self._tiles)}
+
+
+def climb_m(heights: np.ndarray, threshold_m: float) -> Tuple[float, float]:
+    """Total ascent and descent, ignoring wiggles smaller than ``threshold_m``.
+
+    DEM noise and bridges add spurious meters on every sample; only a change
+    of at least ``threshold_m`` from the last counted height is counted.
+    """
+    gain = loss = 0.0
+    if len(heights) == 0:
+        return gain, loss
+    reference = heights[0]
+    for height in heights[1:].tolist():
+        delta = height - reference
+        if delta >= threshold_m:
+            gain += delta
+            reference = height
+        elif delta <= -threshold_m:
+            loss -= delta
+            reference = height
+    return gain, loss
+
+
+def elevation_profile(
+    dem: DemTiles,
+    track: Any,
+    spacing_m: float = 100.0,
+    max_points: int = 1000,
+    threshold_m: float = 3.0
+) -> Optional[Dict[str, Any]]:
+    """Elevation along ``track`` sampled every ``spacing_m`` (coarser if that exceeds ``max_points``).
+
+    Returns ``{"gain_m", "loss_m", "distances_m", "elevations_m"}``, or None
+    when the DEM has no data anywhere along the track. Gaps are filled by
+    linear interpolation between the nearest samples with data.
+    """
+    points = as_latlng(track)
+    if len(points) < 2:
+        return None
+    along = cumulative_distance_m(points)
+    total = float(along[-1])
+    count = int(min(max_points, max(2, math.ceil(total / spacing_m) + 1)))
+    distances = np.linspace(0.0, total, count)
+    samples = np.column_stack([np.interp(distances, along, points[:, 0]), np.interp(distances, along, points[:, 1])])
+    heights = dem.sample(samples)
+    known = ~np.isnan(heights)
+    if not known.any():
+        return None
+    heights = np.interp(distances, distances[known], heights[known])
+    gain, loss = climb_m(heights, threshold_m)
+    return {
+        "gain_m": round(gain, 1),
+        "loss_m": round(loss, 1),
+        "distances_m": np.round(distances, 1).tolist(),
+        "elevations_m": np.round(heights, 1).tolist()
+    }
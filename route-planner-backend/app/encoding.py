@@ -0,0 +1,152 @@
+"""Fast encodings of route responses, negotiated from request headers.
+
+FastAPI's default path runs a response through ``jsonable_encoder`` and
+``json.dumps``, which costs ~300 ms for three routes of 5k points. Here JSON
+is rendered with orjson from plain dicts, with the same document shape.
+
+``Accept: application/msgpack`` (or ``application/x-msgpack``) opts into a
+compact MessagePack form where each route's points are stored as columns:
+``{"lat": <bytes>, "lng": <bytes>, "name_index": [int], "names": [str]}``.
+Coordinates are little-endian int32 arrays in units of 1e-7 degrees (about
+1 cm), each value the difference from the previous point (the first one from
+0); a decoder takes the running sum and divides by 1e7, wrapping longitude
+into [-180, 180). Only named points have names: ``names[i]`` is the name of
+point ``name_index[i]``. (Parallel arrays rather than an int-keyed map, which
+``msgpack.unpackb`` rejects unless called with ``strict_map_key=False``.)
+Every other field is as in the JSON document. Delta-coded integers are a
+third the size of the JSON and, unlike raw float64, still compress well.
+
+Bodies of at least ``min_size`` bytes are compressed with brotli or gzip,
+whichever the client's Accept-Encoding prefers. brotli is a declared
+dependency; if an install lacks it anyway, only gzip is offered.
+"""
+import gzip
+from typing import Any, Dict, List, Optional, Tuple
+
+import msgpack
+import orjson
+
+from app.models import RouteResponse
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def parse_quality(header: Optional[str]) -> Dict[str, float]:
+    """Map each item of an Accept or Accept-Encoding header to its quality (``q``) value."""
+    qualities = {}
+    for item in (header or "").split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, number = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.lower()] = quality
+    return qualities
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """``application/json`` unless the client prefers a MessagePack type."""
+    qualities = parse_quality(accept)
+    json_quality = max(
+        qualities.get("application/json", 0.0),
+        qualities.get("application/*", 0.0),
+        qualities.get("*/*", 0.0 if qualities else 1.0)
+    )
+    msgpack_type = max(MSGPACK_TYPES, key=lambda media_type: qualities.get(media_type, 0.0))
+    if qualities.get(msgpack_type, 0.0) > 0 and qualities[msgpack_type] >= json_quality:
+        return msgpack_type
+    return "application/json"
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """``br`` or ``gzip``, whichever the client accepts with the higher quality (br on ties), or None."""
+    qualities = parse_quality(accept_encoding)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(candidates, key=lambda coding: qualities.get(coding, qualities.get("*", 0.0)))
+    return best if qualities.get(best, qualities.get("*", 0.0)) > 0 else None
+
+
+def _other_fields(response: RouteResponse) -> Dict[str, Any]:
+    # Everything but the points is small; pydantic's own dump is fine for it
+    return response.model_dump(exclude={"routes"})
+
+
+def to_json(response: RouteResponse) -> bytes:
+    """The response as the same JSON document FastAPI renders, built with orjson."""
+    document = {
+        "routes": [[{"lat": p.lat, "lng": p.lng, "name": p.name} for p in route] for route in response.routes],
+        **_other_fields(response)
+    }
+    return orjson.dumps(document)
+
+
+# Coordinate units per degree in the columnar form
+COLUMNAR_SCALE = 10_000_000
+
+
+def _delta_column(values: List[float], wrap: bool = False) -> bytes:
+    # Imported here: app.main must not import numpy (see benchmarks.bench_import)
+    import numpy as np
+
+    fixed = np.rint(np.asarray(values, dtype=np.float64) * COLUMNAR_SCALE).astype(np.int64)
+    deltas = np.diff(fixed, prepend=0)
+    if wrap:
+        # Crossing the antimeridian is a short step west or east, not a ~360° one
+        full_turn = 360 * COLUMNAR_SCALE
+        deltas[1:] = (deltas[1:] + full_turn // 2) % full_turn - full_turn // 2
+    return deltas.astype("<i4").tobytes()
+
+
+def columnar_routes(routes: List[List[Any]]) -> List[Dict[str, Any]]:
+    """Routes as ``{"lat", "lng", "name_index", "names"}`` columns (see the module docstring)."""
+    columns = []
+    for route in routes:
+        named = [(index, p.name) for index, p in enumerate(route) if p.name is not None]
+        columns.append({
+            "lat": _delta_column([p.lat for p in route]),
+            "lng": _delta_column([p.lng for p in route], wrap=True),
+            "name_index": [index for index, _ in named],
+            "names": [name for _, name in named]
+        })
+    return columns
+
+
+def to_msgpack(response: RouteResponse) -> bytes:
+    """The response as MessagePack with columnar route points."""
+    return msgpack.packb({"routes": columnar_routes(response.routes), **_other_fields(response)})
+
+
+def compress(body: bytes, coding: str, gzip_level: int = 5, brotli_quality: int = 4) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def encode_route_response(
+    response: RouteResponse,
+    accept: Optional[str],
+    accept_encoding: Optional[str],
+    min_size: int = 1024,
+    gzip_level: int = 5,
+    brotli_quality: int = 4
+) -> Tuple[bytes, Dict[str, str]]:
+    """Render ``response`` as the client asked; returns the body and its Content-Type/Content-Encoding/Vary headers."""
+    media_type = negotiate_media_type(accept)
+    body = to_msgpack(response) if media_type in MSGPACK_TYPES else to_json(response)
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+    coding = negotiate_encoding(accept_encoding) if len(body) >= min_size else None
+    if coding is not None:
+        body = compress(body, coding, gzip_level, brotli_quality)
+        headers["Content-Encoding"] = coding
+    return body, headers
@@ -0,0 +1,179 @@
+"""Asynchronous route jobs with admission control.
+
+``POST /api/jobs`` queues a route request and answers at once with a job id;
+a fixed pool of workers runs queued jobs through
+``RouteAgent.process_route_request``, interactive jobs before batch jobs.
+The queue holds at most ``max_depth`` waiting jobs: beyond that submissions
+are refused with an estimated retry delay (HTTP 429 + Retry-After), so a
+traffic spike turns into fast rejections instead of an ever-growing backlog.
+Finished jobs stay readable for ``result_ttl`` seconds.
+"""
+import asyncio
+import itertools
+import math
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from app.models import RouteRequest
+
+if TYPE_CHECKING:
+    from app.agent import RouteAgent
+
+# Lower runs first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class QueueFull(Exception):
+    """The job queue cannot take more work; try again after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full; retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    id: str
+    request: RouteRequest
+    priority: str
+    status: str = "queued"  # queued, running, done or failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobQueue:
+    """Bounded priority queue of route jobs served by ``workers`` concurrent workers."""
+
+    def __init__(self, agent: "RouteAgent", workers: int = 8, max_depth: int = 64, result_ttl: float = 600.0):
+        self.agent = agent
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self._queue: "asyncio.PriorityQueue[Any]" = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        # Finished job ids in finishing order, for expiry
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._running = 0
+        # Moving average of how long a job runs, for Retry-After estimates
+        self._service_seconds = 5.0
+        self._counters = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "expired": 0}
+
+    def start(self) -> None:
+        """Start the workers; must run inside the server's event loop (the first job or warm-up calls it)."""
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def retry_after(self, jobs: int = 1) -> int:
+        """Seconds until roughly ``jobs`` more jobs would fit, given the current backlog."""
+        backlog = self.depth + jobs - self.max_depth
+        return max(1, math.ceil(max(backlog, 1) * self._service_seconds / self.workers))
+
+    def submit(self, requests: Sequence[RouteRequest], priority: str = "interactive") -> List[Job]:
+        """Queue ``requests`` as jobs, all or none; raises QueueFull when they do not fit."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        self._expire()
+        if self.depth + len(requests) > self.max_depth:
+            self._counters["rejected"] += len(requests)
+            raise QueueFull(self.retry_after(len(requests)))
+        self.start()
+        jobs = []
+        for request in requests:
+            job = Job(id=uuid.uuid4().hex, request=request, priority=priority)
+            self._jobs[job.id] = job
+            self._queue.put_nowait((PRIORITIES[priority], next(self._sequence), job))
+            jobs.append(job)
+        self._counters["submitted"] += len(jobs)
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Return the job once it finishes or ``timeout`` seconds pass, whichever is first."""
+        job = self.get(job_id)
+        if job is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                response = await self.agent.process_route_request(job.request)
+                job.result = response.model_dump()
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e) or repr(e)
+                job.status = "failed"
+            except asyncio.CancelledError:
+                job.error = "cancelled"
+                job.status = "failed"
+                raise
+            finally:
+                self._running -= 1
+                job.finished_at = time.time()
+                self._service_seconds += 0.2 * (job.finished_at - job.started_at - self._service_seconds)
+                self._counters[job.status] += 1
+                self._finished[job.id] = job.finished_at + self.result_ttl
+                job.done.set()
+                self._queue.task_done()
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._finished:
+            job_id, expires_at = next(iter(self._finished.items()))
+            if expires_at > now:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            self._counters["expired"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "queued": self.depth,
+            "running": self._running,
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "service_seconds": round(self._service_seconds, 3)
+        }
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,172 @@
+import json
+import re
+from typing import Any, List, Optional, Tuple, Union
+
+JSONPath = Tuple[Union[str, int], ...]
+
+_CLOSERS = {"{": "}", "[": "]"}
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "path", "key", "index")
+
+    def __init__(self, kind: str, start: int, path: JSONPath):
+        self.kind = kind
+        self.start = start
+        self.path = path
+        # Current object key, or current array index
+        self.key: Optional[str] = None
+        self.index = 0
+
+    def child_path(self) -> JSONPath:
+        if self.kind == "{":
+            return self.path + (self.key if self.key is not None else "",)
+        return self.path + (self.index,)
+
+
+class IncrementalJSONParser:
+    """Parse a JSON document as it arrives and report every object the moment it closes.
+
+    Text before the first ``{`` (prose, a Markdown code fence) is ignored.
+    ``feed`` returns ``(path, value)`` pairs for objects completed by the new
+    text, where ``path`` locates the object in the document, e.g.
+    ``("suggested_routes", 0, "waypoints", 2)``.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._started = False
+
+    def feed(self, text: str) -> List[Tuple[JSONPath, Any]]:
+        self._buffer += text
+        completed: List[Tuple[JSONPath, Any]] = []
+        buffer = self._buffer
+        for i in range(self._position, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start + 1:i]
+                continue
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._stack.append(_Frame("{", i, ()))
+                continue
+            if not self._stack:
+                # The top-level document is complete; ignore trailing text
+                continue
+
+            frame = self._stack[-1]
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                self._stack.append(_Frame(char, i, frame.child_path()))
+            elif char in "}]":
+                closed = self._stack.pop()
+                if closed.kind == "{":
+                    try:
+                        completed.append((closed.path, json.loads(buffer[closed.start:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+            elif char == ":" and frame.kind == "{":
+                frame.key = json.loads(f'"{self._last_string}"') if self._last_string is not None else None
+            elif char == "," and frame.kind == "[":
+                frame.index += 1
+        self._position = len(buffer)
+        return completed
+
+
+def strip_code_fence(text: str) -> str:
+    """Remove a surrounding Markdown code fence such as ```json ... ```."""
+    return _FENCE.sub("", text.strip())
+
+
+def _repair_truncated(text: str) -> Any:
+    """Close a truncated JSON document at the last point where it is still valid.
+
+    Candidate cut points are positions just after a complete value (or just
+    after an opening bracket); for each, the open containers are closed in
+    order and the first candidate that parses wins.
+    """
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []
+    in_string = False
+    escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                cuts.append((i + 1, "".join(_CLOSERS[c] for c in reversed(stack))))
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+            cuts.append((i + 1, "".join(_CLOSERS[c] for c in reversed(stack))))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            cuts.append((i + 1, "".join(_CLOSERS[c] for c in reversed(stack))))
+        elif char == ",":
+            cuts.append((i, "".join(_CLOSERS[c] for c in reversed(stack))))
+
+    for end, closers in reversed(cuts):
+        try:
+            return json.loads(text[:end] + closers)
+        except json.JSONDecodeError:
+            continue
+    raise json.JSONDecodeError("Could not repair truncated JSON", text, len(text))
+
+
+def parse_llm_json(text: str) -> Any:
+    """Parse JSON produced by an LLM, tolerating fences, surrounding prose and truncation.
+
+    Raises json.JSONDecodeError when nothing usable can be recovered.
+    """
+    return parse_llm_json_checked(text)[0]
+
+
+def parse_llm_json_checked(text: str) -> Tuple[Any, bool]:
+    """Like ``parse_llm_json``, but returns ``(value, repaired)``.
+
+    ``repaired`` is True when the document was truncated and had to be
+    closed, so part of it is missing.
+    """
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError as e:
+        error = e
+
+    body = strip_code_fence(text)
+    start = body.find("{")
+    if start < 0:
+        raise error
+    body = body[start:]
+    end = body.rfind("}")
+    if end >= 0:
+        try:
+            return json.loads(body[:end + 1]), False
+        except json.JSONDecodeError:
+            pass
+    try:
+        return _repair_truncated(body), True
+    except json.JSONDecodeError:
+        raise error
@@ -0,0 +1,415 @@
+"""Offline bicycle routing over an OpenStreetMap extract.
+
+An extract (``.osm`` XML, or ``.osm.pbf`` when pyosmium is installed) is
+turned into a compact CSR graph: one row of outgoing edges per road node, with
+edge length, riding time and a bicycle preference cost. The graph is saved as
+a single file whose arrays are memory-mapped on load, so opening even a large
+region costs a few milliseconds and its pages are shared between workers.
+
+Build a graph file once, then point ``LOCAL_GRAPH_PATH`` at it:
+
+    python -m app.local_router build kansai.osm.pbf .cache/kansai.graph
+    python -m app.local_router route .cache/kansai.graph 34.8636,135.6776 34.9305,135.7583
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.geodesy import EARTH_RADIUS_M, haversine_m, path_length_m
+
+_MAGIC = b"RTGRAPH1"
+_ALIGN = 64
+_ARRAYS = ("lat", "lng", "indptr", "indices", "length_m", "time_s", "cost")
+
+# Cruising speed in km/h and preference factor (>= 1, higher is avoided) by
+# highway type. Types missing here are not ridable.
+_HIGHWAY_PROFILE: Dict[str, Tuple[float, float]] = {
+    "cycleway": (20.0, 1.0),
+    "path": (15.0, 1.3),
+    "track": (12.0, 1.6),
+    "living_street": (12.0, 1.2),
+    "residential": (18.0, 1.1),
+    "service": (15.0, 1.3),
+    "unclassified": (18.0, 1.1),
+    "tertiary": (20.0, 1.15),
+    "tertiary_link": (20.0, 1.15),
+    "secondary": (20.0, 1.3),
+    "secondary_link": (20.0, 1.3),
+    "primary": (20.0, 1.6),
+    "primary_link": (20.0, 1.6),
+    "trunk": (20.0, 2.5),
+    "trunk_link": (20.0, 2.5),
+    "road": (15.0, 1.5),
+    # Walking the bike
+    "footway": (5.0, 2.0),
+    "pedestrian": (5.0, 2.0),
+    "steps": (2.0, 5.0),
+}
+_NO = {"no", "private", "use_sidepath"}
+_DESIGNATED = {"yes", "designated", "permissive"}
+# Upper bound of speed / factor over all edges, used by the A* heuristic
+_MAX_SPEED_MPS = max(speed / 3.6 / factor for speed, factor in _HIGHWAY_PROFILE.values())
+
+
+def bicycle_profile(tags: Dict[str, str]) -> Optional[Tuple[float, float, bool, bool]]:
+    """Return ``(speed_kmh, factor, forward, backward)`` for a way, or None if bikes cannot use it."""
+    highway = tags.get("highway")
+    if highway not in _HIGHWAY_PROFILE or tags.get("area") == "yes":
+        return None
+    bicycle = tags.get("bicycle")
+    if bicycle in _NO or (bicycle is None and tags.get("access") in _NO):
+        return None
+    speed, factor = _HIGHWAY_PROFILE[highway]
+    if highway in ("footway", "pedestrian", "path") and bicycle in _DESIGNATED:
+        speed, factor = 15.0, 1.2
+    elif highway == "steps" and bicycle not in _DESIGNATED:
+        return None
+    if tags.get("cycleway") in ("lane", "track") or tags.get("cycleway:both") in ("lane", "track"):
+        factor = max(1.0, factor - 0.2)
+    if tags.get("surface") in ("gravel", "dirt", "ground", "unpaved", "sand", "grass"):
+        speed, factor = min(speed, 10.0), factor + 0.5
+
+    oneway = tags.get("oneway")
+    forward = backward = True
+    if oneway in ("yes", "1", "true") or tags.get("junction") == "roundabout":
+        backward = False
+    elif oneway == "-1":
+        forward = False
+    if tags.get("oneway:bicycle") == "no" or str(tags.get("cycleway", "")).startswith("opposite"):
+        forward = backward = True
+    return speed, factor, forward, backward
+
+
+def _read_osm_xml(path: str) -> Iterator[Tuple[Dict[str, str], List[Tuple[float, float, int]]]]:
+    coords: Dict[int, Tuple[float, float]] = {}
+    for _, element in ET.iterparse(path, events=("end",)):
+        if element.tag == "node":
+            coords[int(element.get("id"))] = (float(element.get("lat")), float(element.get("lon")))
+        elif element.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+            nodes = [
+                (*coords[ref], ref)
+                for ref in (int(nd.get("ref")) for nd in element.iter("nd"))
+                if ref in coords
+            ]
+            yield tags, nodes
+        elif element.tag == "relation":
+            break
+        if element.tag in ("node", "way"):
+            element.clear()
+
+
+def _read_osm_pbf(path: str) -> Iterator[Tuple[Dict[str, str], List[Tuple[float, float, int]]]]:
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError("Reading .pbf extracts requires pyosmium (pip install osmium)") from e
+
+    ways: List[Tuple[Dict[str, str], List[Tuple[float, float, int]]]] = []
+
+    class _Handler(osmium.SimpleHandler):
+        def way(self, way: Any) -> None:
+            tags = {tag.k: tag.v for tag in way.tags}
+            if bicycle_profile(tags) is None:
+                return
+            nodes = [(n.lat, n.lon, n.ref) for n in way.nodes if n.location.valid()]
+            ways.append((tags, nodes))
+
+    _Handler().apply_file(path, locations=True)
+    yield from ways
+
+
+def read_ways(path: str) -> Iterator[Tuple[Dict[str, str], List[Tuple[float, float, int]]]]:
+    """Yield ``(tags, [(lat, lng, node_id), ...])`` for every way of an extract."""
+    if path.endswith(".pbf"):
+        return _read_osm_pbf(path)
+    return _read_osm_xml(path)
+
+
+def _largest_component(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Mask of the nodes in the largest weakly connected component."""
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(u.tolist(), v.tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[ra] = rb
+    roots = np.array([find(x) for x in range(n)], dtype=np.int64)
+    return roots == np.bincount(roots).argmax()
+
+
+@dataclass
+class RoadGraph:
+    """Directed road graph in CSR form.
+
+    Outgoing edges of node ``i`` are ``indptr[i]:indptr[i + 1]``; for each
+    edge ``indices`` holds the target node, ``length_m`` its length,
+    ``time_s`` the riding time and ``cost`` the time scaled by the road's
+    preference factor, which is what routes minimize.
+    """
+    lat: np.ndarray
+    lng: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    length_m: np.ndarray
+    time_s: np.ndarray
+    cost: np.ndarray
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lat)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_extract(cls, path: str) -> "RoadGraph":
+        """Build the bicycle graph of an OSM extract, keeping its largest connected network."""
+        ids: Dict[int, int] = {}
+        lat: List[float] = []
+        lng: List[float] = []
+        sources: List[int] = []
+        targets: List[int] = []
+        speeds: List[float] = []
+        factors: List[float] = []
+        for tags, nodes in read_ways(path):
+            profile = bicycle_profile(tags)
+            if profile is None or len(nodes) < 2:
+                continue
+            speed, factor, forward, backward = profile
+            indexes = []
+            for node_lat, node_lng, ref in nodes:
+                index = ids.get(ref)
+                if index is None:
+                    index = ids[ref] = len(lat)
+                    lat.append(node_lat)
+                    lng.append(node_lng)
+                indexes.append(index)
+            for a, b in zip(indexes, indexes[1:]):
+                if a == b:
+                    continue
+                for source, target, allowed in ((a, b, forward), (b, a, backward)):
+                    if allowed:
+                        sources.append(source)
+                        targets.append(target)
+                        speeds.append(speed)
+                        factors.append(factor)
+        if not sources:
+            raise ValueError(f"No ridable roads found in {path}")
+
+        node_lat, node_lng = np.asarray(lat), np.asarray(lng)
+        u, v = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        # Snapping onto an isolated car park or footway island would make
+        # every route from it fail, so only the main network is kept.
+        keep = _largest_component(len(node_lat), u, v)
+        renumber = np.cumsum(keep) - 1
+        edges = keep[u] & keep[v]
+        u, v = renumber[u[edges]], renumber[v[edges]]
+        node_lat, node_lng = node_lat[keep], node_lng[keep]
+
+        length = haversine_m(node_lat[u], node_lng[u], node_lat[v], node_lng[v])
+        time_s = length / (np.asarray(speeds)[edges] / 3.6)
+        cost = time_s * np.asarray(factors)[edges]
+
+        order = np.argsort(u, kind="stable")
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(u, minlength=len(node_lat)))))
+        return cls(
+            lat=node_lat,
+            lng=node_lng,
+            indptr=indptr.astype(np.int64),
+            indices=v[order].astype(np.int32),
+            length_m=length[order].astype(np.float32),
+            time_s=time_s[order].astype(np.float32),
+            cost=cost[order].astype(np.float32),
+        )
+
+    def save(self, path: str) -> None:
+        """Write the graph as one file of aligned raw arrays behind a JSON header."""
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in _ARRAYS}
+        layout: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+        for name, array in arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps({"arrays": layout}).encode("utf-8")
+        data_start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        """Memory-map a graph file written by ``save``; nothing is read until used."""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a road graph file")
+            header_size = int.from_bytes(f.read(8), "little")
+            layout = json.loads(f.read(header_size))["arrays"]
+        data_start = -(-(len(_MAGIC) + 8 + header_size) // _ALIGN) * _ALIGN
+        return cls(**{
+            name: np.memmap(
+                path,
+                dtype=np.dtype(spec["dtype"]),
+                mode="r",
+                offset=data_start + spec["offset"],
+                shape=tuple(spec["shape"])
+            )
+            for name, spec in layout.items()
+        })
+
+
+class LocalRouter:
+    """A* bicycle routing on a RoadGraph.
+
+    Points are snapped to the nearest road node within ``snap_distance_m``;
+    a route is None when a point is off the map or no path connects them.
+    """
+
+    def __init__(self, graph: RoadGraph, snap_distance_m: float = 500.0):
+        self.graph = graph
+        self.snap_distance_m = snap_distance_m
+        self._lat_rad = np.radians(graph.lat)
+        self._lng_rad = np.radians(graph.lng)
+
+    @classmethod
+    def load(cls, path: str, snap_distance_m: float = 500.0) -> "LocalRouter":
+        return cls(RoadGraph.load(path), snap_distance_m=snap_distance_m)
+
+    def nearest_node(self, lat: float, lng: float) -> Optional[int]:
+        """Index of the road node closest to ``(lat, lng)``, or None if none is within the snap distance."""
+        lat_rad, lng_rad = math.radians(lat), math.radians(lng)
+        x = (self._lng_rad - lng_rad) * math.cos(lat_rad)
+        y = self._lat_rad - lat_rad
+        squared = x * x + y * y
+        index = int(np.argmin(squared))
+        if math.sqrt(squared[index]) * EARTH_RADIUS_M > self.snap_distance_m:
+            return None
+        return index
+
+    def _shortest_path(self, source: int, target: int) -> Optional[List[Tuple[int, int]]]:
+        """A* from ``source`` to ``target``; returns the ``(node, edge)`` hops, or None if unreachable."""
+        graph = self.graph
+        lat_rad, lng_rad = self._lat_rad, self._lng_rad
+        target_lat, target_lng = float(lat_rad[target]), float(lng_rad[target])
+        cos_target = math.cos(target_lat)
+
+        def heuristic(node: int) -> float:
+            node_lat = float(lat_rad[node])
+            a = (math.sin((target_lat - node_lat) / 2) ** 2
+                 + math.cos(node_lat) * cos_target * math.sin((target_lng - float(lng_rad[node])) / 2) ** 2)
+            return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a))) / _MAX_SPEED_MPS
+
+        best: Dict[int, float] = {source: 0.0}
+        came_from: Dict[int, Tuple[int, int]] = {}
+        settled = set()
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                hops = []
+                while node != source:
+                    previous, edge = came_from[node]
+                    hops.append((node, edge))
+                    node = previous
+                return hops[::-1]
+            if node in settled:
+                continue
+            settled.add(node)
+            lo, hi = int(graph.indptr[node]), int(graph.indptr[node + 1])
+            for offset, (neighbor, edge_cost) in enumerate(zip(
+                graph.indices[lo:hi].tolist(), graph.cost[lo:hi].tolist()
+            )):
+                candidate = cost + edge_cost
+                if candidate < best.get(neighbor, math.inf):
+                    best[neighbor] = candidate
+                    came_from[neighbor] = (node, lo + offset)
+                    heapq.heappush(heap, (candidate + heuristic(neighbor), candidate, neighbor))
+        return None
+
+    def route(self, path: Sequence[Tuple[float, float]]) -> Optional[Dict[str, Any]]:
+        """Route through ``path`` (origin, waypoints..., destination) in order.
+
+        Returns ``distance`` (m), ``duration`` (s) and the road ``track`` as
+        an ``(N, 2)`` array, or None when any leg cannot be routed.
+        """
+        nodes = [self.nearest_node(lat, lng) for lat, lng in path]
+        if len(nodes) < 2 or any(node is None for node in nodes):
+            return None
+        track_nodes = [nodes[0]]
+        edges: List[int] = []
+        for source, target in zip(nodes, nodes[1:]):
+            if source == target:
+                continue
+            hops = self._shortest_path(source, target)
+            if hops is None:
+                return None
+            track_nodes.extend(node for node, _ in hops)
+            edges.extend(edge for _, edge in hops)
+        edge_index = np.asarray(edges, dtype=np.int64)
+        node_index = np.asarray(track_nodes, dtype=np.int64)
+        # Include the stretch between each requested point and its road node
+        snap = np.column_stack((self.graph.lat[node_index[[0, -1]]], self.graph.lng[node_index[[0, -1]]]))
+        access_m = path_length_m([path[0], snap[0]]) + path_length_m([snap[1], path[-1]])
+        return {
+            "distance": float(self.graph.length_m[edge_index].sum()) + access_m,
+            "duration": float(self.graph.time_s[edge_index].sum()) + access_m / (15.0 / 3.6),
+            "track": np.column_stack((self.graph.lat[node_index], self.graph.lng[node_index])),
+        }
+
+
+def _parse_point(text: str) -> Tuple[float, float]:
+    lat, lng = text.split(",")
+    return float(lat), float(lng)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or query an offline bicycle road graph")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Convert an .osm/.osm.pbf extract into a graph file")
+    build.add_argument("extract")
+    build.add_argument("graph")
+    route = commands.add_parser("route", help="Route through lat,lng points")
+    route.add_argument("graph")
+    route.add_argument("points", nargs="+", type=_parse_point)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        graph = RoadGraph.from_extract(args.extract)
+        graph.save(args.graph)
+        print(f"{args.graph}: {graph.node_count} nodes, {graph.edge_count} edges")
+        return
+
+    result = LocalRouter.load(args.graph).route(args.points)
+    if result is None:
+        sys.exit("No route found")
+    print(f"{result['distance'] / 1000:.2f} km, {result['duration'] / 60:.0f} min, {len(result['track'])} points")
+
+
+if __name__ == "__main__":
+    main()
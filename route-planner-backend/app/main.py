@@ -1,15 +1,56 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from functools import lru_cache
+import asyncio
+import json
+import logging
 import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
-from app.models import RouteRequest, RouteResponse
-from app.agent import RouteAgent
+from app.models import BatchRouteRequest, JobRequest, RouteRequest, RouteResponse
+from app.batch import run_batch
+from app.config import AgentSettings
+from app.encoding import encode_route_response
+from app.jobs import JobQueue, QueueFull
+from app.metrics import AgentStatsCollector
+
+# app.agent pulls in LangGraph, LangChain and googlemaps (most of the cold
+# start); it is imported when the agent is built, during warm-up
+if TYPE_CHECKING:
+    from app.agent import RouteAgent
 
 load_dotenv()
 
-app = FastAPI()
+# LOG_LEVEL=DEBUG also logs the full workflow state of every request
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+# Warm-up progress reported by /readyz
+_readiness: Dict[str, Any] = {"status": "starting"}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the server answers /healthz and /readyz meanwhile
+    warm_up = asyncio.create_task(_warm_up())
+    yield
+    warm_up.cancel()
+    for queue in _job_queues.values():
+        await queue.close()
+    # Agents swapped in through dependency_overrides belong to whoever made them
+    if _build_route_agent.cache_info().currsize:
+        await _build_route_agent().close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Disable CORS. Do not remove this for full-stack development.
 app.add_middleware(
@@ -21,21 +62,179 @@ app.add_middleware(
 )
 
 @lru_cache()
-def get_route_agent() -> RouteAgent:
+def _build_route_agent() -> "RouteAgent":
+    from app.agent import RouteAgent
+
     openai_api_key = os.getenv("OPENAI_API_KEY")
     google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
     if not openai_api_key or not google_maps_api_key:
         raise ValueError("Missing required API keys in .env file")
-    return RouteAgent(openai_api_key, google_maps_api_key)
+    agent = RouteAgent(openai_api_key, google_maps_api_key, AgentSettings.from_env())
+    REGISTRY.register(AgentStatsCollector(agent))
+    return agent
+
+# Warm-up builds the agent on a worker thread while requests may already
+# arrive; the lock keeps them from building a second one
+_agent_lock = threading.Lock()
+
+def get_route_agent() -> "RouteAgent":
+    with _agent_lock:
+        return _build_route_agent()
+
+# One job queue per agent (tests and benchmarks swap the agent out)
+_job_queues: Dict["RouteAgent", JobQueue] = {}
+
+# Async so that it runs on the event loop, never concurrently with itself on the threadpool
+async def get_job_queue(agent: "RouteAgent" = Depends(get_route_agent)) -> JobQueue:
+    queue = _job_queues.get(agent)
+    if queue is None:
+        queue = _job_queues[agent] = JobQueue(
+            agent,
+            workers=agent.settings.job_workers,
+            max_depth=agent.settings.job_queue_depth,
+            result_ttl=agent.settings.job_result_ttl
+        )
+    return queue
+
+async def _warm_up() -> None:
+    """Build the agent, compile its graphs, open its pools and start the job workers before the first request."""
+    started = time.perf_counter()
+    _readiness["status"] = "warming_up"
+    try:
+        build = app.dependency_overrides.get(get_route_agent, get_route_agent)
+        # Importing and constructing the agent is blocking work; keep the event loop free for probes
+        agent = await asyncio.to_thread(build)
+        await agent.warm_up()
+        (await get_job_queue(agent)).start()
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        _readiness.update(status="failed", error=str(e) or repr(e))
+        return
+    _readiness.update(status="ready", warm_up_seconds=round(time.perf_counter() - started, 3))
+    logger.info("Warm-up finished in %.2f s", _readiness["warm_up_seconds"])
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
+@app.get("/readyz")
+async def readyz():
+    """200 once warm-up has finished, 503 while it runs or after it failed."""
+    return JSONResponse(_readiness, status_code=200 if _readiness["status"] == "ready" else 503)
+
+@app.get("/metrics")
+async def metrics(agent: "RouteAgent" = Depends(get_route_agent)):
+    """Prometheus metrics: node and external call latencies, tokens, cache hit ratios, fallbacks."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/cache/stats")
+async def cache_stats(agent: "RouteAgent" = Depends(get_route_agent)):
+    """Hit/miss statistics for the geocode, directions and plan caches."""
+    return agent.cache_stats()
+
+@app.get("/api/rate-limits/stats")
+async def rate_limit_stats(agent: "RouteAgent" = Depends(get_route_agent)):
+    """Calls, throttled calls and total wait per rate-limited provider."""
+    return agent.rate_limit_stats()
+
+@app.get("/api/coalescing/stats")
+async def coalescing_stats(agent: "RouteAgent" = Depends(get_route_agent)):
+    """How many /api/route requests ran the workflow and how many shared another's run."""
+    return agent.coalescing_stats()
+
 @app.post("/api/route", response_model=RouteResponse)
-async def get_route(request: RouteRequest, agent: RouteAgent = Depends(get_route_agent)):
+async def get_route(
+    request: RouteRequest,
+    http_request: Request,
+    agent: "RouteAgent" = Depends(get_route_agent),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
     """
     Get route suggestions based on the input prompt.
     Example prompt: "現在地点：樟葉駅より100KM圏内のロードバイクが走りやすいルート候補を３つほどGoogleMapに表示してください。"
+    Retrying with the same Idempotency-Key header resumes the earlier attempt
+    (or returns its result) when checkpoints are enabled.
+    Send "Accept: application/msgpack" for compact columnar MessagePack, and
+    Accept-Encoding for a gzip or brotli body (see app.encoding).
+    """
+    if idempotency_key and not request.idempotency_key:
+        request = request.model_copy(update={"idempotency_key": idempotency_key})
+    response = await agent.process_route_request(request)
+    # Dense routes take milliseconds to render and compress; keep that off the event loop
+    body, headers = await asyncio.to_thread(
+        encode_route_response,
+        response,
+        http_request.headers.get("accept"),
+        http_request.headers.get("accept-encoding"),
+        min_size=agent.settings.response_compress_min_bytes,
+        gzip_level=agent.settings.response_gzip_level,
+        brotli_quality=agent.settings.response_brotli_quality
+    )
+    return Response(content=body, headers=headers)
+
+@app.post("/api/route/stream")
+async def stream_route(request: RouteRequest, agent: "RouteAgent" = Depends(get_route_agent)):
+    """
+    Stream route suggestions as newline-delimited JSON events.
+    The start location arrives as soon as the LLM plan is parsed and each route
+    as soon as its directions resolve, followed by a final "done" event.
+    """
+    async def events():
+        async for event in agent.stream_route_request(request):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/route/batch")
+async def batch_route(batch: BatchRouteRequest, agent: "RouteAgent" = Depends(get_route_agent)):
+    """
+    Plan routes for many requests, streamed back as newline-delimited JSON.
+    Each request's result arrives as soon as it finishes, tagged with its
+    index in the batch, followed by a final "done" event.
     """
-    return await agent.process_route_request(request)
+    concurrency = min(batch.concurrency or agent.settings.batch_concurrency, agent.settings.batch_concurrency)
+
+    async def events():
+        async for event in run_batch(agent, batch.requests, concurrency):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest, queue: JobQueue = Depends(get_job_queue)):
+    """
+    Queue a route request and return its job id immediately.
+    Poll GET /api/jobs/{job_id} for the result. Answers 429 with Retry-After
+    when the queue is full.
+    """
+    try:
+        job, = queue.submit([RouteRequest(**request.model_dump(exclude={"priority"}))], request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/api/jobs/batch", status_code=202)
+async def submit_batch_jobs(batch: BatchRouteRequest, queue: JobQueue = Depends(get_job_queue)):
+    """Queue every request of a batch as a low-priority job; all are accepted or none (429)."""
+    try:
+        jobs = queue.submit(batch.requests, "batch")
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"job_ids": [job.id for job in jobs]}
+
+@app.get("/api/jobs/stats")
+async def job_stats(queue: JobQueue = Depends(get_job_queue)):
+    """Queued, running, finished and rejected job counts."""
+    return queue.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0.0, ge=0.0, le=30.0, description="Seconds to wait for the job to finish (long poll)"),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """Job status, with the RouteResponse once it is done; 404 for unknown or expired jobs."""
+    job = await queue.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
@@ -0,0 +1,164 @@
+"""HTTP layer for Google Maps calls: pooled connections, retries and hedging.
+
+``PooledMapsClient`` is a googlemaps.Client on a keep-alive connection pool
+that reports retriable responses instead of retrying them itself, and
+``RetryPolicy`` retries (and optionally hedges) calls under a deadline with
+jittered exponential backoff. Rate limiting stays with the agent's token
+buckets; every retry and hedge takes a token like a first attempt.
+"""
+import asyncio
+import collections
+import random
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import googlemaps
+from googlemaps.exceptions import ApiError, HTTPError, Timeout, TransportError
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.metrics import MAPS_HEDGES, MAPS_RETRIES
+
+T = TypeVar("T")
+
+# HTTP statuses worth another attempt (besides the 5xx googlemaps flags itself)
+_RETRIABLE_HTTP_STATUSES = {429}
+
+
+class RetriableResponse(TransportError):
+    """Google answered with a 5xx or OVER_QUERY_LIMIT; the call may be retried."""
+
+
+class PooledMapsClient(googlemaps.Client):
+    """googlemaps.Client sharing keep-alive connections across threads.
+
+    ``pool_size`` should match the number of threads making calls so that no
+    thread waits for (or discards) a connection. googlemaps' own retry loop is
+    cut short: the first retriable response raises RetriableResponse and the
+    caller's RetryPolicy decides what to do, and its QPS throttling is off.
+    ``base_url`` points the client at a stub server in tests and benchmarks.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        pool_size: int = 8,
+        timeout: Optional[float] = None,
+        base_url: Optional[str] = None,
+        **kwargs: Any
+    ):
+        if base_url:
+            kwargs["base_url"] = base_url.rstrip("/")
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        super().__init__(
+            key=key,
+            timeout=timeout,
+            requests_session=session,
+            **kwargs
+        )
+        # googlemaps.Client sleeps in the calling thread once its last
+        # ``queries_per_second`` send times span under a second; a history that
+        # never holds anything switches that off, so only the agent's token
+        # buckets shape traffic
+        self.sent_times = collections.deque(maxlen=0)
+
+    def _request(self, url: str, params: Any, first_request_time: Any = None, retry_counter: int = 0,
+                 *args: Any, **kwargs: Any) -> Any:
+        if retry_counter:
+            raise RetriableResponse(f"retriable response from {url}")
+        return super()._request(url, params, first_request_time, retry_counter, *args, **kwargs)
+
+
+def is_retriable(error: BaseException) -> bool:
+    """Whether a failed Maps call may succeed if simply tried again."""
+    if isinstance(error, HTTPError):
+        return error.status_code in _RETRIABLE_HTTP_STATUSES
+    if isinstance(error, ApiError):
+        return error.status == "OVER_QUERY_LIMIT"
+    return isinstance(error, (TransportError, Timeout))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry transient Maps errors with full-jitter exponential backoff.
+
+    Attempt ``n`` (from 0) that fails with a retriable error is followed by a
+    sleep drawn uniformly from ``[0, min(max_delay, base_delay * 2**n)]``, up
+    to ``attempts`` attempts in total and never past the call's deadline.
+    With ``hedge_delay`` set, an attempt still running after that many
+    seconds gets a duplicate request and the first success wins.
+    """
+    attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+    hedge_delay: Optional[float] = None
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        throttle: Callable[[], Awaitable[None]],
+        timeout: float,
+        provider: str
+    ) -> T:
+        """Run ``call`` until it succeeds, fails permanently or ``timeout`` seconds pass.
+
+        ``throttle`` is awaited before every request after the first. Raises
+        the last error, or TimeoutError when the deadline is hit mid-attempt.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for attempt in range(self.attempts):
+            if attempt:
+                await throttle()
+            try:
+                return await asyncio.wait_for(self._hedged(call, throttle, provider), deadline - loop.time())
+            except Exception as e:
+                if attempt + 1 == self.attempts or not is_retriable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if loop.time() + delay >= deadline:
+                    raise
+                MAPS_RETRIES.labels(provider=provider).inc()
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _hedged(
+        self,
+        call: Callable[[], Awaitable[T]],
+        throttle: Callable[[], Awaitable[None]],
+        provider: str
+    ) -> T:
+        first = asyncio.ensure_future(call())
+        if self.hedge_delay is None:
+            return await first
+
+        async def hedge() -> T:
+            await throttle()
+            return await call()
+
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+            if done:
+                return first.result()
+            MAPS_HEDGES.labels(provider=provider, result="sent").inc()
+            second = asyncio.ensure_future(hedge())
+            tasks.append(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            MAPS_HEDGES.labels(provider=provider, result="won").inc()
+                        return task.result()
+            # Both failed; report the original request's error
+            raise first.exception()
+        finally:
+            # The losing (or abandoned) request's thread still finishes; its result is ignored
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,165 @@
+"""Prometheus instrumentation for the route workflow.
+
+Metrics live in the default prometheus_client registry and are shared by
+every RouteAgent in the process. Counters kept by the agent itself (cache
+hits, request coalescing, rate limiting) are read at scrape time through
+``AgentStatsCollector`` rather than duplicated.
+"""
+import asyncio
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, TypeVar
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+T = TypeVar("T")
+
+# Spans fast cache-backed calls through slow LLM completions
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+REQUEST_SECONDS = Histogram(
+    "route_request_seconds",
+    "Time to run the route workflow for one request",
+    ["outcome"],
+    buckets=_LATENCY_BUCKETS
+)
+NODE_SECONDS = Histogram(
+    "route_node_seconds",
+    "Time spent in each workflow node (plan_route once per route)",
+    ["node"],
+    buckets=_LATENCY_BUCKETS
+)
+CALL_SECONDS = Histogram(
+    "route_external_call_seconds",
+    "Latency of each external call that was actually made (cache hits excluded)",
+    ["provider", "outcome"],
+    buckets=_LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "route_llm_tokens",
+    "Tokens reported by the LLM",
+    ["kind"]
+)
+FALLBACKS = Counter(
+    "route_fallbacks",
+    "Routes that were not routed by Google Maps, by what was used instead",
+    ["kind"]
+)
+DROPPED_WAYPOINTS = Counter(
+    "route_dropped_waypoints",
+    "Waypoints dropped before routing (out of range or duplicate)"
+)
+DEGRADATION_TIERS = Counter(
+    "route_degradation_tiers",
+    "Responses by the most degraded tier the request deadline forced",
+    ["tier"]
+)
+CHECKPOINT_RESUMES = Counter(
+    "route_checkpoint_resumes",
+    "Workflow runs resumed from a checkpoint, by the first node that ran again",
+    ["node"]
+)
+MAPS_RETRIES = Counter(
+    "route_maps_retries",
+    "Google Maps calls retried after a transient error",
+    ["provider"]
+)
+MAPS_HEDGES = Counter(
+    "route_maps_hedges",
+    "Hedged Google Maps requests sent, and how many answered first",
+    ["provider", "result"]
+)
+
+
+def timed_node(name: str, node: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """Wrap an async workflow node so that every run is recorded under ``name``."""
+    histogram = NODE_SECONDS.labels(node=name)
+
+    @functools.wraps(node)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        started = time.perf_counter()
+        try:
+            return await node(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+@contextmanager
+def observe_call(provider: str) -> Iterator[None]:
+    """Record the latency of one external call and whether it succeeded, failed, timed out or was cancelled."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except TimeoutError:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        CALL_SECONDS.labels(provider=provider, outcome=outcome).observe(time.perf_counter() - started)
+
+
+def record_llm_usage(message: Any) -> None:
+    """Count the tokens of an LLM response (or stream chunk) that reports usage."""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        usage = {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0)
+        }
+    if usage.get("input_tokens"):
+        LLM_TOKENS.labels(kind="prompt").inc(usage["input_tokens"])
+    if usage.get("output_tokens"):
+        LLM_TOKENS.labels(kind="completion").inc(usage["output_tokens"])
+
+
+class AgentStatsCollector:
+    """Expose a RouteAgent's cache, coalescing and rate-limit counters at scrape time."""
+
+    def __init__(self, agent: Any):
+        self.agent = agent
+
+    def describe(self) -> list:
+        # Metric names depend on the agent's state; skip registration-time checks
+        return []
+
+    def collect(self) -> Iterator[Any]:
+        lookups = CounterMetricFamily("route_cache_lookups", "Cache lookups by cache and result", labels=["cache", "result"])
+        hit_ratio = GaugeMetricFamily("route_cache_hit_ratio", "Hits / (hits + misses) per cache", labels=["cache"])
+        size = GaugeMetricFamily("route_cache_entries", "Entries held in memory per cache", labels=["cache"])
+        for cache, stats in self.agent.cache_stats().items():
+            hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+            lookups.add_metric([cache, "hit"], hits)
+            lookups.add_metric([cache, "miss"], misses)
+            if "similar_hits" in stats:
+                lookups.add_metric([cache, "similar_hit"], stats["similar_hits"])
+            if "snapped" in stats:
+                lookups.add_metric([cache, "snapped"], stats["snapped"])
+            hit_ratio.add_metric([cache], hits / (hits + misses) if hits + misses else 0.0)
+            size.add_metric([cache], stats.get("size", 0))
+        yield lookups
+        yield hit_ratio
+        yield size
+
+        coalescing: Dict[str, int] = self.agent.coalescing_stats()
+        runs = CounterMetricFamily("route_workflow_runs", "Route requests by how they were served", labels=["result"])
+        for result in ("executions", "coalesced", "failed", "cancelled"):
+            runs.add_metric([result], coalescing.get(result, 0))
+        yield runs
+        yield GaugeMetricFamily("route_workflows_in_flight", "Workflows running now", value=coalescing.get("in_flight", 0))
+
+        throttled = CounterMetricFamily("route_rate_limit_throttled", "Calls that waited for a rate limit", labels=["provider"])
+        waited = CounterMetricFamily("route_rate_limit_wait_seconds", "Time spent waiting for rate limits", labels=["provider"])
+        for provider, stats in self.agent.rate_limit_stats().items():
+            throttled.add_metric([provider], stats["throttled"])
+            waited.add_metric([provider], stats["waited_seconds"])
+        yield throttled
+        yield waited
@@ -1,15 +1,47 @@
-from pydantic import BaseModel
-from typing import List, Optional, Tuple
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Tuple
 
 class RouteRequest(BaseModel):
     prompt: str
+    # Seconds the client will wait for the response; the server's
+    # REQUEST_DEADLINE applies when unset. Near the deadline the response
+    # degrades instead of arriving late (see RouteResponse.tier).
+    deadline: Optional[float] = Field(default=None, gt=0)
+    # Retries with the same key resume (or, once finished, return) the same
+    # run; also read from the Idempotency-Key header
+    idempotency_key: Optional[str] = Field(default=None, max_length=255)
+
+class BatchRouteRequest(BaseModel):
+    requests: List[RouteRequest]
+    # Requests in flight at once; capped by the server's BATCH_CONCURRENCY
+    concurrency: Optional[int] = None
+
+class JobRequest(RouteRequest):
+    # Interactive jobs run before any queued batch job
+    priority: Literal["interactive", "batch"] = "interactive"
 
 class RoutePoint(BaseModel):
     lat: float
     lng: float
     name: Optional[str] = None
 
+class ElevationProfile(BaseModel):
+    gain_m: float  # Total climbing in meters
+    loss_m: float  # Total descent in meters
+    # Elevation in meters sampled at even distances (meters from the start)
+    distances_m: List[float]
+    elevations_m: List[float]
+
 class RouteResponse(BaseModel):
     routes: List[List[RoutePoint]]
     distances: List[float]  # Distance in kilometers for each route
     descriptions: List[str]  # Description of each route
+    # Encoded polyline (Google polyline format) of each route's simplified road
+    # geometry; None for a route that fell back to straight lines
+    polylines: Optional[List[Optional[str]]] = None
+    # Elevation of each route from the local DEM; None for a route (or the
+    # whole response) without elevation data
+    elevations: Optional[List[Optional[ElevationProfile]]] = None
+    # Most degraded tier the deadline forced: "full", "skip_geocodes",
+    # "local_routing" or "partial"; None for a failed request
+    tier: Optional[str] = None
@@ -0,0 +1,203 @@
+import json
+import math
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.cache import normalize_place_name
+from app.geodesy import EARTH_RADIUS_M, haversine_m
+
+# Grid cell edge in meters; lookups scan the cells a search radius overlaps
+_CELL_M = 1000.0
+_CELL_DEG = math.degrees(_CELL_M / EARTH_RADIUS_M)
+
+
+class PlaceIndex:
+    """In-memory index of known places by normalized name and by location.
+
+    Places come from a curated POI file (``[{"name", "aliases", "lat", "lng"}]``)
+    and from every successful geocode. Names resolve without any API call;
+    locations are bucketed in a fixed ~1 km lat/lng grid so that a freshly
+    geocoded point can be snapped onto a known place a few meters away.
+    Curated places are permanent; beyond ``maxsize`` places the oldest
+    geocoded ones are forgotten. Places a plan has started from are marked,
+    so a prompt naming one can be told apart from one naming a waypoint.
+    """
+
+    def __init__(self, snap_distance_m: float = 150.0, maxsize: int = 4096):
+        self.snap_distance_m = snap_distance_m
+        self.maxsize = maxsize
+        self._names: Dict[str, Dict[str, Any]] = {}
+        self._places: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._next_id = 0
+        self._counters = {"hits": 0, "misses": 0, "snapped": 0}
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs: Any) -> "PlaceIndex":
+        with open(path, encoding="utf-8") as f:
+            pois = json.load(f)
+        index = cls(**kwargs)
+        for poi in pois:
+            index.add(poi["name"], poi["lat"], poi["lng"], aliases=poi.get("aliases", ()), pinned=True)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def __contains__(self, name: str) -> bool:
+        return normalize_place_name(name) in self._names
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / _CELL_DEG)), int(math.floor(lng / _CELL_DEG))
+
+    def add(
+        self,
+        name: str,
+        lat: float,
+        lng: float,
+        aliases: Iterable[str] = (),
+        pinned: bool = False
+    ) -> Dict[str, Any]:
+        """Index a place under its name and aliases; an existing entry for a name is kept."""
+        keys = [key for key in (normalize_place_name(n) for n in (name, *aliases)) if key]
+        for key in keys:
+            if key in self._names:
+                return self._names[key]
+        place = {
+            "id": self._next_id, "name": name, "lat": lat, "lng": lng, "keys": keys, "pinned": pinned, "start": False
+        }
+        self._next_id += 1
+        self._places[place["id"]] = place
+        self._cells[self._cell(lat, lng)].append(place["id"])
+        for key in keys:
+            self._names[key] = place
+        if len(self._places) > self.maxsize:
+            self._evict()
+        return place
+
+    def _evict(self) -> None:
+        oldest = next((p for p in self._places.values() if not p["pinned"]), None)
+        if oldest is None:
+            return
+        del self._places[oldest["id"]]
+        cell = self._cell(oldest["lat"], oldest["lng"])
+        self._cells[cell].remove(oldest["id"])
+        if not self._cells[cell]:
+            del self._cells[cell]
+        for key in oldest["keys"]:
+            del self._names[key]
+
+    def lookup(self, name: str) -> Optional[Dict[str, float]]:
+        """Return ``{"lat", "lng"}`` of a known place by name, or None."""
+        place = self._names.get(normalize_place_name(name))
+        if place is None:
+            self._counters["misses"] += 1
+            return None
+        self._counters["hits"] += 1
+        return {"lat": place["lat"], "lng": place["lng"]}
+
+    def mark_start(self, name: str) -> None:
+        """Record that a route started from the known place ``name``."""
+        place = self._names.get(normalize_place_name(name))
+        if place is not None:
+            place["start"] = True
+
+    def find_in_text(self, text: str, starts_only: bool = False) -> List[Dict[str, Any]]:
+        """Return the known places named in ``text``, in order of first mention.
+
+        Where names overlap the longest one wins, so "京都駅" is not also read
+        as "京都". With ``starts_only`` only places a route has started from
+        count. Each result has ``name``, ``lat``, ``lng``, ``pinned`` (a curated
+        place) and ``start``.
+        """
+        normalized = normalize_place_name(text)
+        matches = []
+        for key, place in self._names.items():
+            # Single characters match far too much running text
+            if len(key) < 2 or (starts_only and not place["start"]):
+                continue
+            position = normalized.find(key)
+            if position >= 0:
+                matches.append((position, -len(key), place))
+        found: List[Dict[str, Any]] = []
+        end = 0
+        for position, negative_length, place in sorted(matches, key=lambda match: match[:2]):
+            if position < end:
+                continue
+            end = position - negative_length
+            if all(other["id"] != place["id"] for other in found):
+                found.append(place)
+        return [
+            {"name": p["name"], "lat": p["lat"], "lng": p["lng"], "pinned": p["pinned"], "start": p["start"]}
+            for p in found
+        ]
+
+    def nearest(self, lat: float, lng: float, radius_m: float) -> Optional[Dict[str, Any]]:
+        """Return the closest known place within ``radius_m`` of ``(lat, lng)``, or None."""
+        row, col = self._cell(lat, lng)
+        rows = int(math.ceil(radius_m / _CELL_M))
+        # Cells are narrower in meters away from the equator
+        cols = int(math.ceil(radius_m / (_CELL_M * max(math.cos(math.radians(lat)), 1e-6))))
+        candidates = [
+            self._places[i]
+            for r in range(row - rows, row + rows + 1)
+            for c in range(col - cols, col + cols + 1)
+            for i in self._cells.get((r, c), ())
+        ]
+        if not candidates:
+            return None
+        distances = haversine_m(
+            lat, lng,
+            np.array([p["lat"] for p in candidates]),
+            np.array([p["lng"] for p in candidates])
+        )
+        best = int(np.argmin(distances))
+        return candidates[best] if distances[best] <= radius_m else None
+
+    def snap(self, location: Dict[str, float]) -> Dict[str, float]:
+        """Move ``location`` onto a known place within the snap distance, if there is one."""
+        place = self.nearest(location["lat"], location["lng"], self.snap_distance_m)
+        if place is None or (place["lat"], place["lng"]) == (location["lat"], location["lng"]):
+            return location
+        self._counters["snapped"] += 1
+        return {"lat": place["lat"], "lng": place["lng"]}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "size": len(self._places)}
+
+
+def filter_waypoints(
+    start: Dict[str, Any],
+    waypoints: List[Dict[str, Any]],
+    radius_km: Optional[float]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split waypoints into those to route through and those to drop.
+
+    A waypoint is dropped when it is farther than ``radius_km`` from the
+    start (no limit when None) or sits at the same coordinates as the start
+    or the previously kept waypoint.
+    """
+    if not waypoints:
+        return [], []
+    within = np.ones(len(waypoints), dtype=bool)
+    if radius_km is not None:
+        distances = haversine_m(
+            start["lat"], start["lng"],
+            np.array([w["lat"] for w in waypoints]),
+            np.array([w["lng"] for w in waypoints])
+        )
+        within = distances <= radius_km * 1000
+    kept: List[Dict[str, Any]] = []
+    dropped: List[Dict[str, Any]] = []
+    previous = (start["lat"], start["lng"])
+    for waypoint, inside in zip(waypoints, within.tolist()):
+        position = (waypoint["lat"], waypoint["lng"])
+        if not inside or position == previous:
+            dropped.append(waypoint)
+            continue
+        kept.append(waypoint)
+        previous = position
+    return kept, dropped
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.cache import PersistentLRUCache, normalize_place_name
+
+# Trailing punctuation does not change the request
+_TRAILING = re.compile(r"[\s。．.!！?？、,]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a user prompt for plan cache lookups.
+
+    Applies NFKC (so "１００ＫＭ" and "100KM" match), case folding, whitespace
+    collapsing and removal of trailing punctuation.
+    """
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    text = " ".join(text.split())
+    return _TRAILING.sub("", text)
+
+
+def _ngrams(text: str, n: int) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+
+def _cosine(left: Counter, right: Counter) -> float:
+    if len(left) > len(right):
+        left, right = right, left
+    dot = sum(count * right.get(gram, 0) for gram, count in left.items())
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(c * c for c in left.values())) * math.sqrt(sum(c * c for c in right.values()))
+    return dot / norm
+
+
+class NgramIndex:
+    """In-memory character n-gram index for finding near-duplicate prompts.
+
+    Candidates are found through an inverted index on n-grams and ranked by
+    cosine similarity of their n-gram count vectors. The index holds at most
+    ``maxsize`` entries and forgets the oldest first.
+    """
+
+    def __init__(self, n: int = 3, maxsize: int = 1024):
+        self.n = n
+        self.maxsize = maxsize
+        self._vectors: "OrderedDict[str, Counter]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = {}
+
+    def add(self, key: str, text: str) -> None:
+        self.remove(key)
+        vector = _ngrams(text, self.n)
+        self._vectors[key] = vector
+        for gram in vector:
+            self._postings.setdefault(gram, set()).add(key)
+        while len(self._vectors) > self.maxsize:
+            self.remove(next(iter(self._vectors)))
+
+    def remove(self, key: str) -> None:
+        vector = self._vectors.pop(key, None)
+        if vector is None:
+            return
+        for gram in vector:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def most_similar(self, text: str) -> Optional[Tuple[str, float]]:
+        """Return ``(key, similarity)`` for the closest indexed text, or None."""
+        vector = _ngrams(text, self.n)
+        candidates: Set[str] = set()
+        for gram in vector:
+            candidates.update(self._postings.get(gram, ()))
+        best = None
+        for key in candidates:
+            score = _cosine(vector, self._vectors[key])
+            if best is None or score > best[1]:
+                best = (key, score)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+
+class PlanCache:
+    """Cache of parsed LLM route plans (start_location, constraints, suggested_routes).
+
+    Exact lookups use a hash of the normalized prompt together with
+    ``version``, which should identify the model and prompt template so that
+    changing either invalidates old plans. When ``similarity_threshold`` is
+    set, a second tier matches paraphrased prompts through a character n-gram
+    index; such a match is only used if the cached plan's start location also
+    appears in the new prompt, so "樟葉駅から" never reuses a plan for "枚方市駅から".
+    """
+
+    def __init__(
+        self,
+        version: str,
+        similarity_threshold: Optional[float] = None,
+        **kwargs: Any
+    ):
+        self.version = version
+        self.similarity_threshold = similarity_threshold
+        self._store = PersistentLRUCache("plans", **kwargs)
+        self._lock = threading.Lock()
+        self._similar_hits = 0
+        self._index: Optional[NgramIndex] = None
+        if similarity_threshold is not None:
+            self._index = NgramIndex(maxsize=self._store.maxsize)
+            # Warm the index from the persisted plans of this version
+            for key, value in reversed(self._store.items(limit=self._store.maxsize)):
+                if value and value.get("version") == version:
+                    self._index.add(key, value["prompt"])
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.version}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return the cached plan for ``prompt`` (or a close paraphrase), if any."""
+        normalized = normalize_prompt(prompt)
+        found, value = self._store.get(self._key(normalized))
+        if found and value:
+            return value["plan"]
+        if self._index is None:
+            return None
+
+        with self._lock:
+            match = self._index.most_similar(normalized)
+        if match is None or match[1] < self.similarity_threshold:
+            return None
+        found, value = self._store.get(match[0])
+        if not found or not value:
+            with self._lock:
+                self._index.remove(match[0])
+            return None
+        start_name = normalize_place_name(value["plan"].get("start_location", {}).get("name", ""))
+        if not start_name or start_name not in normalized:
+            return None
+        with self._lock:
+            self._similar_hits += 1
+        return value["plan"]
+
+    async def aget(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Like ``get``, but off the event loop when plans are persisted (a miss reads the SQLite file)."""
+        if self._store.path is None:
+            return self.get(prompt)
+        return await asyncio.to_thread(self.get, prompt)
+
+    def set(self, prompt: str, plan: Dict[str, Any]) -> None:
+        normalized = normalize_prompt(prompt)
+        key = self._key(normalized)
+        self._store.set(key, {"version": self.version, "prompt": normalized, "plan": plan})
+        if self._index is not None:
+            with self._lock:
+                self._index.add(key, normalized)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._store.stats()
+        stats["similar_hits"] = self._similar_hits
+        return stats
+
+    def close(self) -> None:
+        self._store.close()
@@ -0,0 +1,148 @@
+"""Encoded polyline handling and track simplification for Directions geometry.
+
+Implements Google's encoded polyline format
+(https://developers.google.com/maps/documentation/utilities/polylinealgorithm)
+with NumPy so that dense 100 km tracks are decoded, simplified and
+re-encoded without per-point Python loops.
+"""
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+from app.geodesy import planar_point_to_segment, to_local_xy
+
+# A 64-bit zigzag value needs at most 13 five-bit chunks; polylines use 32-bit values
+_MAX_CHUNKS = 7
+
+
+def _decode_values(encoded: str) -> np.ndarray:
+    """Decode the signed integer values (1e5 units) of one or more concatenated polylines."""
+    chunks = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    # A chunk without the 0x20 continuation bit ends a value
+    ends = (chunks & 0x20) == 0
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    value_ids = np.cumsum(np.concatenate(([0], ends[:-1])))
+    positions = np.arange(len(chunks)) - starts[value_ids]
+    values = np.add.reduceat((chunks & 0x1f) << (5 * positions), starts)
+    # Undo the zigzag encoding of signed deltas
+    return np.where(values & 1, ~(values >> 1), values >> 1)
+
+
+def decode_polyline(encoded: str) -> np.ndarray:
+    """Decode an encoded polyline into an ``(N, 2)`` array of ``(lat, lng)``."""
+    if not encoded:
+        return np.empty((0, 2))
+    deltas = _decode_values(encoded)
+    if len(deltas) % 2:
+        raise ValueError("Encoded polyline has an odd number of values")
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 1e5
+
+
+def decode_polylines(encoded: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode many polylines in one vectorized pass.
+
+    Returns all points as one ``(N, 2)`` array plus the index where each
+    polyline's points start. Much faster than decoding short step polylines
+    one at a time.
+    """
+    encoded = [e for e in encoded if e]
+    if not encoded:
+        return np.empty((0, 2)), np.empty(0, dtype=np.int64)
+    deltas = _decode_values("".join(encoded))
+    if len(deltas) % 2:
+        raise ValueError("Encoded polyline has an odd number of values")
+    deltas = deltas.reshape(-1, 2)
+    # Every polyline's values end exactly at its last character, so its point
+    # count follows from the number of value-ending chunks it contains.
+    counts = np.array([
+        np.count_nonzero(((np.frombuffer(e.encode("ascii"), dtype=np.uint8) - 63) & 0x20) == 0) // 2
+        for e in encoded
+    ])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    totals = np.cumsum(deltas, axis=0)
+    # Each polyline starts from absolute coordinates: subtract the running sum
+    # reached at the end of the previous polyline
+    previous_totals = np.vstack((np.zeros((1, 2), dtype=totals.dtype), totals[starts[1:] - 1]))
+    points = totals - np.repeat(previous_totals, counts, axis=0)
+    return points / 1e5, starts
+
+
+def encode_polyline(points: Any) -> str:
+    """Encode an ``(N, 2)`` array-like of ``(lat, lng)`` into an encoded polyline."""
+    coords = np.round(np.asarray(points, dtype=np.float64).reshape(-1, 2) * 1e5).astype(np.int64)
+    if len(coords) == 0:
+        return ""
+    deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    shifts = 5 * np.arange(_MAX_CHUNKS)
+    parts = (values[:, None] >> shifts) & 0x1f
+    # Number of chunks each value needs (at least one, even for zero)
+    bit_length = np.floor(np.log2(np.maximum(values, 1))).astype(np.int64) + 1
+    counts = np.maximum(1, -(-bit_length // 5))
+    used = np.arange(_MAX_CHUNKS) < counts[:, None]
+    continued = np.arange(_MAX_CHUNKS) < (counts[:, None] - 1)
+    chars = (parts | np.where(continued, 0x20, 0)) + 63
+    return chars[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def simplify_track(points: Any, tolerance_m: float) -> np.ndarray:
+    """Simplify a track with Douglas–Peucker, keeping points further than ``tolerance_m`` from the line.
+
+    Each split step measures all points of a span against its chord in one
+    vectorized pass, so a dense 100 km track simplifies in milliseconds.
+    The first and last points are always kept.
+    """
+    track = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(track) < 3 or tolerance_m <= 0:
+        return track
+
+    xy = to_local_xy(track)
+    # Radial prefilter: keep only the first point of every tolerance-long
+    # stretch of path. This bounds the error by the tolerance and removes the
+    # closely spaced points that make Douglas–Peucker iterate many times.
+    travelled = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+    bins = np.floor(travelled / tolerance_m)
+    first_in_bin = np.concatenate(([True], bins[1:] != bins[:-1]))
+    first_in_bin[-1] = True
+    track, xy = track[first_in_bin], xy[first_in_bin]
+    if len(track) < 3:
+        return track
+
+    keep = np.zeros(len(track), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(track) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = planar_point_to_segment(xy[first + 1:last], xy[first], xy[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return track[keep]
+
+
+def route_track(route: Dict[str, Any]) -> np.ndarray:
+    """Build the dense ``(lat, lng)`` track of a Directions API route.
+
+    Step polylines are concatenated (dropping the shared point where one step
+    ends and the next begins); the coarser ``overview_polyline`` is used when
+    the route has no step geometry.
+    """
+    encoded = [
+        step.get("polyline", {}).get("points", "")
+        for leg in route.get("legs", [])
+        for step in leg.get("steps", [])
+    ]
+    points, starts = decode_polylines(encoded)
+    if len(points) == 0:
+        return decode_polyline(route.get("overview_polyline", {}).get("points", ""))
+    # Drop the shared point where one step ends and the next begins
+    joints = starts[1:]
+    duplicate = np.zeros(len(points), dtype=bool)
+    duplicate[joints] = np.all(points[joints] == points[joints - 1], axis=1)
+    return points[~duplicate]
@@ -0,0 +1,49 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Async token bucket allowing ``rate`` acquisitions per second on average.
+
+    Up to ``burst`` acquisitions (default: one second's worth) go through at
+    once after an idle period; beyond that callers wait their turn in FIFO
+    order.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._acquired = 0
+        self._throttled = 0
+        self._waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self._throttled += 1
+                self._waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+            self._acquired += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.rate,
+            "acquired": self._acquired,
+            "throttled": self._throttled,
+            "waited_seconds": round(self._waited, 3)
+        }
@@ -0,0 +1,284 @@
+"""Persistent store of resolved routes, looked up by start location.
+
+Every route that got real road geometry is saved with its start, waypoints,
+polyline, distance, duration, description and elevation. Routes are indexed
+by the ~1 km grid cell of their start, so "routes starting within r meters"
+is a range scan over a handful of cells followed by an exact distance check.
+
+``PostgresRouteStore`` keeps them in PostgreSQL behind an async connection
+pool (``ROUTE_STORE_URL=postgresql://...``); ``MemoryRouteStore`` is the
+in-process stand-in for tests and single-instance setups
+(``ROUTE_STORE_URL=memory``).
+"""
+import asyncio
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.geodesy import bbox_for_radius, haversine_m
+
+# Grid cell edge in degrees of latitude/longitude (about 1 km north-south)
+_CELL_DEG = 0.01
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    route_key TEXT PRIMARY KEY,
+    start_name TEXT NOT NULL,
+    start_lat DOUBLE PRECISION NOT NULL,
+    start_lng DOUBLE PRECISION NOT NULL,
+    cell_lat INTEGER NOT NULL,
+    cell_lng INTEGER NOT NULL,
+    waypoints JSONB NOT NULL,
+    polyline TEXT,
+    distance_km DOUBLE PRECISION NOT NULL,
+    duration_s INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    elevation JSONB,
+    prompt TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS routes_start_cell ON routes (cell_lat, cell_lng);
+"""
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return int(math.floor(lat / _CELL_DEG)), int(math.floor(lng / _CELL_DEG))
+
+
+def route_key(route: Dict[str, Any]) -> str:
+    """Identify a route by its start, waypoints and geometry, so re-planning the same route stores it once."""
+    identity = [
+        [round(route["start"]["lat"], 5), round(route["start"]["lng"], 5)],
+        [[round(w["lat"], 5), round(w["lng"], 5)] for w in route["waypoints"]],
+        route.get("polyline")
+    ]
+    return hashlib.sha1(json.dumps(identity).encode("utf-8")).hexdigest()
+
+
+def _closest(
+    routes: Sequence[Dict[str, Any]],
+    lat: float,
+    lng: float,
+    radius_m: float,
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Routes starting within ``radius_m`` of ``(lat, lng)``, closest first, newest first on ties."""
+    if not routes:
+        return []
+    distances = haversine_m(
+        lat, lng,
+        np.array([r["start"]["lat"] for r in routes]),
+        np.array([r["start"]["lng"] for r in routes])
+    )
+    ranked = sorted(
+        (i for i in range(len(routes)) if distances[i] <= radius_m),
+        key=lambda i: (round(float(distances[i])), -routes[i].get("created_at", 0.0))
+    )
+    return [routes[i] for i in ranked[:limit]]
+
+
+class MemoryRouteStore:
+    """In-process route store; keeps the ``maxsize`` most recently saved routes."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._routes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cells: Dict[Tuple[int, int], Dict[str, Dict[str, Any]]] = {}
+        self._counters = {"hits": 0, "misses": 0, "saved": 0}
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def save(self, routes: Sequence[Dict[str, Any]]) -> int:
+        """Store routes not stored yet; returns how many were new."""
+        saved = 0
+        for route in routes:
+            key = route_key(route)
+            if key in self._routes:
+                continue
+            record = {**route, "created_at": time.time()}
+            self._routes[key] = record
+            self._cells.setdefault(_cell(route["start"]["lat"], route["start"]["lng"]), {})[key] = record
+            saved += 1
+            if len(self._routes) > self.maxsize:
+                old_key, old = self._routes.popitem(last=False)
+                cell = _cell(old["start"]["lat"], old["start"]["lng"])
+                del self._cells[cell][old_key]
+                if not self._cells[cell]:
+                    del self._cells[cell]
+        self._counters["saved"] += saved
+        return saved
+
+    async def near(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        limit: int,
+        max_age: Optional[float] = None,
+        prompt: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Stored routes starting within ``radius_m`` of ``(lat, lng)``, closest first.
+
+        Routes saved more than ``max_age`` seconds ago are left out, and so
+        are routes saved for another prompt than ``prompt`` when it is given.
+        """
+        min_lat, min_lng, max_lat, max_lng = bbox_for_radius(lat, lng, radius_m)
+        (row0, col0), (row1, col1) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+        oldest = time.time() - max_age if max_age is not None else float("-inf")
+        candidates = [
+            route
+            for row in range(row0, row1 + 1)
+            for col in range(col0, col1 + 1)
+            for route in self._cells.get((row, col), {}).values()
+            if route["created_at"] >= oldest and (prompt is None or route.get("prompt") == prompt)
+        ]
+        found = _closest(candidates, lat, lng, radius_m, limit)
+        self._counters["hits" if found else "misses"] += 1
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "size": len(self._routes)}
+
+
+class PostgresRouteStore:
+    """Route store in PostgreSQL, shared by every server instance.
+
+    Connections come from a psycopg async pool of ``min_size`` to
+    ``max_size`` connections, opened (and the table created) by ``open()``
+    or on first use.
+    """
+
+    def __init__(self, conninfo: str, min_size: int = 1, max_size: int = 4):
+        try:
+            from psycopg_pool import AsyncConnectionPool
+        except ImportError as e:
+            raise ImportError("The Postgres route store requires psycopg[pool] (pip install 'psycopg[binary,pool]')") from e
+        self._pool = AsyncConnectionPool(
+            conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            kwargs={"autocommit": True},
+            open=False
+        )
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+        self._counters = {"hits": 0, "misses": 0, "saved": 0}
+
+    async def open(self) -> None:
+        async with self._open_lock:
+            if self._opened:
+                return
+            await self._pool.open(wait=True)
+            async with self._pool.connection() as conn:
+                await conn.execute(_SCHEMA)
+            self._opened = True
+
+    async def close(self) -> None:
+        await self._pool.close()
+        self._opened = False
+
+    async def save(self, routes: Sequence[Dict[str, Any]]) -> int:
+        from psycopg.types.json import Jsonb
+
+        if not routes:
+            return 0
+        await self.open()
+        rows = [
+            (
+                route_key(route),
+                route["start"]["name"],
+                route["start"]["lat"],
+                route["start"]["lng"],
+                *_cell(route["start"]["lat"], route["start"]["lng"]),
+                Jsonb(route["waypoints"]),
+                route.get("polyline"),
+                route["distance"],
+                int(route["duration"]),
+                route["description"],
+                Jsonb(route.get("elevation")),
+                route.get("prompt")
+            )
+            for route in routes
+        ]
+        async with self._pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.executemany(
+                    "INSERT INTO routes (route_key, start_name, start_lat, start_lng, cell_lat, cell_lng, "
+                    "waypoints, polyline, distance_km, duration_s, description, elevation, prompt) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+                    "ON CONFLICT (route_key) DO NOTHING",
+                    rows,
+                    returning=False
+                )
+                saved = max(cur.rowcount, 0)
+        self._counters["saved"] += saved
+        return saved
+
+    async def near(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        limit: int,
+        max_age: Optional[float] = None,
+        prompt: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        await self.open()
+        min_lat, min_lng, max_lat, max_lng = bbox_for_radius(lat, lng, radius_m)
+        (row0, col0), (row1, col1) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+        async with self._pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT start_name, start_lat, start_lng, waypoints, polyline, distance_km, duration_s, "
+                "description, elevation, prompt, extract(epoch FROM created_at) "
+                "FROM routes "
+                "WHERE cell_lat BETWEEN %s AND %s AND cell_lng BETWEEN %s AND %s "
+                "AND start_lat BETWEEN %s AND %s AND start_lng BETWEEN %s AND %s "
+                "AND (%s::double precision IS NULL OR created_at >= now() - make_interval(secs => %s)) "
+                "AND (%s::text IS NULL OR prompt = %s) "
+                # The exact distance ranking happens below; bound how many rows it sees
+                "ORDER BY created_at DESC LIMIT %s",
+                (row0, row1, col0, col1, min_lat, max_lat, min_lng, max_lng, max_age, max_age, prompt, prompt, limit * 20)
+            )
+            rows = await cur.fetchall()
+        candidates = [
+            {
+                "start": {"name": name, "lat": start_lat, "lng": start_lng},
+                "waypoints": waypoints,
+                "polyline": polyline,
+                "distance": distance,
+                "duration": duration,
+                "description": description,
+                "elevation": elevation,
+                "prompt": prompt,
+                "created_at": float(created_at)
+            }
+            for name, start_lat, start_lng, waypoints, polyline, distance, duration,
+            description, elevation, prompt, created_at in rows
+        ]
+        found = _closest(candidates, lat, lng, radius_m, limit)
+        self._counters["hits" if found else "misses"] += 1
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+
+RouteStore = Union[MemoryRouteStore, PostgresRouteStore]
+
+
+def create_route_store(url: Optional[str], pool_size: int = 4) -> Optional[RouteStore]:
+    """Build the store ``url`` names: ``memory``, a PostgreSQL conninfo/URL, or None for no store."""
+    if not url:
+        return None
+    if url == "memory":
+        return MemoryRouteStore()
+    return PostgresRouteStore(url, max_size=pool_size)
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce concurrent async calls that share a key into one execution.
+
+    The first caller for a key starts ``fn()``; callers arriving while it is
+    still running await the same task and receive its result or exception.
+    Nothing is remembered once the call finishes, so later callers start a new
+    execution.
+
+    Cancelling one caller does not affect the others. The shared execution is
+    only cancelled when every caller waiting on it has been cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = {"executions": 0, "coalesced": 0, "failed": 0, "cancelled": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            self._counters["executions"] += 1
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+        else:
+            self._counters["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up; stop the work nobody will read
+                call.task.cancel()
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.cancelled():
+            self._counters["cancelled"] += 1
+        elif call.task.exception() is not None:
+            self._counters["failed"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return execution and coalescing counters."""
+        return {**self._counters, "in_flight": len(self._calls)}
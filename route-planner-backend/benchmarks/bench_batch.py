@@ -0,0 +1,81 @@
+"""Batch planning benchmark: sequential /api/route calls versus run_batch.
+
+Plans routes for ``--stations`` different start stations (each requested
+``--repeat`` times) against offline fakes and reports wall time and the
+number of LLM, geocode and directions calls each approach makes.
+
+    python -m benchmarks.bench_batch --stations 30 --repeat 2 --concurrency 8
+    python -m benchmarks.bench_batch --native-batch
+"""
+import argparse
+import asyncio
+import time
+
+from app.agent import RouteAgent
+from app.batch import run_batch
+from app.config import AgentSettings
+from app.models import RouteRequest
+from benchmarks.fakes import BatchingFakeChatModel, FakeChatModel, FakeGoogleMapsClient
+
+
+def _agent(args: argparse.Namespace) -> RouteAgent:
+    model = BatchingFakeChatModel if args.native_batch else FakeChatModel
+    return RouteAgent(
+        "sk-benchmark",
+        "AIza-benchmark",
+        settings=AgentSettings(batch_concurrency=args.concurrency, geocode_rate_limit=args.geocode_rate),
+        llm=model(latency=args.llm_latency, start_from_prompt=True),
+        gmaps=FakeGoogleMapsClient(latency=args.maps_latency)
+    )
+
+
+def _report(label: str, agent: RouteAgent, elapsed: float, requests: int) -> None:
+    plan = agent.plan_cache.stats()
+    print(f"{label:<11} {elapsed:6.2f} s  {requests / elapsed:6.2f} req/s  "
+          f"LLM plans {plan['misses']:>3}  maps calls {agent.gmaps.calls}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    requests = [
+        RouteRequest(prompt=f"テスト{i:03d}駅から100km圏内のルート")
+        for i in range(args.stations)
+        for _ in range(args.repeat)
+    ]
+
+    if not args.skip_sequential:
+        agent = _agent(args)
+        started = time.perf_counter()
+        for request in requests:
+            await agent.process_route_request(request)
+        _report("sequential", agent, time.perf_counter() - started, len(requests))
+
+    agent = _agent(args)
+    started = time.perf_counter()
+    first = None
+    async for event in run_batch(agent, requests):
+        if first is None:
+            first = time.perf_counter() - started
+        if event["type"] == "error":
+            print(f"  request {event['index']} failed: {event['error']}")
+    _report("batch", agent, time.perf_counter() - started, len(requests))
+    print(f"first result after {first:.2f} s")
+    if args.native_batch:
+        print(f"native LLM batch calls: {agent.llm.batch_calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--maps-latency", type=float, default=0.1)
+    parser.add_argument("--geocode-rate", type=float, default=None, help="Geocode calls per second")
+    parser.add_argument("--native-batch", action="store_true", help="Use a fake LLM with a native batch API")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Checkpoint benchmark: retrying requests whose first attempt failed, with and without resume.
+
+Each request's first attempt fails to geocode its start (injected Maps
+failures) after the LLM plan is done; the retry then runs with Maps healthy.
+Without checkpoints the retry pays for the LLM call again; with them it
+resumes at ``locate_start``. Reports retry latency and LLM calls.
+
+    python -m benchmarks.bench_checkpoints
+    python -m benchmarks.bench_checkpoints --checkpoints /tmp/checkpoints.db
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from app.models import RouteRequest
+from benchmarks.fakes import FakeChatModel, FakeGoogleMapsClient
+
+
+async def run(checkpoint_path: Optional[str], args: argparse.Namespace) -> None:
+    agent = RouteAgent(
+        "sk-benchmark",
+        "AIza-benchmark",
+        # No plan cache, so only the checkpoint can spare the LLM call
+        settings=AgentSettings(checkpoint_path=checkpoint_path, plan_cache_size=0, maps_max_attempts=1),
+        llm=FakeChatModel(latency=args.llm_latency, start_from_prompt=True),
+        gmaps=FakeGoogleMapsClient(latency=args.maps_latency, failure_rate=1.0)
+    )
+    # Starts outside the curated places, so they need a geocode call
+    requests = [RouteRequest(prompt=f"架空{i}丁目駅から50kmのサイクリングルート") for i in range(args.requests)]
+    first = await asyncio.gather(*(agent.process_route_request(request) for request in requests))
+    assert all(not response.routes for response in first)
+    agent.gmaps.failure_rate = 0.0
+    llm_calls = agent.llm.calls
+    started = time.perf_counter()
+    retried = await asyncio.gather(*(agent.process_route_request(request) for request in requests))
+    elapsed = time.perf_counter() - started
+    print(f"{checkpoint_path or 'none':>10}: retries {elapsed * 1000:7.1f} ms  "
+          f"routes {sum(len(r.routes) for r in retried):>3}  LLM calls on retry {agent.llm.calls - llm_calls}")
+    if agent.checkpoints is not None:
+        print(f"{'':>10}  checkpoints {agent.checkpoints.stats()}")
+        await agent.checkpoints.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checkpoints", default="memory", help="memory or a SQLite file path")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--maps-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    for checkpoint_path in (None, args.checkpoints):
+        asyncio.run(run(checkpoint_path, args))
+
+
+if __name__ == "__main__":
+    main()
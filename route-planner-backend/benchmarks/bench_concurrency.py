@@ -0,0 +1,80 @@
+"""Concurrent /api/route throughput benchmark against offline fakes.
+
+Runs N overlapping ``process_route_request`` calls on one event loop and
+records how long the loop stalls, which is what ``/healthz`` latency sees.
+Each request starts from a different (fake) station, so every one runs its
+own workflow; a second run sends N copies of one prompt, which request
+coalescing answers with a single workflow run.
+
+    python -m benchmarks.bench_concurrency --requests 20 --llm-latency 0.5 --maps-latency 0.2
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from app.agent import RouteAgent
+from app.models import RouteRequest
+from benchmarks.fakes import FakeChatModel, FakeGoogleMapsClient
+
+PROMPT = "現在地点：樟葉駅より100KM圏内のロードバイクが走りやすいルート候補を３つほどGoogleMapに表示してください。"
+
+
+def distinct_prompt(index: int) -> str:
+    # FakeChatModel(start_from_prompt=True) starts the plan from the name before "から"
+    return f"架空{index}丁目駅から100KM圏内のロードバイクが走りやすいルート候補を３つほどGoogleMapに表示してください。"
+
+
+async def _loop_lag_probe(stop: asyncio.Event, interval: float, lags: list) -> None:
+    """Sleep for ``interval`` repeatedly and record how late each wake-up is."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(prompts: List[str], llm_latency: float, maps_latency: float) -> None:
+    agent = RouteAgent(
+        "sk-benchmark",
+        "AIza-benchmark",
+        llm=FakeChatModel(latency=llm_latency, start_from_prompt=True),
+        gmaps=FakeGoogleMapsClient(latency=maps_latency)
+    )
+    requests = len(prompts)
+
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag_probe(stop, 0.01, lags))
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(
+        *(agent.process_route_request(RouteRequest(prompt=prompt)) for prompt in prompts)
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    ok = sum(1 for r in responses if r.routes)
+    print(f"requests:          {requests} ({ok} with routes)")
+    print(f"wall time:         {elapsed:.2f} s")
+    print(f"throughput:        {requests / elapsed:.2f} req/s")
+    print(f"max loop stall:    {max(lags, default=0) * 1000:.1f} ms")
+    print(f"workflow runs:     {agent.coalescing_stats()}")
+    print(f"LLM calls:         {agent.llm.calls}")
+    print(f"maps calls:        {agent.gmaps.calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--maps-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    print("distinct prompts")
+    asyncio.run(run([distinct_prompt(i) for i in range(args.requests)], args.llm_latency, args.maps_latency))
+    print("\nidentical prompts (coalesced)")
+    asyncio.run(run([PROMPT] * args.requests, args.llm_latency, args.maps_latency))
+
+
+if __name__ == "__main__":
+    main()
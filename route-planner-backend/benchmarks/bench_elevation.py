@@ -0,0 +1,87 @@
+"""DEM sampling benchmark and self-check on synthetic SRTM tiles.
+
+Writes 3" .hgt tiles around Kansai whose heights are a known plane (which
+bilinear interpolation must reproduce exactly), checks sampling and LRU
+eviction, times vectorized sampling against a per-point loop, and runs a
+route request with elevation through the offline fakes.
+
+    python -m benchmarks.bench_elevation
+    python -m benchmarks.bench_elevation --points 1000000 --size 3601
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+import numpy as np
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from app.elevation import DemTiles, elevation_profile, tile_name
+from app.models import RouteRequest
+from benchmarks.fakes import FakeChatModel, FakeGoogleMapsClient
+
+TILES = [(34, 135), (34, 134), (35, 135), (35, 134)]
+
+
+def _plane(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    return 200 * (lat - 34) + 100 * (lng - 134)
+
+
+def _write_tiles(directory: str, size: int) -> None:
+    for south, west in TILES:
+        lat = south + 1 - np.arange(size)[:, None] / (size - 1)
+        lng = west + np.arange(size)[None, :] / (size - 1)
+        heights = np.rint(_plane(lat, lng)).astype(">i2")
+        heights.tofile(f"{directory}/{tile_name(south, west)}.hgt")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=200_000)
+    parser.add_argument("--size", type=int, default=1201, help="Samples per tile edge (1201 or 3601)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_tiles(tmp, args.size)
+        dem = DemTiles(tmp, max_tiles=2)
+
+        rng = np.random.default_rng(0)
+        points = np.column_stack([rng.uniform(34, 36, args.points), rng.uniform(134, 136, args.points)])
+        started = time.perf_counter()
+        heights = dem.sample(points)
+        vectorized = time.perf_counter() - started
+        # Heights were rounded to whole meters when written
+        error = np.abs(heights - _plane(points[:, 0], points[:, 1]))
+        assert error.max() < 1.0, error.max()
+        assert np.isnan(dem.sample([(33.5, 135.5)])).all()
+        print(f"{args.points} points over {len(TILES)} tiles in {vectorized * 1000:.1f} ms "
+              f"(max error {error.max():.2f} m), tiles {dem.stats()}")
+
+        loop_points = points[:2000]
+        started = time.perf_counter()
+        for point in loop_points:
+            dem.sample(point[None, :])
+        per_point = (time.perf_counter() - started) / len(loop_points)
+        print(f"per-point loop: {per_point * 1e6:.1f} µs/point, vectorized: {vectorized / args.points * 1e6:.2f} µs/point")
+
+        track = np.column_stack([np.linspace(34.2, 35.8, 500), np.linspace(134.2, 135.8, 500)])
+        profile = elevation_profile(dem, track)
+        print(f"diagonal track: {len(profile['distances_m'])} samples, "
+              f"gain {profile['gain_m']:.0f} m, loss {profile['loss_m']:.0f} m (expected gain ~480 m)")
+
+        agent = RouteAgent(
+            "sk-benchmark",
+            "AIza-benchmark",
+            settings=AgentSettings(dem_path=tmp),
+            llm=FakeChatModel(latency=0),
+            gmaps=FakeGoogleMapsClient(latency=0)
+        )
+        response = asyncio.run(agent.process_route_request(RouteRequest(prompt="樟葉駅から100km圏内のルート")))
+        for distance, elevation in zip(response.distances, response.elevations):
+            print(f"route {distance:6.1f} km: +{elevation.gain_m:.0f} m / -{elevation.loss_m:.0f} m, "
+                  f"{len(elevation.elevations_m)} profile points")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Response encoding benchmark: render time and payload size of a dense RouteResponse.
+
+Builds a response of ``--routes`` routes × ``--points`` points (a smooth
+random walk with ~10 m steps, as decoded road geometry looks) and times
+FastAPI's default rendering against the orjson and columnar MessagePack
+encoders of app.encoding, each uncompressed, gzip'ed and brotli'ed. Then
+checks through the app that negotiated responses decode to the same data.
+
+    python -m benchmarks.bench_encoding
+    python -m benchmarks.bench_encoding --routes 3 --points 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import msgpack
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from app import encoding
+from app.models import RoutePoint, RouteResponse
+
+
+def _best_ms(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _response(routes: int, points: int, seed: int = 0) -> RouteResponse:
+    rng = np.random.default_rng(seed)
+    tracks = []
+    for _ in range(routes):
+        heading = np.cumsum(rng.normal(0, 0.1, points))
+        # ~10 m steps in degrees
+        lat = 34.86 + np.cumsum(np.cos(heading)) * 9e-5
+        lng = 135.68 + np.cumsum(np.sin(heading)) * 1.1e-4
+        track = [RoutePoint(lat=round(a, 6), lng=round(b, 6)) for a, b in zip(lat.tolist(), lng.tolist())]
+        track[0].name, track[-1].name = "樟葉駅", "京都駅"
+        tracks.append(track)
+    return RouteResponse(
+        routes=tracks,
+        distances=[points * 0.01] * routes,
+        descriptions=["淀川沿いのサイクリングロード"] * routes,
+        polylines=[None] * routes,
+        tier="full"
+    )
+
+
+def _fastapi_default(response: RouteResponse) -> bytes:
+    # What FastAPI does for a response_model return value: dump, jsonable_encoder, json.dumps
+    content = jsonable_encoder(response.model_dump(mode="json"))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_columnar(route: dict) -> list:
+    """Points of one columnar MessagePack route, as JSON point dicts."""
+    lat = np.cumsum(np.frombuffer(route["lat"], dtype="<i4").astype(np.int64)) / encoding.COLUMNAR_SCALE
+    lng = np.cumsum(np.frombuffer(route["lng"], dtype="<i4").astype(np.int64)) / encoding.COLUMNAR_SCALE
+    lng = (lng + 180) % 360 - 180
+    names = dict(zip(route["name_index"], route["names"]))
+    return [
+        {"lat": a, "lng": b, "name": names.get(i)}
+        for i, (a, b) in enumerate(zip(lat.tolist(), lng.tolist()))
+    ]
+
+
+def _same(document: dict, expected: dict) -> bool:
+    """Equal, with coordinates compared to the columnar form's 1e-7° resolution."""
+    if {k: v for k, v in document.items() if k != "routes"} != {k: v for k, v in expected.items() if k != "routes"}:
+        return False
+    return all(
+        len(route) == len(expected_route) and all(
+            p["name"] == q["name"] and abs(p["lat"] - q["lat"]) <= 1e-7 and abs(p["lng"] - q["lng"]) <= 1e-7
+            for p, q in zip(route, expected_route)
+        )
+        for route, expected_route in zip(document["routes"], expected["routes"])
+    )
+
+
+def _roundtrip(response: RouteResponse) -> None:
+    """Request the route through the app with each negotiated format and compare the decoded data."""
+    from app.main import app, get_route_agent
+
+    class Agent:
+        class settings:
+            response_compress_min_bytes = 1024
+            response_gzip_level = 5
+            response_brotli_quality = 4
+
+        async def process_route_request(self, request):
+            return response
+
+    expected = json.loads(_fastapi_default(response))
+
+    async def check() -> None:
+        app.dependency_overrides[get_route_agent] = Agent
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for accept, accept_encoding in [
+                ("application/json", "identity"),
+                ("application/json", "gzip"),
+                ("application/json", "br, gzip"),
+                ("application/msgpack", "gzip"),
+                ("application/x-msgpack, application/json;q=0.5", "br")
+            ]:
+                reply = await client.post(
+                    "/api/route",
+                    json={"prompt": "bench"},
+                    headers={"Accept": accept, "Accept-Encoding": accept_encoding}
+                )
+                # httpx already undid Content-Encoding
+                if reply.headers["content-type"] in encoding.MSGPACK_TYPES:
+                    document = msgpack.unpackb(reply.content)
+                    document["routes"] = [decode_columnar(route) for route in document["routes"]]
+                    assert _same(document, expected), (accept, accept_encoding)
+                else:
+                    assert reply.json() == expected, (accept, accept_encoding)
+                print(f"  {accept:<48} {accept_encoding:<9} -> {reply.headers['content-type']}, "
+                      f"{reply.headers.get('content-encoding', 'identity')}, {reply.headers['content-length']} bytes")
+        app.dependency_overrides.pop(get_route_agent)
+
+    asyncio.run(check())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", type=int, default=3)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    response = _response(args.routes, args.points)
+    print(f"{args.routes} routes × {args.points} points")
+    encoders = [
+        ("fastapi default", _fastapi_default),
+        ("pydantic model_dump_json", lambda r: r.model_dump_json().encode("utf-8")),
+        ("orjson", encoding.to_json),
+        ("msgpack columnar", encoding.to_msgpack)
+    ]
+    codings = [("identity", None), ("gzip", "gzip")] + ([("br", "br")] if encoding.brotli is not None else [])
+    print(f"{'encoder':<26}{'coding':<10}{'encode ms':>10}{'compress ms':>12}{'bytes':>10}")
+    for name, encode in encoders:
+        body = encode(response)
+        encode_ms = _best_ms(lambda: encode(response), args.repeat)
+        for coding_name, coding in codings:
+            if coding is None:
+                compressed, compress_ms = body, 0.0
+            else:
+                compressed = encoding.compress(body, coding)
+                compress_ms = _best_ms(lambda: encoding.compress(body, coding), args.repeat)
+            print(f"{name:<26}{coding_name:<10}{encode_ms:>10.2f}{compress_ms:>12.2f}{len(compressed):>10}")
+    if encoding.brotli is None:
+        print("(brotli not installed; br rows skipped)")
+    _roundtrip(response)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Geodesy benchmark: vectorized app.geodesy against the scalar haversine loop it replaced.
+
+    python -m benchmarks.bench_geodesy --points 10000 100000
+"""
+import argparse
+import time
+from math import atan2, cos, radians, sin, sqrt
+
+import numpy as np
+
+from app.geodesy import bounding_box, distance_matrix_m, path_length_m, point_to_segment_m, segment_bearings_deg
+
+
+def _scalar_haversine(lat1, lon1, lat2, lon2):
+    # The nested fallback formerly defined in get_route_details
+    R = 6371  # Earth's radius in kilometers
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
+
+def _scalar_path_km(points):
+    return sum(
+        _scalar_haversine(points[i]["lat"], points[i]["lng"], points[i+1]["lat"], points[i+1]["lng"])
+        for i in range(len(points)-1)
+    )
+
+
+def _best_ms(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--matrix", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for count in args.points:
+        track = np.cumsum(rng.normal(0, 0.0001, (count, 2)), axis=0) + (34.86, 135.68)
+        dicts = [{"lat": lat, "lng": lng} for lat, lng in track.tolist()]
+        scalar = _scalar_path_km(dicts)
+        vector = path_length_m(track) / 1000
+        print(f"{count:>7} points  path length  scalar loop {_best_ms(lambda: _scalar_path_km(dicts)):8.2f} ms"
+              f"  numpy {_best_ms(lambda: path_length_m(track)):7.2f} ms"
+              f"  (from dicts {_best_ms(lambda: path_length_m(dicts)):7.2f} ms)"
+              f"  |diff| {abs(scalar - vector) * 1000:.2e} m")
+        print(f"{count:>7} points  bearings {_best_ms(lambda: segment_bearings_deg(track)):.2f} ms"
+              f"  point-to-segment {_best_ms(lambda: point_to_segment_m(track, track[0], track[-1])):.2f} ms"
+              f"  bbox {_best_ms(lambda: bounding_box(track, pad_m=1000)):.2f} ms")
+
+    places = rng.uniform((34.5, 135.3), (35.3, 136.1), (args.matrix, 2))
+    print(f"distance matrix {args.matrix}x{args.matrix}: {_best_ms(lambda: distance_matrix_m(places)):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
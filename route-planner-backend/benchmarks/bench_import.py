@@ -0,0 +1,82 @@
+"""Import-time benchmark: how long ``import app.main`` takes in a fresh interpreter.
+
+Runs each import ``--runs`` times in a new process with ``-X importtime``,
+reports the median wall time and the slowest top-level imports, checks that
+the heavy modules (deferred until warm-up builds the agent) were not loaded,
+and fails when the median exceeds ``--budget-ms``. ``app.agent`` is timed too:
+that is the import cost warm-up pays instead of the server's startup.
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --runs 10 --budget-ms 600
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Must not be imported by app.main; warm-up loads them with the agent
+DEFERRED = ["app.agent", "langgraph", "langchain_core", "langchain_community", "googlemaps", "numpy"]
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_once(module: str) -> Tuple[float, List[str], Dict[str, int]]:
+    """Import ``module`` in a fresh interpreter: ``(seconds, deferred modules loaded, top-level import µs)``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(module=module, deferred=DEFERRED)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and name.startswith("   ") and not name.startswith("    "):
+            top_level[name.strip()] = int(cumulative)
+    return report["seconds"], report["loaded"], top_level
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=800.0, help="Maximum median import time of app.main")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    failed = False
+    for module in ("app.main", "app.agent"):
+        runs = [_import_once(module) for _ in range(args.runs)]
+        seconds = np.array([run[0] for run in runs]) * 1000
+        loaded, top_level = runs[-1][1], runs[-1][2]
+        print(f"import {module}: median {np.median(seconds):7.1f} ms  min {seconds.min():7.1f} ms  max {seconds.max():7.1f} ms")
+        for name, micros in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {micros / 1000:7.1f} ms  {name}")
+        if module == "app.main":
+            if loaded:
+                print(f"    FAIL: imported deferred modules {loaded}")
+                failed = True
+            if np.median(seconds) > args.budget_ms:
+                print(f"    FAIL: over the {args.budget_ms:.0f} ms budget")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Offline router benchmark and self-check on the bundled OSM fixture.
+
+Builds the graph of an extract, saves and memory-maps it, checks A* against
+plain Dijkstra for every pair of nodes, then times graph loading and routing
+across the whole map.
+
+    python -m benchmarks.bench_local_router
+    python -m benchmarks.bench_local_router --extract kansai.osm.pbf --queries 20
+"""
+import argparse
+import heapq
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.local_router import LocalRouter, RoadGraph
+
+FIXTURE = Path(__file__).parent / "fixtures" / "kuzuha.osm"
+
+
+def _dijkstra_costs(graph: RoadGraph, source: int) -> np.ndarray:
+    costs = np.full(graph.node_count, np.inf)
+    costs[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > costs[node]:
+            continue
+        for edge in range(graph.indptr[node], graph.indptr[node + 1]):
+            neighbor = graph.indices[edge]
+            candidate = cost + graph.cost[edge]
+            if candidate < costs[neighbor]:
+                costs[neighbor] = candidate
+                heapq.heappush(heap, (candidate, neighbor))
+    return costs
+
+
+def _check_optimal(router: LocalRouter, sources: int) -> None:
+    graph = router.graph
+    for source in range(min(sources, graph.node_count)):
+        expected = _dijkstra_costs(graph, source)
+        for target in range(graph.node_count):
+            if target == source:
+                continue
+            hops = router._shortest_path(source, target)
+            cost = float(graph.cost[[edge for _, edge in hops]].sum()) if hops else np.inf
+            assert np.isclose(cost, expected[target], rtol=1e-4), (source, target, cost, expected[target])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--extract", default=str(FIXTURE))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--check-sources", type=int, default=100)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    graph = RoadGraph.from_extract(args.extract)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"built {graph.node_count} nodes / {graph.edge_count} edges in {build_ms:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "road.graph")
+        graph.save(path)
+        started = time.perf_counter()
+        router = LocalRouter.load(path)
+        print(f"memory-mapped {os.path.getsize(path) / 1e6:.1f} MB graph in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        _check_optimal(router, args.check_sources)
+        print("A* costs match Dijkstra")
+
+        rng = np.random.default_rng(0)
+        pairs = rng.integers(0, graph.node_count, (args.queries, 2))
+        timings, lengths = [], []
+        for source, target in pairs:
+            path_points = [(graph.lat[i], graph.lng[i]) for i in (source, target)]
+            started = time.perf_counter()
+            result = router.route(path_points)
+            timings.append((time.perf_counter() - started) * 1000)
+            if result is not None:
+                lengths.append(result["distance"] / 1000)
+        print(f"{len(timings)} routes, mean {np.mean(lengths):.1f} km: "
+              f"p50 {np.percentile(timings, 50):.1f} ms  p95 {np.percentile(timings, 95):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Maps HTTP layer benchmark against the local stub server.
+
+Geocodes ``--calls`` distinct places through RouteAgent against a stub with
+a long-tailed latency and injected 503s, once per client configuration:
+googlemaps' stock client with its built-in retry loop, the pooled client
+with jittered retries, and the pooled client with hedging as well. Reports
+call latency percentiles, failures, and the requests and TCP connections
+the stub saw.
+
+    python -m benchmarks.bench_maps_http
+    python -m benchmarks.bench_maps_http --calls 400 --latency lognormal:0.05:0.8 --failure-rate 0.1
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import googlemaps
+import numpy as np
+from prometheus_client import REGISTRY
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from benchmarks.fakes import FakeChatModel
+from benchmarks.maps_stub import MapsStubServer
+
+
+def _counter(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(f"{name}_total", labels) or 0.0
+
+
+async def _run(agent: RouteAgent, calls: int, concurrency: int) -> Dict[str, object]:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: List[float] = []
+    failed = 0
+
+    async def one(i: int) -> None:
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await agent._geocode_location(f"ベンチマーク地点{i:05d}")
+            except Exception:
+                failed += 1
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return {"elapsed": time.perf_counter() - started, "timings": timings, "failed": failed}
+
+
+def _configuration(args: argparse.Namespace, label: str, stub: MapsStubServer) -> None:
+    hedge_delay: Optional[float] = args.hedge_delay if label == "hedged" else None
+    settings = AgentSettings(
+        maps_base_url=stub.url,
+        maps_hedge_delay=hedge_delay,
+        maps_max_workers=args.concurrency * 2 if hedge_delay else args.concurrency,
+        geocode_concurrency=args.concurrency,
+        geocode_timeout=args.timeout,
+        places_path=None
+    )
+    gmaps = googlemaps.Client(key="AIza-benchmark", base_url=stub.url) if label == "stock" else None
+    agent = RouteAgent("sk-benchmark", "AIza-benchmark", settings=settings, llm=FakeChatModel(), gmaps=gmaps)
+    before = stub.stats()
+    retries = _counter("route_maps_retries", provider="geocode")
+    hedges = _counter("route_maps_hedges", provider="geocode", result="sent")
+
+    result = asyncio.run(_run(agent, args.calls, args.concurrency))
+    after = stub.stats()
+    p50, p95, p99 = np.percentile(result["timings"], [50, 95, 99])
+    print(f"{label:<8} {result['elapsed']:6.2f} s  p50 {p50:6.1f}  p95 {p95:7.1f}  p99 {p99:7.1f} ms  "
+          f"failed {result['failed']:>3}  http {after['requests'] - before['requests']:>4}  "
+          f"conns {after['connections'] - before['connections']:>3}  "
+          f"retries {_counter('route_maps_retries', provider='geocode') - retries:>3.0f}  "
+          f"hedges {_counter('route_maps_hedges', provider='geocode', result='sent') - hedges:>3.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:0.03:0.8", help="Stub latency spec (see benchmarks.fakes.Latency)")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--hedge-delay", type=float, default=0.08)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-call deadline in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with MapsStubServer(args.latency, args.failure_rate, args.seed) as stub:
+        for label in ("stock", "pooled", "hedged"):
+            _configuration(args, label, stub)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Route geometry benchmark: decode, simplify and encode a dense 100 km track.
+
+Compares the vectorized codec in app.polyline with googlemaps.convert and
+reports payload size as encoded polyline versus JSON RoutePoint objects.
+
+    python -m benchmarks.bench_polyline --km 100 --tolerance 5
+"""
+import argparse
+import json
+import time
+
+from googlemaps import convert
+
+from app.polyline import decode_polyline, encode_polyline, route_track, simplify_track
+from benchmarks.fakes import fake_leg
+
+
+def _best_ms(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--km", type=float, default=100.0)
+    parser.add_argument("--tolerance", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = (34.8626, 135.6787)
+    # fake_leg stretches the straight line by 1.3 to mimic road curvature
+    end = (start[0] + args.km / 1.3 / 111.0, start[1])
+    route = {"legs": [fake_leg(start, end, steps=200)]}
+    encoded_steps = [step["polyline"]["points"] for step in route["legs"][0]["steps"]]
+
+    track = route_track(route)
+    simplified = simplify_track(track, args.tolerance)
+    encoded = encode_polyline(simplified)
+    dense_json = json.dumps([{"lat": lat, "lng": lng, "name": None} for lat, lng in track.tolist()])
+
+    print(f"dense track points:      {len(track)}")
+    print(f"simplified points:       {len(simplified)} (tolerance {args.tolerance} m)")
+    print(f"decode, numpy:           {_best_ms(lambda: route_track(route), args.repeat):.2f} ms")
+    print(f"decode, googlemaps:      "
+          f"{_best_ms(lambda: [convert.decode_polyline(e) for e in encoded_steps], args.repeat):.2f} ms")
+    print(f"simplify:                {_best_ms(lambda: simplify_track(track, args.tolerance), args.repeat):.2f} ms")
+    print(f"encode, numpy:           {_best_ms(lambda: encode_polyline(simplified), args.repeat):.2f} ms")
+    print(f"encode, googlemaps:      "
+          f"{_best_ms(lambda: convert.encode_polyline(simplified.tolist()), args.repeat):.2f} ms")
+    print(f"payload, dense JSON:     {len(dense_json):,} bytes")
+    print(f"payload, polyline:       {len(encoded):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
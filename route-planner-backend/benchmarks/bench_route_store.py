@@ -0,0 +1,59 @@
+"""Route store benchmark: repeated requests from the same starts, with and without reuse.
+
+Sends ``--rounds`` rounds of requests for a few curated start stations
+through RouteAgent against the offline fakes. The first round plans and
+saves routes; later rounds repeat the same prompts and are served from the
+store, which only serves routes planned for the prompt at hand. Reports
+latency and LLM / Maps calls per round.
+
+    python -m benchmarks.bench_route_store
+    python -m benchmarks.bench_route_store --store postgresql://localhost/routes
+"""
+import argparse
+import asyncio
+import time
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from app.models import RouteRequest
+from benchmarks.fakes import FakeChatModel, FakeGoogleMapsClient
+
+STATIONS = ["樟葉駅", "枚方市駅", "京田辺駅", "八幡市駅"]
+
+
+async def run(args: argparse.Namespace) -> None:
+    agent = RouteAgent(
+        "sk-benchmark",
+        "AIza-benchmark",
+        settings=AgentSettings(route_store_url=args.store, route_store_min_routes=args.min_routes),
+        llm=FakeChatModel(latency=args.llm_latency, start_from_prompt=True),
+        gmaps=FakeGoogleMapsClient(latency=args.maps_latency)
+    )
+    for round_index in range(args.rounds):
+        llm_calls, maps_calls = agent.llm.calls, sum(agent.gmaps.calls.values())
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            agent.process_route_request(RouteRequest(prompt=f"{station}からのサイクリングルート"))
+            for station in STATIONS
+        ))
+        elapsed = time.perf_counter() - started
+        print(f"round {round_index + 1}: {elapsed * 1000:7.1f} ms  "
+              f"routes {sum(len(r.routes) for r in responses):>2}  "
+              f"LLM calls {agent.llm.calls - llm_calls}  maps calls {sum(agent.gmaps.calls.values()) - maps_calls}")
+    print(f"store: {agent.route_store.stats()}")
+    await agent.route_store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store", default="memory", help="memory or a PostgreSQL conninfo/URL")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--min-routes", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--maps-latency", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
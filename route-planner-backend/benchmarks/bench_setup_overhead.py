@@ -0,0 +1,75 @@
+"""Per-request setup overhead micro-benchmark.
+
+Measures what a request pays before any I/O happens: building prompt
+templates and compiling the LangGraph workflow, plus a full request against
+zero-latency fakes. Exits non-zero when the per-request overhead exceeds
+``--max-overhead-ms`` so it can guard against regressions.
+
+    python -m benchmarks.bench_setup_overhead --iterations 200
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.agent import ROUTE_PLAN_PROMPT, RouteAgent
+from app.models import RouteRequest
+from benchmarks.bench_concurrency import PROMPT
+from benchmarks.fakes import FakeChatModel, FakeGoogleMapsClient
+
+
+def _per_call_ms(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+async def _request_ms(agent: RouteAgent, iterations: int) -> float:
+    request = RouteRequest(prompt=PROMPT)
+    # Quiet the agent's per-request logging, so neither its output nor its
+    # formatting cost ends up in the measurement
+    agent_logger = logging.getLogger("app.agent")
+    level = agent_logger.level
+    agent_logger.setLevel(logging.WARNING)
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await agent.process_route_request(request)
+    finally:
+        agent_logger.setLevel(level)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--max-overhead-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    agent = RouteAgent(
+        "sk-benchmark",
+        "AIza-benchmark",
+        llm=FakeChatModel(latency=0),
+        gmaps=FakeGoogleMapsClient(latency=0)
+    )
+    template = ROUTE_PLAN_PROMPT.messages[0].prompt.template
+
+    parse_ms = _per_call_ms(lambda: ChatPromptTemplate.from_template(template), args.iterations)
+    compile_ms = _per_call_ms(agent._create_workflow, args.iterations)
+    request_ms = asyncio.run(_request_ms(agent, args.iterations))
+
+    print(f"prompt template parse:  {parse_ms:.3f} ms (paid once per process)")
+    print(f"workflow compile:       {compile_ms:.3f} ms (paid once per agent)")
+    print(f"request, zero-latency:  {request_ms:.3f} ms")
+
+    if args.max_overhead_ms is not None and request_ms > args.max_overhead_ms:
+        print(f"per-request overhead {request_ms:.3f} ms exceeds {args.max_overhead_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
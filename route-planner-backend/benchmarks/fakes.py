@@ -0,0 +1,291 @@
+"""Offline stand-ins for OpenAI and Google Maps used by the benchmarks."""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from googlemaps.exceptions import TransportError
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+import numpy as np
+from pydantic import PrivateAttr
+
+from app.polyline import encode_polyline
+
+CANNED_PLAN: Dict[str, Any] = {
+    "start_location": {"name": "樟葉駅", "description": "京阪本線の駅"},
+    "constraints": {"radius_km": 100, "route_count": 3},
+    "suggested_routes": [
+        {
+            "direction": "北",
+            "waypoints": [
+                {"name": "石清水八幡宮", "description": "男山の神社"},
+                {"name": "流れ橋", "description": "木津川の木橋"},
+                {"name": "嵐山", "description": "渡月橋"},
+                {"name": "京都御所", "description": "御苑"},
+            ],
+            "description": "木津川サイクリングロードから嵐山へ",
+        },
+        {
+            "direction": "東",
+            "waypoints": [
+                {"name": "宇治橋", "description": "宇治川"},
+                {"name": "瀬田の唐橋", "description": "瀬田川"},
+                {"name": "琵琶湖大橋", "description": "琵琶湖"},
+                {"name": "比叡山", "description": "延暦寺"},
+            ],
+            "description": "宇治川沿いに琵琶湖まで",
+        },
+        {
+            "direction": "南西",
+            "waypoints": [
+                {"name": "大阪城", "description": "大阪城公園"},
+                {"name": "万博記念公園", "description": "太陽の塔"},
+                {"name": "箕面の滝", "description": "箕面公園"},
+                {"name": "淀川河川公園", "description": "河川敷"},
+            ],
+            "description": "淀川沿いに大阪市内を周回",
+        },
+    ],
+}
+
+
+class Latency:
+    """Seeded, thread-safe latency distribution in seconds.
+
+    ``fixed`` always returns ``median``; ``uniform`` draws from
+    ``median ± spread``; ``lognormal`` has the given median and ``spread`` as
+    sigma, giving the long tail real APIs show.
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, median: float, distribution: str = "fixed", spread: float = 0.0, seed: int = 0):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.median = median
+        self.distribution = distribution
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: Union[str, float, "Latency"], seed: int = 0) -> "Latency":
+        """Build from ``0.5``, ``"0.5"``, ``"uniform:0.5:0.2"`` or ``"lognormal:0.5:0.6"``."""
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls(float(spec), seed=seed)
+        parts = spec.split(":")
+        if len(parts) == 1:
+            return cls(float(parts[0]), seed=seed)
+        return cls(float(parts[1]), parts[0], float(parts[2]) if len(parts) > 2 else 0.0, seed=seed)
+
+    def sample(self) -> float:
+        if self.distribution == "fixed" or self.median <= 0:
+            return max(0.0, self.median)
+        with self._lock:
+            if self.distribution == "uniform":
+                return max(0.0, self._random.uniform(self.median - self.spread, self.median + self.spread))
+            return self._random.lognormvariate(math.log(self.median), self.spread)
+
+    def __repr__(self) -> str:
+        return f"Latency({self.distribution}, median={self.median}, spread={self.spread})"
+
+
+class FakeLLMError(RuntimeError):
+    """Injected LLM failure."""
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers every prompt with a canned plan after a simulated delay.
+
+    When streamed, the response arrives in ``chunks`` pieces spread evenly
+    over the sampled latency, like tokens from a real model. ``latency`` is
+    seconds or a ``Latency`` spec; a ``failure_rate`` share of calls raise
+    FakeLLMError instead of answering. With ``plans`` set, each prompt gets
+    one of them, chosen by a stable hash of the prompt.
+    """
+
+    response: str = json.dumps(CANNED_PLAN, ensure_ascii=False)
+    plans: List[Dict[str, Any]] = []
+    latency: Any = 0.5
+    chunks: int = 40
+    failure_rate: float = 0.0
+    seed: int = 0
+    # Start the canned plan from the place named before "から" in the prompt,
+    # so that requests for different stations get different routes
+    start_from_prompt: bool = False
+    calls: int = 0
+    failures: int = 0
+    _latency: Latency = PrivateAttr()
+    _random: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._latency = Latency.parse(self.latency, seed=self.seed)
+        self._random = random.Random(self.seed + 1)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-route-planner"
+
+    def _start_call(self) -> float:
+        """Count a call, maybe inject a failure, and return its latency."""
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        if failed:
+            raise FakeLLMError("Injected LLM failure")
+        return self._latency.sample()
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        text = str(messages[-1].content)
+        user_input = text.split("ユーザーの入力:", 1)[-1].strip().splitlines()[0] if text.strip() else ""
+        if self.plans:
+            digest = hashlib.sha1(user_input.encode("utf-8")).digest()
+            plan = json.loads(json.dumps(self.plans[digest[0] % len(self.plans)]))
+        elif not self.start_from_prompt:
+            return self.response
+        else:
+            plan = json.loads(self.response)
+        if self.start_from_prompt:
+            plan["start_location"]["name"] = user_input.split("から", 1)[0]
+        return json.dumps(plan, ensure_ascii=False)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._start_call())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._start_call())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond(messages)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        latency = self._start_call()
+        response = self._respond(messages)
+        size = max(1, -(-len(response) // self.chunks))
+        for start in range(0, len(response), size):
+            await asyncio.sleep(latency / self.chunks)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=response[start:start + size]))
+
+
+class BatchingFakeChatModel(FakeChatModel):
+    """FakeChatModel with a native batch API: a whole batch costs one round trip."""
+
+    batch_calls: int = 0
+
+    async def abatch(self, inputs: List[Any], config: Any = None, *, return_exceptions: bool = False,
+                     **kwargs: Any) -> List[Any]:
+        self.batch_calls += 1
+        await asyncio.sleep(self._start_call())
+        return [
+            AIMessage(content=self._respond(self._convert_input(value).to_messages()))
+            for value in inputs
+        ]
+
+
+def _fake_location(address: str) -> Dict[str, float]:
+    """Derive a stable coordinate near Hirakata from the address text."""
+    digest = hashlib.sha1(address.encode("utf-8")).digest()
+    return {
+        "lat": 34.86 + (digest[0] - 128) / 400,
+        "lng": 135.68 + (digest[1] - 128) / 400,
+    }
+
+
+def _parse_latlng(value: str) -> Tuple[float, float]:
+    lat, lng = value.split(",")
+    return float(lat), float(lng)
+
+
+def fake_leg(start: Tuple[float, float], end: Tuple[float, float], spacing_m: float = 10.0,
+             steps: int = 10) -> Dict[str, Any]:
+    """Build a Directions leg whose steps follow a winding road sampled every ``spacing_m``."""
+    dlat = (end[0] - start[0]) * 111_000
+    dlng = (end[1] - start[1]) * 111_000 * math.cos(math.radians(start[0]))
+    length_m = max(math.hypot(dlat, dlng) * 1.3, spacing_m * 2)
+    count = int(length_m / spacing_m)
+    t = np.linspace(0.0, 1.0, count)
+    # Sideways wiggle perpendicular to the straight line, zero at both ends
+    wiggle = 0.004 * np.sin(t * math.pi * 12) * np.sin(t * math.pi)
+    track = np.column_stack((
+        start[0] + (end[0] - start[0]) * t - wiggle * (end[1] - start[1]),
+        start[1] + (end[1] - start[1]) * t + wiggle * (end[0] - start[0]),
+    ))
+    bounds = np.linspace(0, count - 1, steps + 1).astype(int)
+    return {
+        "distance": {"value": int(length_m)},
+        "duration": {"value": int(length_m / 5.5)},
+        "steps": [
+            {
+                "end_location": {"lat": float(track[b][0]), "lng": float(track[b][1])},
+                "html_instructions": f"step {i + 1}",
+                "polyline": {"points": encode_polyline(track[a:b + 1])},
+            }
+            for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))
+        ],
+    }
+
+
+class FakeGoogleMapsClient:
+    """Replacement for googlemaps.Client that blocks like the real HTTP client.
+
+    The googlemaps module functions only ever call ``client._request``, so this
+    is enough for ``geocoding.geocode`` and ``directions.directions``.
+    ``latency`` is seconds or a ``Latency`` spec; a ``failure_rate`` share of
+    calls raise googlemaps' TransportError after their delay.
+    """
+
+    def __init__(self, latency: Union[float, str, Latency] = 0.2, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = Latency.parse(latency, seed=seed)
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {"geocode": 0, "directions": 0}
+        self.failures: Dict[str, int] = {"geocode": 0, "directions": 0}
+
+    def _start_call(self, endpoint: str) -> None:
+        with self._lock:
+            self.calls[endpoint] += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures[endpoint] += 1
+        time.sleep(self.latency.sample())
+        if failed:
+            raise TransportError("Injected Maps failure")
+
+    def _request(self, url: str, params: Dict[str, Any], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        endpoint = maps_endpoint(url)
+        if endpoint is None:
+            raise ValueError(f"Unexpected Maps endpoint: {url}")
+        self._start_call(endpoint)
+        return fake_maps_response(endpoint, params)
+
+
+def maps_endpoint(url: str) -> Optional[str]:
+    """Name the Maps API an URL path belongs to ("geocode" or "directions"), or None."""
+    for endpoint in ("geocode", "directions"):
+        if url.split("?", 1)[0].endswith(f"/{endpoint}/json"):
+            return endpoint
+    return None
+
+
+def fake_maps_response(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Answer a geocode or directions request the way the Maps API would."""
+    if endpoint == "geocode":
+        return {"status": "OK", "results": [{"geometry": {"location": _fake_location(params["address"])}}]}
+    waypoints = params.get("waypoints", "").split("|") if params.get("waypoints") else []
+    stops = [_parse_latlng(v) for v in [params["origin"], *waypoints, params["destination"]]]
+    return {"status": "OK", "routes": [{"legs": [fake_leg(a, b) for a, b in zip(stops[:-1], stops[1:])]}]}
@@ -0,0 +1,198 @@
+"""Offline load test of the FastAPI app at fixed concurrency levels.
+
+Drives ``POST /api/route`` (or ``/api/route/stream``, or the job queue:
+``POST /api/jobs`` then long-polling ``GET /api/jobs/{id}``) in-process through
+httpx's ASGI transport, with ``RouteAgent`` pointed at the fake LLM and fake
+Google Maps backends. Every level gets a fresh agent (empty caches) and runs
+``--requests`` requests with ``concurrency`` closed-loop clients, then reports
+latency percentiles, throughput, error rate (429 rejections counted
+separately) and how many external calls were made. Latencies and failures are drawn from seeded generators, so a run can
+be repeated to verify a performance change.
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --concurrency 1 8 32 --requests 200 \\
+        --llm-latency lognormal:0.8:0.5 --maps-latency uniform:0.1:0.05 \\
+        --llm-failure-rate 0.02 --maps-failure-rate 0.01 --json results.json
+
+Latency specs are seconds (``0.5``), ``uniform:<median>:<spread>`` or
+``lognormal:<median>:<sigma>``. ``--plans`` takes a JSON list of canned plans
+in the LLM's output format; each prompt is answered with one of them.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from app.main import app, get_route_agent
+from benchmarks.fakes import FakeChatModel, FakeGoogleMapsClient
+
+# Start stations for the generated prompts; the fake LLM plans from the
+# station named in the prompt, so different stations mean different routes
+STATIONS = ["樟葉", "枚方市", "京都", "大阪", "奈良", "宇治", "高槻", "茨木", "京田辺", "木津"]
+
+
+def _prompts(count: int) -> List[str]:
+    return [
+        f"{STATIONS[i % len(STATIONS)]}駅{i // len(STATIONS) or ''}から100km圏内のロードバイク向けルート"
+        for i in range(count)
+    ]
+
+
+def _agent(args: argparse.Namespace, plans: List[Dict[str, Any]]) -> RouteAgent:
+    return RouteAgent(
+        "sk-loadtest",
+        "AIza-loadtest",
+        settings=AgentSettings(
+            llm_rate_limit=args.llm_rate,
+            geocode_rate_limit=args.geocode_rate,
+            directions_rate_limit=args.directions_rate,
+            job_workers=args.job_workers,
+            job_queue_depth=args.job_queue_depth
+        ),
+        llm=FakeChatModel(
+            latency=args.llm_latency,
+            failure_rate=args.llm_failure_rate,
+            plans=plans,
+            seed=args.seed,
+            start_from_prompt=True
+        ),
+        gmaps=FakeGoogleMapsClient(
+            latency=args.maps_latency,
+            failure_rate=args.maps_failure_rate,
+            seed=args.seed
+        )
+    )
+
+
+_PATHS = {"route": "/api/route", "stream": "/api/route/stream", "jobs": "/api/jobs"}
+
+
+async def _send(client: httpx.AsyncClient, path: str, prompt: str) -> str:
+    """Send one request and return "ok", "error" or "rejected" (429)."""
+    if path.endswith("/stream"):
+        async with client.stream("POST", path, json={"prompt": prompt}) as response:
+            ok = response.status_code == 200
+            async for line in response.aiter_lines():
+                if line and json.loads(line).get("type") == "error":
+                    ok = False
+            return "ok" if ok else "error"
+    response = await client.post(path, json={"prompt": prompt})
+    if response.status_code == 429:
+        return "rejected"
+    if path == "/api/jobs" and response.status_code == 202:
+        job_id = response.json()["job_id"]
+        status = "queued"
+        while status in ("queued", "running"):
+            response = await client.get(f"/api/jobs/{job_id}", params={"wait": 30})
+            status = response.json().get("status") if response.status_code == 200 else "failed"
+        return "ok" if status == "done" else "error"
+    return "ok" if response.status_code == 200 else "error"
+
+
+async def run_level(args: argparse.Namespace, concurrency: int, plans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Run one concurrency level against a fresh agent and return its report."""
+    agent = _agent(args, plans)
+    app.dependency_overrides[get_route_agent] = lambda: agent
+    path = _PATHS[args.endpoint]
+    prompts = _prompts(args.unique_prompts)
+    queue = iter(range(args.requests))
+    latencies: List[float] = []
+    outcomes = {"ok": 0, "error": 0, "rejected": 0}
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        for i in queue:
+            started = time.perf_counter()
+            try:
+                outcome = await _send(client, path, prompts[i % len(prompts)])
+            except httpx.HTTPError:
+                outcome = "error"
+            outcomes[outcome] += 1
+            # Latency percentiles are over served requests; rejections return at once
+            if outcome != "rejected":
+                latencies.append(time.perf_counter() - started)
+
+    # Server errors come back as 500s instead of being raised into the client
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        app.dependency_overrides.pop(get_route_agent, None)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else (np.nan,) * 3
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "errors": outcomes["error"],
+        "rejected": outcomes["rejected"],
+        "elapsed_s": elapsed,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "calls": {"llm": agent.llm.calls, **agent.gmaps.calls},
+        "failures": {"llm": agent.llm.failures, **agent.gmaps.failures},
+        "cache": {name: stats.get("hits", 0) for name, stats in agent.cache_stats().items()}
+    }
+
+
+def _print_report(reports: List[Dict[str, Any]]) -> None:
+    print(f"{'conc':>4} {'reqs':>5} {'err':>4} {'429':>4} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'llm':>5} {'geocode':>7} {'directions':>10}")
+    for r in reports:
+        print(f"{r['concurrency']:>4} {r['requests']:>5} {r['errors']:>4} {r['rejected']:>4} {r['rps']:>7.2f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+              f"{r['calls']['llm']:>5} {r['calls']['geocode']:>7} {r['calls']['directions']:>10}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    plans: List[Dict[str, Any]] = []
+    if args.plans:
+        with open(args.plans, encoding="utf-8") as f:
+            plans = json.load(f)
+    return [await run_level(args, concurrency, plans) for concurrency in args.concurrency]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--unique-prompts", type=int, default=16, help="Distinct prompts cycled through")
+    parser.add_argument("--endpoint", choices=sorted(_PATHS), default="route")
+    parser.add_argument("--job-workers", type=int, default=8, help="Job queue workers (--endpoint jobs)")
+    parser.add_argument("--job-queue-depth", type=int, default=64, help="Waiting jobs before 429 (--endpoint jobs)")
+    parser.add_argument("--llm-latency", default="lognormal:0.5:0.3")
+    parser.add_argument("--maps-latency", default="lognormal:0.1:0.3")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--maps-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate", type=float, default=None, help="LLM calls per second")
+    parser.add_argument("--geocode-rate", type=float, default=None, help="Geocode calls per second")
+    parser.add_argument("--directions-rate", type=float, default=None, help="Directions calls per second")
+    parser.add_argument("--plans", help="JSON list of canned LLM plans")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the reports to this file")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the app while under load")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would otherwise dominate the output (and the timings)
+    for name in ("app", "httpx"):
+        logging.getLogger(name).setLevel(args.log_level.upper())
+
+    reports = asyncio.run(run(args))
+    _print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": reports}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
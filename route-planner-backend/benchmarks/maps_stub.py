@@ -0,0 +1,136 @@
+"""Local HTTP stub of the Google Maps geocode and directions APIs.
+
+Serves the same canned answers as FakeGoogleMapsClient, but over real
+HTTP/1.1 with keep-alive, so the whole client stack (connection pool,
+timeouts, retries, hedging) can be exercised offline. Point an agent at it
+with ``AgentSettings(maps_base_url=stub.url)``.
+
+    python -m benchmarks.maps_stub --port 8765 --latency lognormal:0.1:0.5 --failure-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmarks.fakes import Latency, fake_maps_response, maps_endpoint
+
+
+class MapsStubServer:
+    """Threaded Maps API stub with seeded latency and failure injection.
+
+    A ``failure_rate`` share of requests, and the first ``fail_first``
+    requests, fail: with a 503, or with an OVER_QUERY_LIMIT status when
+    ``over_query_limit`` is set; googlemaps treats both as retriable.
+    ``stats()`` counts requests, failures and the distinct TCP connections
+    they arrived on.
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, str, Latency] = 0.05,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        port: int = 0,
+        fail_first: int = 0,
+        over_query_limit: bool = False
+    ):
+        self.latency = Latency.parse(latency, seed=seed)
+        self.failure_rate = failure_rate
+        self.fail_first = fail_first
+        self.over_query_limit = over_query_limit
+        self._random = random.Random(seed + 1)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "failures": 0}
+        self._connections = set()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                endpoint = maps_endpoint(url.path)
+                with stub._lock:
+                    stub._counters["requests"] += 1
+                    stub._connections.add(self.client_address)
+                    failed = stub._random.random() < stub.failure_rate or stub._counters["requests"] <= stub.fail_first
+                    if failed:
+                        stub._counters["failures"] += 1
+                time.sleep(stub.latency.sample())
+                if endpoint is None:
+                    self._send(404, {"status": "NOT_FOUND"})
+                elif failed and stub.over_query_limit:
+                    self._send(200, {"status": "OVER_QUERY_LIMIT", "results": []})
+                elif failed:
+                    self._send(503, {"status": "UNKNOWN_ERROR"})
+                else:
+                    self._send(200, fake_maps_response(endpoint, dict(parse_qsl(url.query))))
+
+            def _send(self, status: int, body: Dict[str, Any]) -> None:
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> "MapsStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="maps-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MapsStubServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "connections": len(self._connections)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="0.05")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--over-query-limit", action="store_true", help="fail with OVER_QUERY_LIMIT instead of 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with MapsStubServer(
+        args.latency, args.failure_rate, args.seed, args.port, over_query_limit=args.over_query_limit
+    ) as server:
+        print(f"Maps stub listening on {server.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from app.agent import RouteAgent
+from app.batch import run_batch
+from app.config import AgentSettings
+from app.models import RouteRequest, RouteResponse
+
+
+class _CountingAgent:
+    """Records the requests ``run_batch`` hands to the agent."""
+
+    settings = AgentSettings()
+    supports_batch_planning = False
+    request_key = staticmethod(RouteAgent.request_key)
+
+    def __init__(self) -> None:
+        self.runs: List[RouteRequest] = []
+
+    async def process_route_request(self, request: RouteRequest, plan: Any = None) -> RouteResponse:
+        self.runs.append(request)
+        return RouteResponse(routes=[], distances=[], descriptions=[])
+
+
+def _run(requests: List[RouteRequest]) -> SimpleNamespace:
+    agent = _CountingAgent()
+
+    async def collect() -> List[Dict[str, Any]]:
+        return [event async for event in run_batch(agent, requests)]
+
+    return SimpleNamespace(runs=agent.runs, events=asyncio.run(collect()))
+
+
+def test_same_prompt_runs_once():
+    batch = _run([RouteRequest(prompt="樟葉駅から"), RouteRequest(prompt=" 樟葉駅から ")])
+    assert len(batch.runs) == 1
+    assert sorted(event["index"] for event in batch.events if event["type"] == "result") == [0, 1]
+
+
+def test_deadline_and_idempotency_key_are_not_merged():
+    batch = _run([
+        RouteRequest(prompt="樟葉駅から"),
+        RouteRequest(prompt="樟葉駅から", deadline=5),
+        RouteRequest(prompt="樟葉駅から", idempotency_key="a"),
+        RouteRequest(prompt="樟葉駅から", idempotency_key="b"),
+        RouteRequest(prompt="京都駅から", idempotency_key="a")
+    ])
+    assert len(batch.runs) == 4
+    assert batch.events[-1] == {"type": "done", "count": 5, "failed": 0}
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from app.cache import DirectionsCache, GeocodeCache, PersistentLRUCache, directions_key, normalize_place_name
+
+
+def test_ttl_expiry():
+    cache = PersistentLRUCache("test", ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == (True, 1)
+    time.sleep(0.1)
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["expired"] == 1
+
+
+def test_ttl_expiry_on_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = PersistentLRUCache("test", ttl=0.05, path=path)
+    cache.set("a", 1)
+    cache.close()
+    time.sleep(0.1)
+    reopened = PersistentLRUCache("test", ttl=0.05, path=path)
+    assert reopened.get("a") == (False, None)
+    assert reopened.items() == []
+    reopened.close()
+
+
+def test_negative_entries():
+    cache = PersistentLRUCache("test", ttl=60, negative_ttl=0.05)
+    cache.set("nowhere", None)
+    cache.set("somewhere", {"lat": 1.0, "lng": 2.0})
+    # A negative entry is found, unlike a miss
+    assert cache.get("nowhere") == (True, None)
+    assert cache.get("missing") == (False, None)
+    stats = cache.stats()
+    assert (stats["negative_hits"], stats["misses"]) == (1, 1)
+    time.sleep(0.1)
+    # Negative entries expire on their own, shorter TTL
+    assert cache.get("nowhere") == (False, None)
+    assert cache.get("somewhere") == (True, {"lat": 1.0, "lng": 2.0})
+
+
+def test_lru_eviction():
+    cache = PersistentLRUCache("test", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.peek("b") == (False, None)
+    assert cache.peek("a") == (True, 1)
+
+
+def test_writes_are_batched_and_persist(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = PersistentLRUCache("test", path=path)
+    for i in range(100):
+        cache.set(f"k{i}", {"i": i})
+    cache.close()
+    assert cache.stats()["disk_writes"] == 100
+
+    reopened = PersistentLRUCache("test", path=path)
+    # Not in memory after a restart, but on disk
+    assert reopened.peek("k7") == (False, None)
+    assert asyncio.run(reopened.aget("k7")) == (True, {"i": 7})
+    assert reopened.peek("k7") == (True, {"i": 7})
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_aget_sees_queued_writes(tmp_path):
+    cache = PersistentLRUCache("test", maxsize=1, path=str(tmp_path / "cache.sqlite3"))
+    cache.set("a", 1)
+    # Evicted from memory, possibly not yet written
+    cache.set("b", 2)
+    assert asyncio.run(cache.aget("a")) == (True, 1)
+    cache.close()
+
+
+def test_normalize_place_name():
+    assert normalize_place_name("樟葉駅") == "樟葉駅"
+    assert normalize_place_name(" 樟葉　駅 ") == "樟葉駅"
+    assert normalize_place_name("樟葉駅, Japan") == "樟葉駅"
+    assert normalize_place_name("樟葉駅 日本") == "樟葉駅"
+    assert normalize_place_name("ＫＵＺＵＨＡ  Station") == "kuzuha station"
+
+
+def test_geocode_cache_normalizes_keys(tmp_path):
+    path = str(tmp_path / "geocode.sqlite3")
+    cache = GeocodeCache(path=path)
+    cache.set("樟葉駅, Japan", {"lat": 34.863, "lng": 135.678})
+    assert cache.peek(" 樟葉　駅 ") == (True, {"lat": 34.863, "lng": 135.678})
+    cache.close()
+    reopened = GeocodeCache(path=path)
+    assert asyncio.run(reopened.aget("樟葉駅")) == (True, {"lat": 34.863, "lng": 135.678})
+    assert reopened.items() == [("樟葉駅", {"lat": 34.863, "lng": 135.678})]
+    reopened.close()
+
+
+def test_directions_key_quantizes_and_keeps_waypoint_order():
+    cache = DirectionsCache(precision=4)
+    key = cache.key((34.86301, 135.67801), (35.0, 135.7), [(34.9, 135.69)], "bicycling")
+    assert key == cache.key((34.86304, 135.67799), (35.0, 135.7), [(34.9, 135.69)], "bicycling")
+    assert key != cache.key((34.86301, 135.67801), (35.0, 135.7), [], "bicycling")
+    assert directions_key((0.0, -0.000001), (1, 1), [], "bicycling", 5) == "bicycling|0.00000,0.00000|1.00000,1.00000|0"
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from app.agent import RouteAgent
+from app.json_stream import IncrementalJSONParser, parse_llm_json, parse_llm_json_checked
+
+PLAN = {
+    "start_location": {"name": "樟葉駅"},
+    "constraints": {"radius_km": 20},
+    "suggested_routes": [
+        {"description": "淀川沿い", "waypoints": [{"name": "背割堤"}, {"name": "流れ橋"}]},
+        {"description": "嵐山方面", "waypoints": [{"name": "嵐山"}, {"name": "渡月橋"}]}
+    ]
+}
+TEXT = json.dumps(PLAN, ensure_ascii=False)
+
+
+def test_parse_llm_json_plain():
+    assert parse_llm_json(TEXT) == PLAN
+
+
+def test_parse_llm_json_code_fence_and_prose():
+    assert parse_llm_json(f"```json\n{TEXT}\n```") == PLAN
+    assert parse_llm_json(f"Here is your plan:\n{TEXT}\nEnjoy the ride!") == PLAN
+
+
+def test_parse_llm_json_truncated_inside_waypoint():
+    cut = TEXT.index('"渡月橋"') + 3
+    data = parse_llm_json(TEXT[:cut])
+    assert data["start_location"] == {"name": "樟葉駅"}
+    assert data["suggested_routes"][0] == PLAN["suggested_routes"][0]
+    # The cut-off waypoint is repaired to an empty object
+    assert data["suggested_routes"][1]["waypoints"] == [{"name": "嵐山"}, {}]
+
+
+def test_parse_llm_json_checked_reports_repair():
+    assert parse_llm_json_checked(f"```json\n{TEXT}\n```") == (PLAN, False)
+    assert parse_llm_json_checked(TEXT[:-10])[1] is True
+
+
+def test_parse_llm_json_unusable():
+    with pytest.raises(json.JSONDecodeError):
+        parse_llm_json("I could not plan a route.")
+
+
+def test_incremental_parser_reports_closed_objects():
+    parser = IncrementalJSONParser()
+    completed = []
+    for i in range(0, len(TEXT), 7):
+        completed.extend(parser.feed(TEXT[i:i + 7]))
+    paths = [path for path, _ in completed]
+    assert ("start_location",) in paths
+    assert ("suggested_routes", 1, "waypoints", 1) in paths
+    assert dict(completed)[("suggested_routes", 0, "waypoints", 0)] == {"name": "背割堤"}
+
+
+def test_plan_from_completion_drops_nameless_waypoints():
+    cut = TEXT.index('"渡月橋"') + 3
+    plan, complete = RouteAgent._plan_from_completion(TEXT[:cut])
+    assert plan["start_location"] == {"name": "樟葉駅"}
+    assert plan["suggested_routes"][1]["waypoints"] == [{"name": "嵐山"}]
+    assert not complete
+
+
+def test_plan_from_completion_complete():
+    assert RouteAgent._plan_from_completion(f"```json\n{TEXT}\n```") == (PLAN, True)
+
+
+def test_plan_from_completion_short_of_route_count():
+    data = {**PLAN, "constraints": {"route_count": 3}}
+    plan, complete = RouteAgent._plan_from_completion(json.dumps(data, ensure_ascii=False))
+    assert len(plan["suggested_routes"]) == 2
+    assert not complete
+
+
+def test_plan_from_completion_drops_routes_without_named_waypoints():
+    data = {
+        "start_location": {"name": "樟葉駅"},
+        "suggested_routes": [
+            {"description": "a", "waypoints": [{}, {"name": ""}, "嵐山", {"name": None}]},
+            {"description": "b", "waypoints": []},
+            {"description": "c"},
+            "not a route",
+            {"description": "d", "waypoints": [{"name": "背割堤"}]}
+        ]
+    }
+    plan, complete = RouteAgent._plan_from_completion(json.dumps(data, ensure_ascii=False))
+    assert plan["suggested_routes"] == [{"description": "d", "waypoints": [{"name": "背割堤"}]}]
+    assert plan["constraints"] == {}
+    assert not complete
+
+
+@pytest.mark.parametrize("start", [None, {}, {"name": ""}, "樟葉駅"])
+def test_plan_from_completion_requires_named_start(start):
+    content = json.dumps({"start_location": start, "suggested_routes": PLAN["suggested_routes"]})
+    with pytest.raises(json.JSONDecodeError):
+        RouteAgent._plan_from_completion(content)
+
+
+def test_plan_from_completion_truncated_before_start():
+    with pytest.raises(json.JSONDecodeError):
+        RouteAgent._plan_from_completion('{"start_location": {"na')
@@ -0,0 +1,132 @@
+import heapq
+import math
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.local_router import LocalRouter, RoadGraph, bicycle_profile
+
+FIXTURE = Path(__file__).parent.parent / "benchmarks" / "fixtures" / "kuzuha.osm"
+
+
+@pytest.fixture(scope="module")
+def built() -> RoadGraph:
+    return RoadGraph.from_extract(str(FIXTURE))
+
+
+@pytest.fixture(scope="module")
+def router(built: RoadGraph, tmp_path_factory: pytest.TempPathFactory) -> LocalRouter:
+    path = tmp_path_factory.mktemp("graph") / "kuzuha.graph"
+    built.save(str(path))
+    return LocalRouter.load(str(path), snap_distance_m=200.0)
+
+
+def _dijkstra(graph: RoadGraph, source: int):
+    """Plain Dijkstra: cost to every node and the edge each is reached by."""
+    costs = np.full(graph.node_count, np.inf)
+    via = np.full(graph.node_count, -1)
+    costs[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > costs[node]:
+            continue
+        for edge in range(graph.indptr[node], graph.indptr[node + 1]):
+            neighbor = graph.indices[edge]
+            candidate = cost + float(graph.cost[edge])
+            if candidate < costs[neighbor]:
+                costs[neighbor] = candidate
+                via[neighbor] = edge
+                heapq.heappush(heap, (candidate, neighbor))
+    return costs, via
+
+
+def _edge_source(graph: RoadGraph, edge: int) -> int:
+    return int(np.searchsorted(graph.indptr, edge, side="right") - 1)
+
+
+def test_graph_is_built_and_connected(built: RoadGraph):
+    assert built.node_count > 10
+    assert built.edge_count > built.node_count
+    assert len(built.indptr) == built.node_count + 1
+    # Only the largest (weakly) connected network is kept
+    costs, _ = _dijkstra(built, 0)
+    assert np.isfinite(costs).sum() > built.node_count // 2
+
+
+def test_graph_reopens_memory_mapped(built: RoadGraph, router: LocalRouter):
+    graph = router.graph
+    for name in ("lat", "lng", "indptr", "indices", "length_m", "time_s", "cost"):
+        array = getattr(graph, name)
+        assert isinstance(array, np.memmap)
+        assert not array.flags.writeable
+        np.testing.assert_array_equal(array, getattr(built, name))
+
+
+def test_astar_matches_dijkstra(router: LocalRouter):
+    graph = router.graph
+    rng = np.random.default_rng(0)
+    for source in rng.choice(graph.node_count, size=min(5, graph.node_count), replace=False).tolist():
+        costs, via = _dijkstra(graph, source)
+        for target in range(graph.node_count):
+            if target == source:
+                continue
+            hops = router._shortest_path(source, target)
+            if not np.isfinite(costs[target]):
+                assert hops is None
+                continue
+            edges = [edge for _, edge in hops]
+            assert float(graph.cost[edges].sum()) == pytest.approx(costs[target], rel=1e-4)
+            # The hops form a connected path from source to target
+            node = source
+            for hop_node, edge in hops:
+                assert _edge_source(graph, edge) == node
+                assert graph.indices[edge] == hop_node
+                node = hop_node
+            assert node == target
+            # Same path as Dijkstra's, or one of equal cost where the optimum is tied
+            expected = []
+            node = target
+            while node != source:
+                expected.append(int(via[node]))
+                node = _edge_source(graph, int(via[node]))
+            if edges != expected[::-1]:
+                assert float(graph.cost[expected].sum()) == pytest.approx(costs[target], rel=1e-4)
+
+
+def test_nearest_node_snaps(router: LocalRouter):
+    graph = router.graph
+    node = graph.node_count // 2
+    lat, lng = float(graph.lat[node]), float(graph.lng[node])
+    assert router.nearest_node(lat, lng) == node
+    # About 5 m off still snaps onto the node unless another one is closer
+    snapped = router.nearest_node(lat + 5 / 111_000, lng)
+    distance = math.hypot(
+        (float(graph.lat[snapped]) - lat - 5 / 111_000) * 111_000,
+        (float(graph.lng[snapped]) - lng) * 111_000 * math.cos(math.radians(lat))
+    )
+    assert distance <= 5.5
+    # Far outside the extract: nothing within the snap distance
+    assert router.nearest_node(lat + 0.1, lng) is None
+
+
+def test_route_through_points(router: LocalRouter):
+    graph = router.graph
+    a, b = 0, graph.node_count - 1
+    result = router.route([(float(graph.lat[a]), float(graph.lng[a])), (float(graph.lat[b]), float(graph.lng[b]))])
+    assert result is not None
+    track = result["track"]
+    assert tuple(track[0]) == (graph.lat[a], graph.lng[a])
+    assert tuple(track[-1]) == (graph.lat[b], graph.lng[b])
+    assert result["distance"] > 0 and result["duration"] > 0
+    assert router.route([(float(graph.lat[a]) + 0.1, float(graph.lng[a])), (float(graph.lat[b]), float(graph.lng[b]))]) is None
+
+
+def test_bicycle_profile():
+    assert bicycle_profile({"highway": "motorway"}) is None
+    assert bicycle_profile({"highway": "residential", "access": "private"}) is None
+    assert bicycle_profile({"highway": "cycleway"})[2:] == (True, True)
+    assert bicycle_profile({"highway": "residential", "oneway": "yes"})[2:] == (True, False)
+    assert bicycle_profile({"highway": "residential", "oneway": "yes", "oneway:bicycle": "no"})[2:] == (True, True)
+    assert bicycle_profile({"highway": "steps"}) is None
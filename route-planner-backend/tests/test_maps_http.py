@@ -0,0 +1,156 @@
+import asyncio
+import time
+from typing import Any, Callable, List
+
+import pytest
+from googlemaps import geocoding
+from prometheus_client import REGISTRY
+
+from app import maps_http
+from app.maps_http import PooledMapsClient, RetriableResponse, RetryPolicy
+from app.rate_limit import TokenBucket
+from benchmarks.maps_stub import MapsStubServer
+
+
+def _client(stub: MapsStubServer) -> PooledMapsClient:
+    return PooledMapsClient("AIza-test", pool_size=4, timeout=5, base_url=stub.url)
+
+
+def _geocode(client: PooledMapsClient, address: str = "樟葉駅") -> Callable[[], Any]:
+    return lambda: asyncio.to_thread(geocoding.geocode, client, address)
+
+
+class _Throttle:
+    """Counts the rate-limit tokens a RetryPolicy takes."""
+
+    def __init__(self) -> None:
+        self.tokens = 0
+
+    async def __call__(self) -> None:
+        self.tokens += 1
+
+
+def _hedges(result: str) -> float:
+    return REGISTRY.get_sample_value("route_maps_hedges_total", {"provider": "test", "result": result}) or 0.0
+
+
+@pytest.fixture
+def backoffs(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """Upper bounds of the jittered backoff draws; every draw sleeps 0."""
+    bounds: List[float] = []
+
+    def uniform(low: float, high: float) -> float:
+        bounds.append(high)
+        return 0.0
+
+    monkeypatch.setattr(maps_http.random, "uniform", uniform)
+    return bounds
+
+
+@pytest.mark.parametrize("over_query_limit", [False, True])
+def test_retries_with_jittered_backoff(backoffs: List[float], over_query_limit: bool):
+    throttle = _Throttle()
+    policy = RetryPolicy(attempts=4, base_delay=0.2, max_delay=0.3)
+    with MapsStubServer(latency=0, fail_first=2, over_query_limit=over_query_limit) as stub:
+        result = asyncio.run(policy.run(_geocode(_client(stub)), throttle, 5, "test"))
+        assert stub.stats()["requests"] == 3
+    assert result[0]["geometry"]["location"]
+    # Full jitter over a doubling window, capped at max_delay
+    assert backoffs == [0.2, 0.3]
+    # Every retry takes a rate-limit token
+    assert throttle.tokens == 2
+
+
+def test_gives_up_after_attempts(backoffs: List[float]):
+    policy = RetryPolicy(attempts=3)
+    with MapsStubServer(latency=0, failure_rate=1.0) as stub:
+        with pytest.raises(RetriableResponse):
+            asyncio.run(policy.run(_geocode(_client(stub)), _Throttle(), 5, "test"))
+        assert stub.stats()["requests"] == 3
+    assert len(backoffs) == 2
+
+
+def test_hedge_wins_after_hedge_delay():
+    with MapsStubServer(latency=0) as stub:
+        client = _client(stub)
+        calls = 0
+
+        async def call() -> Any:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                # The original request stalls well past the hedge delay
+                await asyncio.sleep(1.0)
+            return await _geocode(client)()
+
+        throttle = _Throttle()
+        won = _hedges("won")
+        started = time.perf_counter()
+        result = asyncio.run(RetryPolicy(hedge_delay=0.05).run(call, throttle, 5, "test"))
+        elapsed = time.perf_counter() - started
+    assert result[0]["geometry"]["location"]
+    assert 0.05 <= elapsed < 0.5
+    assert calls == 2 and throttle.tokens == 1
+    assert _hedges("won") == won + 1
+
+
+def test_no_hedge_for_fast_calls():
+    with MapsStubServer(latency=0) as stub:
+        throttle = _Throttle()
+        asyncio.run(RetryPolicy(hedge_delay=0.5).run(_geocode(_client(stub)), throttle, 5, "test"))
+        assert stub.stats()["requests"] == 1
+    assert throttle.tokens == 0
+
+
+def test_deadline_expires_mid_attempt():
+    async def run(client: PooledMapsClient) -> float:
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await RetryPolicy().run(_geocode(client), _Throttle(), 0.1, "test")
+        return time.perf_counter() - started
+
+    with MapsStubServer(latency=0.5) as stub:
+        # The abandoned request's thread still finishes, but the caller is released at the deadline
+        assert asyncio.run(run(_client(stub))) < 0.3
+
+
+def test_deadline_cuts_backoff_short(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(maps_http.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(attempts=5, base_delay=1.0)
+    with MapsStubServer(latency=0, failure_rate=1.0) as stub:
+        started = time.perf_counter()
+        # A 1 s backoff would overshoot the 0.3 s deadline, so the error surfaces at once
+        with pytest.raises(RetriableResponse):
+            asyncio.run(policy.run(_geocode(_client(stub)), _Throttle(), 0.3, "test"))
+        assert time.perf_counter() - started < 0.3
+        assert stub.stats()["requests"] == 1
+
+
+def test_token_bucket_limits_rate():
+    with MapsStubServer(latency=0) as stub:
+        client = _client(stub)
+
+        async def run() -> None:
+            bucket = TokenBucket(rate=20, burst=1)
+            policy = RetryPolicy()
+
+            async def one(i: int) -> Any:
+                await bucket.acquire()
+                return await policy.run(_geocode(client, f"地点{i}"), bucket.acquire, 5, "test")
+
+            await asyncio.gather(*(one(i) for i in range(6)))
+            assert bucket.stats()["acquired"] == 6
+
+        started = time.perf_counter()
+        asyncio.run(run())
+        # One token up front, then one every 1/20 s
+        assert time.perf_counter() - started >= 5 / 20 * 0.9
+        assert stub.stats()["requests"] == 6
+
+
+def test_client_does_not_throttle_itself():
+    with MapsStubServer(latency=0) as stub:
+        client = _client(stub)
+        for i in range(5):
+            geocoding.geocode(client, f"地点{i}")
+    assert len(client.sent_times) == 0
@@ -0,0 +1,134 @@
+import asyncio
+import json
+from typing import Optional
+
+import pytest
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from app.models import RouteRequest
+from app.places import PlaceIndex
+from app.route_store import MemoryRouteStore
+from benchmarks.fakes import CANNED_PLAN, FakeChatModel, FakeGoogleMapsClient
+
+
+def _index() -> PlaceIndex:
+    index = PlaceIndex()
+    index.add("樟葉駅", 34.8630, 135.6780, pinned=True)
+    index.add("京都駅", 34.9858, 135.7588, pinned=True)
+    index.add("京都", 35.0116, 135.7681)
+    index.add("嵐山", 35.0094, 135.6668)
+    return index
+
+
+def test_find_in_text_in_order_of_mention():
+    names = [place["name"] for place in _index().find_in_text("嵐山方面へ樟葉駅から京都駅まで")]
+    assert names == ["嵐山", "樟葉駅", "京都駅"]
+
+
+def test_find_in_text_longest_overlapping_name():
+    assert [place["name"] for place in _index().find_in_text("京都駅から")] == ["京都駅"]
+
+
+def test_find_in_text_starts_only():
+    index = _index()
+    assert index.find_in_text("嵐山方面へ樟葉駅から", starts_only=True) == []
+    index.mark_start("樟葉駅")
+    found = index.find_in_text("嵐山方面へ樟葉駅から", starts_only=True)
+    assert [(place["name"], place["pinned"], place["start"]) for place in found] == [("樟葉駅", True, True)]
+
+
+def _route(lat: float, lng: float) -> dict:
+    return {
+        "start": {"name": "樟葉駅", "lat": lat, "lng": lng},
+        "waypoints": [{"name": "背割堤", "lat": 34.8850, "lng": 135.7020}],
+        "polyline": None,
+        "distance": 10.0,
+        "duration": 1800,
+        "description": "",
+        "elevation": None,
+        "prompt": "樟葉駅から"
+    }
+
+
+def test_memory_store_near_max_age():
+    store = MemoryRouteStore()
+
+    async def run():
+        await store.save([_route(34.8630, 135.6780), _route(34.8640, 135.6790)])
+        # Age one of them by a day
+        next(iter(store._routes.values()))["created_at"] -= 86400
+        return (
+            await store.near(34.8630, 135.6780, 2000, 10),
+            await store.near(34.8630, 135.6780, 2000, 10, max_age=3600)
+        )
+
+    everything, recent = asyncio.run(run())
+    assert len(everything) == 2
+    assert [route["start"]["lat"] for route in recent] == [34.8640]
+
+
+def test_memory_store_near_prompt():
+    store = MemoryRouteStore()
+    other = {**_route(34.8640, 135.6790), "prompt": "樟葉駅から南へ"}
+
+    async def run():
+        await store.save([_route(34.8630, 135.6780), other])
+        return await store.near(34.8630, 135.6780, 2000, 10, prompt="樟葉駅から南へ")
+
+    assert [route["start"]["lat"] for route in asyncio.run(run())] == [34.8640]
+
+
+@pytest.mark.parametrize("deadline", [None, 30.0])
+def test_blends_stored_routes(deadline: Optional[float]):
+    agent = RouteAgent(
+        "sk-test",
+        "AIza-test",
+        settings=AgentSettings(route_store_url="memory", route_store_min_routes=0, route_store_blend=1),
+        llm=FakeChatModel(response=json.dumps(CANNED_PLAN, ensure_ascii=False), latency=0),
+        gmaps=FakeGoogleMapsClient(latency=0)
+    )
+    one_route = {**CANNED_PLAN, "suggested_routes": CANNED_PLAN["suggested_routes"][:1]}
+
+    async def run():
+        try:
+            # Stores the canned plan's routes
+            await agent.process_route_request(RouteRequest(prompt="樟葉駅からのサイクリングルート"))
+            return await agent.process_route_request(
+                RouteRequest(prompt="樟葉駅から北へ", deadline=deadline), plan=one_route
+            )
+        finally:
+            await agent.close()
+
+    response = asyncio.run(run())
+    # The fresh route plus one stored route from the same start
+    assert len(response.routes) == 2
+    assert response.routes[0] != response.routes[1]
+
+
+def test_serves_stored_routes_for_the_same_prompt_only():
+    llm = FakeChatModel(response=json.dumps(CANNED_PLAN, ensure_ascii=False), latency=0)
+    agent = RouteAgent(
+        "sk-test",
+        "AIza-test",
+        settings=AgentSettings(route_store_url="memory", route_store_min_routes=3, plan_cache_size=0),
+        llm=llm,
+        gmaps=FakeGoogleMapsClient(latency=0)
+    )
+
+    async def run():
+        try:
+            await agent.process_route_request(RouteRequest(prompt="樟葉駅からのサイクリングルート"))
+            # Same prompt up to normalization: served from the store
+            served = await agent.process_route_request(RouteRequest(prompt=" 樟葉駅からのサイクリングルート "))
+            calls = llm.calls
+            # Same start, other constraints: planned afresh
+            await agent.process_route_request(RouteRequest(prompt="樟葉駅から20km以内の平坦なルート"))
+            return served, calls
+        finally:
+            await agent.close()
+
+    served, calls = asyncio.run(run())
+    assert len(served.routes) == 3
+    assert calls == 1
+    assert llm.calls == 2
@@ -0,0 +1,49 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+from app.agent import RouteAgent
+from app.config import AgentSettings
+from app.models import RouteRequest
+from benchmarks.fakes import CANNED_PLAN, FakeChatModel, FakeGoogleMapsClient
+
+
+def _stream(response: str, prompt: str = "樟葉駅からのサイクリングルート") -> List[Dict[str, Any]]:
+    agent = RouteAgent(
+        "sk-test",
+        "AIza-test",
+        settings=AgentSettings(plan_cache_size=0),
+        llm=FakeChatModel(response=response, latency=0),
+        gmaps=FakeGoogleMapsClient(latency=0)
+    )
+
+    async def collect() -> List[Dict[str, Any]]:
+        try:
+            return [event async for event in agent.stream_route_request(RouteRequest(prompt=prompt))]
+        finally:
+            await agent.close()
+
+    return asyncio.run(collect())
+
+
+def test_failing_plan_streams_one_error():
+    events = _stream("I cannot plan a route for that.")
+    assert [event["type"] for event in events] == ["error", "done"]
+    assert events[0]["errors"][0].startswith("Failed to parse LLM response")
+    assert events[-1]["route_count"] == 0
+
+
+def test_stream_event_order():
+    events = _stream(json.dumps(CANNED_PLAN, ensure_ascii=False))
+    types = [event["type"] for event in events]
+    assert types[:2] == ["start_location", "start_point"]
+    assert types[2:] == ["route"] * len(CANNED_PLAN["suggested_routes"]) + ["done"]
+    assert events[-1]["route_count"] == len(CANNED_PLAN["suggested_routes"])
+
+
+def test_start_location_cannot_override_event_type():
+    plan = json.loads(json.dumps(CANNED_PLAN))
+    plan["start_location"]["type"] = "station"
+    events = _stream(json.dumps(plan, ensure_ascii=False))
+    assert events[0]["type"] == "start_location"
+    assert events[0]["name"] == plan["start_location"]["name"]